@@ -0,0 +1,479 @@
+"""An in-process stand-in for S3 and DynamoDB, for benchmarking.
+
+The backend answers the requests of a boto3 session's clients from
+memory, in place of sending them. Requests still pass through boto3 and
+botocore up to the point of being sent, so their cost on the client's
+side is measured along with the client's own. Each request may be
+delayed, to stand in for the network, and throttled, either at random
+or once a bucket or table is sent more requests per second than it
+allows.
+"""
+
+import base64
+import datetime
+import hashlib
+import io
+import json
+import random
+import threading
+import time
+
+from botocore.awsrequest import AWSResponse
+from botocore.response import StreamingBody
+from dateutil.tz import tzutc
+
+try:
+    from urllib.parse import unquote
+except ImportError:  # pragma: no cover
+    from urllib import unquote
+
+# Most keys returned by one listing of a bucket
+LIST_PAGE_SIZE = 1000
+
+
+class _Response(AWSResponse):
+    def __init__(self, status_code):
+        super(_Response, self).__init__("https://fake", status_code, {}, None)
+
+
+def _error(status_code, code, message=""):
+    return (
+        _Response(status_code),
+        {
+            "Error": {"Code": code, "Message": message},
+            "ResponseMetadata": {"HTTPStatusCode": status_code},
+        },
+    )
+
+
+def _ok(parsed=None):
+    parsed = dict(parsed or {})
+    parsed["ResponseMetadata"] = {"HTTPStatusCode": 200}
+    return _Response(200), parsed
+
+
+class _Object(object):
+    def __init__(self, data, metadata, content_type):
+        self.data = data
+        self.metadata = metadata or {}
+        self.content_type = content_type or "binary/octet-stream"
+        self.etag = '"%s"' % hashlib.md5(data).hexdigest()
+        self.last_modified = datetime.datetime.now(tzutc()).replace(
+            microsecond=0
+        )
+
+
+class _Table(object):
+    def __init__(self, name, key_names):
+        self.name = name
+        self.key_names = key_names
+        # Items by the value of their hash key, then their whole key
+        self.items = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def _value_id(value):
+        return json.dumps(value, sort_keys=True)
+
+    def key_id(self, item):
+        return tuple(
+            self._value_id(item.get(name, {})) for name in self.key_names
+        )
+
+    def put(self, item):
+        key_id = self.key_id(item)
+        with self.lock:
+            self.items.setdefault(key_id[0], {})[key_id] = item
+
+    def get(self, key):
+        key_id = self.key_id(key)
+        with self.lock:
+            return self.items.get(key_id[0], {}).get(key_id)
+
+    def query(self, conditions):
+        hash_value = conditions.get(self.key_names[0])
+        with self.lock:
+            if hash_value is not None:
+                candidates = list(
+                    self.items.get(self._value_id(hash_value), {}).values()
+                )
+            else:
+                # Queries of an index, scanning every item
+                candidates = [
+                    item
+                    for group in self.items.values()
+                    for item in group.values()
+                ]
+
+        return [
+            item
+            for item in candidates
+            if all(
+                item.get(name) == value for name, value in conditions.items()
+            )
+        ]
+
+
+class _RateWindow(object):
+    # Counts requests in the current second, for throttling
+    def __init__(self):
+        self.second = None
+        self.count = 0
+
+
+class FakeAWS(object):
+    """Serves S3 and DynamoDB requests from memory.
+
+    Args:
+        latency (float)
+            Number of seconds each request is delayed by.
+
+        jitter (float)
+            Maximum number of seconds, chosen at random, each request is
+            further delayed by.
+
+        throttle_rate (float)
+            Fraction of requests, chosen at random, rejected with a
+            throttling error.
+
+        max_rps (int)
+            Number of requests per second each bucket and table serves
+            before rejecting the rest with a throttling error.
+
+        seed (int)
+            Seed for the delays and throttling chosen at random.
+    """
+
+    def __init__(
+        self, latency=0.0, jitter=0.0, throttle_rate=0.0, max_rps=None, seed=0
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.max_rps = max_rps
+
+        self.buckets = {}
+        self.tables = {}
+        self.requests = 0
+        self.throttled = 0
+
+        self._random = random.Random(seed)
+        self._windows = {}
+        self._lock = threading.Lock()
+
+    def install(self, session):
+        """Answers the requests of every client the given boto3 session
+        creates from now on.
+        """
+
+        events = session.events
+        events.register("before-parameter-build.s3", self._capture)
+        events.register("before-call.s3", self._call_s3)
+        events.register("before-call.dynamodb", self._call_dynamodb)
+
+    def create_bucket(self, name):
+        self.buckets.setdefault(name, {})
+
+    def put_object(self, bucket, key, data, metadata=None):
+        """Stores an object directly, without a request."""
+
+        self.buckets.setdefault(bucket, {})[key] = _Object(
+            data, metadata, None
+        )
+
+    def create_table(self, name, key_names):
+        self.tables[name] = _Table(name, key_names)
+
+    def put_item(self, table, item):
+        """Stores an item, of typed attribute values, directly."""
+
+        self.tables[table].put(item)
+
+    # Requests
+
+    @staticmethod
+    def _capture(params, context, **_kwargs):
+        # Keep S3 requests' parameters as given, their bodies unread
+        context["fake_params"] = params
+
+    def _admit(self, scope):
+        """Delays a request, returning True if it's throttled."""
+
+        with self._lock:
+            self.requests += 1
+            delay = self.latency
+            if self.jitter:
+                delay += self._random.uniform(0, self.jitter)
+
+            throttled = bool(self.throttle_rate) and (
+                self._random.random() < self.throttle_rate
+            )
+            if self.max_rps:
+                second = int(time.time())
+                window = self._windows.setdefault(scope, _RateWindow())
+                if window.second != second:
+                    window.second, window.count = second, 0
+                window.count += 1
+                throttled = throttled or window.count > self.max_rps
+
+            if throttled:
+                self.throttled += 1
+
+        if delay:
+            time.sleep(delay)
+        return throttled
+
+    def _call_s3(self, model, context, **_kwargs):
+        params = context.get("fake_params", {})
+        bucket_name = params.get("Bucket")
+
+        if self._admit(("s3", bucket_name)):
+            return _error(503, "SlowDown", "Please reduce your request rate.")
+
+        bucket = self.buckets.get(bucket_name)
+        if bucket is None:
+            return _error(404, "NoSuchBucket", bucket_name)
+
+        handler = getattr(self, "_s3_%s" % model.name, None)
+        if handler is None:
+            return _error(501, "NotImplemented", model.name)
+        return handler(bucket, params)
+
+    def _s3_HeadObject(self, bucket, params):
+        obj = bucket.get(params["Key"])
+        if obj is None:
+            return _error(404, "404", "Not Found")
+        return _ok(self._object_attrs(obj))
+
+    @staticmethod
+    def _object_attrs(obj):
+        return {
+            "ContentLength": len(obj.data),
+            "ContentType": obj.content_type,
+            "ETag": obj.etag,
+            "LastModified": obj.last_modified,
+            "Metadata": dict(obj.metadata),
+        }
+
+    def _s3_PutObject(self, bucket, params):
+        body = params.get("Body", b"")
+        if hasattr(body, "read"):
+            if hasattr(body, "seek"):
+                body.seek(0)
+            body = body.read()
+
+        obj = _Object(body, params.get("Metadata"), params.get("ContentType"))
+        bucket[params["Key"]] = obj
+        return _ok({"ETag": obj.etag})
+
+    @staticmethod
+    def _copy_source(source):
+        # botocore has already turned a CopySource dict into its string
+        # form, "bucket/key[?versionId=...]", with the key URL-encoded
+        if isinstance(source, dict):
+            return source["Bucket"], source["Key"]
+        source = source.split("?versionId=", 1)[0]
+        bucket_name, key = source.lstrip("/").split("/", 1)
+        return bucket_name, unquote(key)
+
+    def _s3_CopyObject(self, bucket, params):
+        source_bucket, source_key = self._copy_source(params["CopySource"])
+        source_obj = self.buckets.get(source_bucket, {}).get(source_key)
+        if source_obj is None:
+            return _error(404, "NoSuchKey", source_key)
+
+        metadata = source_obj.metadata
+        if params.get("MetadataDirective") == "REPLACE":
+            metadata = params.get("Metadata")
+
+        obj = _Object(source_obj.data, metadata, params.get("ContentType"))
+        bucket[params["Key"]] = obj
+        return _ok(
+            {
+                "CopyObjectResult": {
+                    "ETag": obj.etag,
+                    "LastModified": obj.last_modified,
+                }
+            }
+        )
+
+    def _s3_GetObject(self, bucket, params):
+        obj = bucket.get(params["Key"])
+        if obj is None:
+            return _error(404, "NoSuchKey", params["Key"])
+
+        if params.get("IfMatch") and params["IfMatch"] != obj.etag:
+            return _error(412, "PreconditionFailed", params["Key"])
+
+        data = obj.data
+        if params.get("Range"):
+            start, end = params["Range"][len("bytes=") :].split("-")
+            data = data[int(start) : int(end) + 1]
+
+        attrs = self._object_attrs(obj)
+        attrs["ContentLength"] = len(data)
+        attrs["Body"] = StreamingBody(io.BytesIO(data), len(data))
+        return _ok(attrs)
+
+    def _list_objects(self, bucket, params, after):
+        prefix = params.get("Prefix", "")
+        keys = sorted(
+            key
+            for key in bucket
+            if key.startswith(prefix) and (after is None or key > after)
+        )
+        page = keys[: params.get("MaxKeys", LIST_PAGE_SIZE)]
+        contents = [
+            {
+                "Key": key,
+                "Size": len(bucket[key].data),
+                "ETag": bucket[key].etag,
+                "LastModified": bucket[key].last_modified,
+                "StorageClass": "STANDARD",
+            }
+            for key in page
+        ]
+        return contents, len(keys) > len(page)
+
+    def _s3_ListObjects(self, bucket, params):
+        contents, truncated = self._list_objects(
+            bucket, params, params.get("Marker")
+        )
+        return _ok(
+            {
+                "Contents": contents,
+                "IsTruncated": truncated,
+                "Prefix": params.get("Prefix", ""),
+            }
+        )
+
+    def _s3_ListObjectsV2(self, bucket, params):
+        token = params.get("ContinuationToken")
+        after = base64.b64decode(token).decode("utf-8") if token else None
+        contents, truncated = self._list_objects(bucket, params, after)
+        parsed = {
+            "Contents": contents,
+            "IsTruncated": truncated,
+            "KeyCount": len(contents),
+        }
+        if truncated:
+            parsed["NextContinuationToken"] = base64.b64encode(
+                contents[-1]["Key"].encode("utf-8")
+            ).decode("ascii")
+        return _ok(parsed)
+
+    def _call_dynamodb(self, model, params, **_kwargs):
+        # DynamoDB requests are JSON, their attribute values typed
+        request = json.loads(params["body"] or b"{}")
+        table_names = [request["TableName"]] if "TableName" in request else []
+        table_names.extend(request.get("RequestItems", {}))
+
+        for table_name in table_names:
+            if table_name not in self.tables:
+                return _error(
+                    400, "ResourceNotFoundException", "Table not found"
+                )
+
+        if self._admit(("dynamodb", tuple(table_names))):
+            return _error(
+                400,
+                "ProvisionedThroughputExceededException",
+                "The level of configured provisioned throughput for the "
+                "table was exceeded.",
+            )
+
+        handler = getattr(self, "_dynamodb_%s" % model.name, None)
+        if handler is None:
+            return _error(400, "UnknownOperationException", model.name)
+        return handler(request)
+
+    def _dynamodb_DescribeTable(self, request):
+        table = self.tables[request["TableName"]]
+        return _ok(
+            {
+                "Table": {
+                    "TableName": table.name,
+                    "TableStatus": "ACTIVE",
+                    "KeySchema": [
+                        {
+                            "AttributeName": name,
+                            "KeyType": "RANGE" if i else "HASH",
+                        }
+                        for i, name in enumerate(table.key_names)
+                    ],
+                    "AttributeDefinitions": [
+                        {"AttributeName": name, "AttributeType": "S"}
+                        for name in table.key_names
+                    ],
+                }
+            }
+        )
+
+    @staticmethod
+    def _conditions(request):
+        # Only equality conditions joined by "and", as chexus makes
+        values = request.get("ExpressionAttributeValues", {})
+        conditions = {}
+        for field in ("KeyConditionExpression", "FilterExpression"):
+            for clause in filter(None, request.get(field, "").split(" and ")):
+                name, placeholder = [
+                    part.strip() for part in clause.split("=")
+                ]
+                conditions[name] = values[placeholder]
+        return conditions
+
+    def _dynamodb_Query(self, request):
+        table = self.tables[request["TableName"]]
+        found = table.query(self._conditions(request))
+        found.sort(key=table.key_id)
+
+        start = request.get("ExclusiveStartKey")
+        if start:
+            start_id = table.key_id(start)
+            found = [item for item in found if table.key_id(item) > start_id]
+
+        parsed = {}
+        limit = request.get("Limit")
+        if limit and len(found) > limit:
+            found = found[:limit]
+            parsed["LastEvaluatedKey"] = dict(
+                (name, found[-1][name]) for name in table.key_names
+            )
+
+        parsed.update(
+            {"Items": found, "Count": len(found), "ScannedCount": len(found)}
+        )
+        return _ok(parsed)
+
+    def _dynamodb_PutItem(self, request):
+        table = self.tables[request["TableName"]]
+        item = request["Item"]
+
+        if "attribute_not_exists" in request.get("ConditionExpression", ""):
+            if table.get(item) is not None:
+                return _error(
+                    400,
+                    "ConditionalCheckFailedException",
+                    "The conditional request failed",
+                )
+
+        table.put(item)
+        return _ok()
+
+    def _dynamodb_BatchGetItem(self, request):
+        responses = {}
+        for table_name, keys in request["RequestItems"].items():
+            table = self.tables[table_name]
+            responses[table_name] = [
+                item
+                for item in (table.get(key) for key in keys["Keys"])
+                if item is not None
+            ]
+        return _ok({"Responses": responses, "UnprocessedKeys": {}})
+
+    def _dynamodb_BatchWriteItem(self, request):
+        for table_name, writes in request["RequestItems"].items():
+            table = self.tables[table_name]
+            for write in writes:
+                table.put(write["PutRequest"]["Item"])
+        return _ok({"UnprocessedItems": {}})
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""Benchmarks the time taken to import chexus and to create a Client.
+
+Each measurement is made in a fresh interpreter, so that nothing is
+already imported, and is reported net of the interpreter's own start-up.
+Also lists the heavy dependencies imported along the way, which ought
+to be deferred until the client first needs them.
+
+Run it with chexus importable, e.g. from the repository's root:
+
+    PYTHONPATH=. python benchmarks/import_time.py --output new.json \\
+        --compare old.json
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+# Dependencies whose import is deferred until first needed
+HEAVY_MODULES = ("boto3", "botocore", "more_executors", "dateutil")
+
+CASES = (
+    ("startup", "pass"),
+    ("import", "import chexus"),
+    ("client", "import chexus; chexus.Client(default_region='us-east-1')"),
+)
+
+REPORT_MODULES = (
+    "import sys; print(' '.join(m for m in %r if m in sys.modules))"
+    % (HEAVY_MODULES,)
+)
+
+
+def _time(code):
+    start = time.time()
+    subprocess.check_call([sys.executable, "-c", code])
+    return time.time() - start
+
+
+def _heavy_modules(code):
+    output = subprocess.check_output(
+        [sys.executable, "-c", "%s; %s" % (code, REPORT_MODULES)]
+    )
+    return output.decode().split()
+
+
+def measure(repeat):
+    """Returns the median time of each case, in milliseconds, along with
+    the heavy dependencies it imported.
+    """
+
+    medians = {}
+    for name, code in CASES:
+        times = sorted(_time(code) for _ in range(repeat))
+        medians[name] = times[len(times) // 2] * 1000
+
+    results = []
+    for name, code in CASES[1:]:
+        results.append(
+            {
+                "case": name,
+                "ms": medians[name] - medians["startup"],
+                "heavy_modules": _heavy_modules(code),
+            }
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the time taken to import chexus."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=11,
+        help="Number of times each case is measured.",
+    )
+    parser.add_argument(
+        "--max-ms",
+        type=float,
+        default=None,
+        help="Fail if importing chexus takes longer than this.",
+    )
+    parser.add_argument(
+        "--output", help="Path at which to save the results as JSON."
+    )
+    parser.add_argument(
+        "--compare",
+        help="Path of results previously saved, to compare against.",
+    )
+    args = parser.parse_args()
+
+    results = measure(args.repeat)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = dict(
+                (result["case"], result) for result in json.load(f)
+            )
+
+    failed = False
+    for result in results:
+        line = "%-8s %8.1f ms" % (result["case"], result["ms"])
+        before = baseline.get(result["case"])
+        if before and before["ms"]:
+            line += " %+7.1f%%" % (
+                (result["ms"] - before["ms"]) * 100.0 / before["ms"]
+            )
+        line += "  heavy modules: %s" % (
+            ", ".join(result["heavy_modules"]) or "none"
+        )
+        print(line)
+
+        if result["case"] == "import":
+            failed = bool(result["heavy_modules"]) or (
+                args.max_ms is not None and result["ms"] > args.max_ms
+            )
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if failed:
+        sys.exit("Importing chexus regressed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""Benchmarks Client operations against an in-process S3 and DynamoDB.
+
+Each operation is run at each number of items in a process of its own,
+so that the peak memory reported is that of the one operation. Results
+may be saved and compared against those saved from another version.
+
+Run it with chexus importable, e.g. from the repository's root:
+
+    PYTHONPATH=. python benchmarks/run.py --items 1000 10000 \\
+        --output new.json --compare old.json
+"""
+
+import argparse
+import hashlib
+import io
+import json
+import logging
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from chexus import BucketItem, BufferItem, Client, TableItem
+from fake_aws import FakeAWS
+
+OPERATIONS = ("upload", "upload-stream", "download", "publish", "search")
+BUCKET = "benchmark-bucket"
+TABLE = "benchmark-table"
+REGION = "us-east-1"
+
+
+def _content(index, size):
+    # Distinct content, and so checksum, for each item
+    return (("%s-" % index).encode() * size)[:size]
+
+
+def _peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # In bytes on macOS, kilobytes elsewhere
+    if sys.platform == "darwin":
+        return peak / (1024.0 * 1024.0)
+    return peak / 1024.0
+
+
+def _bench_upload(client, backend, args):
+    backend.create_bucket(BUCKET)
+    items = [
+        BufferItem(_content(i, args.size), "objects/%s" % i)
+        for i in range(args.items)
+    ]
+    return client.upload(items, BUCKET)
+
+
+def _bench_upload_stream(client, backend, args):
+    # Streams' checksums are only known once uploaded, so each object
+    # is then copied onto itself to store its checksum
+    backend.create_bucket(BUCKET)
+    items = [
+        BufferItem(io.BytesIO(_content(i, args.size)), "objects/%s" % i)
+        for i in range(args.items)
+    ]
+    return client.upload(items, BUCKET)
+
+
+def _bench_download(client, backend, args):
+    backend.create_bucket(BUCKET)
+    for i in range(args.items):
+        data = _content(i, args.size)
+        backend.put_object(
+            BUCKET,
+            "objects/%s" % i,
+            data,
+            {"sha256": hashlib.sha256(data).hexdigest()},
+        )
+
+    items = [
+        BucketItem(os.path.join(args.workdir, str(i)), key="objects/%s" % i)
+        for i in range(args.items)
+    ]
+    return client.download(items, BUCKET)
+
+
+def _bench_publish(client, backend, args):
+    backend.create_table(TABLE, ["key"])
+    items = [
+        TableItem(key="item-%s" % i, value=_content(i, 16).decode())
+        for i in range(args.items)
+    ]
+    return client.publish(items, TABLE, mode=args.publish_mode)
+
+
+def _bench_search(client, backend, args):
+    backend.create_table(TABLE, ["key"])
+    for i in range(args.items):
+        backend.put_item(TABLE, {"key": {"S": "item-%s" % i}})
+
+    def search(index):
+        start = time.time()
+        try:
+            client.search(TableItem(key="item-%s" % index), TABLE)
+        except Exception:  # pylint: disable=broad-except
+            # Searches aren't retried, so may fail when throttled
+            return None
+        return time.time() - start
+
+    # Searches are made one per call, so as many are made at once as
+    # the client has workers. Each returns its duration, or None if it
+    # failed.
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        return list(executor.map(search, range(args.items)))
+
+
+def _percentile(durations, percent):
+    durations = sorted(durations)
+    if not durations:
+        return None
+    rank = max(1, -(-percent * len(durations) // 100))
+    return durations[rank - 1]
+
+
+def run_case(args):
+    """Runs one operation at one number of items, returning its
+    results.
+    """
+
+    backend = FakeAWS(
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_rate=args.throttle_rate,
+        max_rps=args.max_rps,
+    )
+    client = Client(
+        access_id="benchmark",
+        access_key="benchmark",
+        default_region=REGION,
+        workers_count=args.workers,
+    )
+    backend.install(client._session)
+
+    bench = globals()["_bench_%s" % args.case.replace("-", "_")]
+
+    start = time.time()
+    outcome = bench(client, backend, args)
+    seconds = time.time() - start
+
+    if isinstance(outcome, list):
+        durations = [duration for duration in outcome if duration is not None]
+        failed = len(outcome) - len(durations)
+        p50, p99 = _percentile(durations, 50), _percentile(durations, 99)
+    else:
+        failed = len(outcome.failed)
+        p50, p99 = (outcome.latency_percentile(p) for p in (50, 99))
+
+    return {
+        "operation": args.case,
+        "items": args.items,
+        "seconds": seconds,
+        "items_per_second": args.items / seconds if seconds else None,
+        "p50": p50,
+        "p99": p99,
+        "peak_rss_mb": _peak_rss_mb(),
+        "failed": failed,
+        "requests": backend.requests,
+        "throttled": backend.throttled,
+    }
+
+
+def _case_command(args, operation, items, workdir):
+    command = [
+        sys.executable,
+        os.path.abspath(__file__),
+        "--case",
+        operation,
+        "--items",
+        str(items),
+        "--workdir",
+        workdir,
+    ]
+    for name in (
+        "latency",
+        "jitter",
+        "throttle_rate",
+        "max_rps",
+        "workers",
+        "size",
+        "publish_mode",
+    ):
+        value = getattr(args, name)
+        if value is not None:
+            command.extend(["--%s" % name.replace("_", "-"), str(value)])
+    return command
+
+
+def _key(result):
+    return (result["operation"], result["items"])
+
+
+def _change(new, old):
+    if new is None or not old:
+        return ""
+    return "%+.1f%%" % ((new - old) * 100.0 / old)
+
+
+def _format(value, pattern):
+    return "-" if value is None else pattern % value
+
+
+def report(results, baseline=None):
+    """Prints a table of results, with their change from a baseline's
+    results where given.
+    """
+
+    old = dict((_key(result), result) for result in baseline or [])
+    columns = (
+        ("items/s", "items_per_second", "%.1f"),
+        ("p50 ms", "p50", "%.2f"),
+        ("p99 ms", "p99", "%.2f"),
+        ("peak MB", "peak_rss_mb", "%.1f"),
+    )
+
+    header = "%-13s %8s" % ("operation", "items")
+    for title, _, _ in columns:
+        header += " %12s" % title
+        if baseline:
+            header += " %8s" % "change"
+    header += " %7s %9s" % ("failed", "throttled")
+    print(header)
+
+    for result in results:
+        line = "%-13s %8s" % (result["operation"], result["items"])
+        before = old.get(_key(result), {})
+        for _, name, pattern in columns:
+            value = result[name]
+            if name in ("p50", "p99") and value is not None:
+                value *= 1000
+            line += " %12s" % _format(value, pattern)
+            if baseline:
+                line += " %8s" % _change(result[name], before.get(name))
+        line += " %7s %9s" % (result["failed"], result["throttled"])
+        print(line)
+
+
+def main():
+    logging.basicConfig(format="%(message)s", level=logging.WARNING)
+
+    parser = argparse.ArgumentParser(
+        description="Benchmark chexus against an in-process S3 and"
+        " DynamoDB."
+    )
+    parser.add_argument(
+        "--operations",
+        nargs="+",
+        choices=OPERATIONS,
+        default=list(OPERATIONS),
+        help="Operations to benchmark.",
+    )
+    parser.add_argument(
+        "--items",
+        nargs="+",
+        type=int,
+        default=[1000, 10000, 100000],
+        help="Numbers of items to benchmark each operation with.",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.0,
+        help="Seconds each request to the backend is delayed by.",
+    )
+    parser.add_argument(
+        "--jitter",
+        type=float,
+        default=0.0,
+        help="Maximum seconds each request is further delayed by, at"
+        " random.",
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests throttled at random.",
+    )
+    parser.add_argument(
+        "--max-rps",
+        type=int,
+        default=None,
+        help="Requests per second each bucket and table serves before"
+        " throttling.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=4,
+        help="Number of the client's workers.",
+    )
+    parser.add_argument(
+        "--size",
+        type=int,
+        default=1024,
+        help="Size in bytes of each object uploaded or downloaded.",
+    )
+    parser.add_argument(
+        "--publish-mode",
+        choices=("query", "conditional", "batch"),
+        default="query",
+        help="Mode in which items are published.",
+    )
+    parser.add_argument(
+        "--output", help="Path at which to save the results as JSON."
+    )
+    parser.add_argument(
+        "--compare",
+        help="Path of results previously saved, to compare against.",
+    )
+    parser.add_argument("--case", choices=OPERATIONS, help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.case:
+        (args.items,) = args.items
+        json.dump(run_case(args), sys.stdout)
+        return
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)["results"]
+
+    results = []
+    for operation in args.operations:
+        for items in args.items:
+            workdir = tempfile.mkdtemp(prefix="chexus-benchmark-")
+            try:
+                output = subprocess.check_output(
+                    _case_command(args, operation, items, workdir)
+                )
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            results.append(json.loads(output.decode()))
+
+    report(results, baseline)
+
+    if args.output:
+        settings = dict(
+            (name, getattr(args, name))
+            for name in (
+                "latency",
+                "jitter",
+                "throttle_rate",
+                "max_rps",
+                "workers",
+                "size",
+                "publish_mode",
+            )
+        )
+        with open(args.output, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,2 +1,12 @@
-from ._impl.client import Client
-from ._impl.models import BucketItem, TableItem
+from ._impl.client import Client, RateLimit, RetryPolicy
+from ._impl.cache import ChecksumCache
+from ._impl.progress import Progress, ProgressStats
+from ._impl.report import ItemResult, Report
+from ._impl.tracing import OpenTelemetryTracer, TraceSpan, Tracer
+from ._impl.models import (
+    BucketItem,
+    BufferItem,
+    TableItem,
+    TableItemBatch,
+    TableItemSchema,
+)
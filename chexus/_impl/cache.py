@@ -0,0 +1,151 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+LOG = logging.getLogger("chexus")
+
+
+class ChecksumCache(object):
+    """A persistent cache of file checksums, stored in a single SQLite
+    database file.
+
+    Entries are keyed by a file's path along with its device, inode,
+    size and modification time, so any change to a file invalidates
+    its entry. Once the cache grows beyond its maximum size, the
+    entries least recently stored are evicted.
+
+    Args:
+        db_path (str)
+            The path to the cache's database file. The file is created
+            if it doesn't exist.
+
+        max_entries (int)
+            Maximum number of checksums kept in the cache.
+    """
+
+    def __init__(self, db_path, max_entries=1000000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checksums ("
+            "path TEXT PRIMARY KEY, device INTEGER, inode INTEGER, "
+            "size INTEGER, mtime_ns INTEGER, checksum TEXT, stored REAL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS checksums_stored "
+            "ON checksums (stored)"
+        )
+        self._conn.commit()
+
+        self._count = self._conn.execute(
+            "SELECT COUNT(*) FROM checksums"
+        ).fetchone()[0]
+
+    @staticmethod
+    def _identity(path):
+        stat = os.stat(path)
+        mtime_ns = getattr(stat, "st_mtime_ns", int(stat.st_mtime * 1e9))
+        return (
+            os.path.abspath(path),
+            stat.st_dev,
+            stat.st_ino,
+            stat.st_size,
+            mtime_ns,
+        )
+
+    def _lookup(self, identity):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT device, inode, size, mtime_ns, checksum "
+                "FROM checksums WHERE path = ?",
+                identity[:1],
+            ).fetchone()
+
+        if row and tuple(row[:4]) == identity[1:]:
+            return row[4]
+        return None
+
+    def _store(self, identity, checksum):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO checksums VALUES (?, ?, ?, ?, ?, ?, ?)",
+                identity + (checksum, time.time()),
+            )
+            # Replacing an entry overestimates the count, so recount
+            # before evicting anything
+            self._count += 1
+            if self._count > self.max_entries:
+                self._count = self._conn.execute(
+                    "SELECT COUNT(*) FROM checksums"
+                ).fetchone()[0]
+            if self._count > self.max_entries:
+                self._evict()
+            self._conn.commit()
+
+    def get(self, path):
+        """Returns the cached checksum of the file at the given path, or
+        None if there's no entry for the file as it currently is.
+        """
+
+        try:
+            return self._lookup(self._identity(path))
+        except (OSError, sqlite3.Error) as err:
+            LOG.debug("Checksum cache lookup failed for %s: %s", path, err)
+            return None
+
+    def put(self, path, checksum):
+        """Stores the checksum of the file at the given path."""
+
+        try:
+            self._store(self._identity(path), checksum)
+        except (OSError, sqlite3.Error) as err:
+            LOG.debug("Checksum cache update failed for %s: %s", path, err)
+
+    def checksum(self, path, generate):
+        """Returns the cached checksum of the file at the given path,
+        calling ``generate`` to compute and cache it if there's none.
+
+        The result isn't cached if the file changes while it's computed.
+        """
+
+        try:
+            identity = self._identity(path)
+            cached = self._lookup(identity)
+        except (OSError, sqlite3.Error) as err:
+            LOG.debug("Checksum cache lookup failed for %s: %s", path, err)
+            return generate()
+
+        if cached:
+            return cached
+
+        checksum = generate()
+
+        try:
+            if checksum and self._identity(path) == identity:
+                self._store(identity, checksum)
+        except (OSError, sqlite3.Error) as err:
+            LOG.debug("Checksum cache update failed for %s: %s", path, err)
+
+        return checksum
+
+    def _evict(self):
+        # Trim to 90% of the maximum so eviction isn't needed on every put
+        keep = int(self.max_entries * 0.9)
+        self._conn.execute(
+            "DELETE FROM checksums WHERE path IN ("
+            "SELECT path FROM checksums ORDER BY stored DESC, rowid DESC "
+            "LIMIT -1 OFFSET ?)",
+            (keep,),
+        )
+        self._count = keep
+
+    def close(self):
+        """Closes the cache's database connection."""
+
+        with self._lock:
+            self._conn.close()
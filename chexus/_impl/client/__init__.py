@@ -1 +1,3 @@
 from .client import Client
+from .ratelimit import RateLimit
+from .retry import RetryPolicy
@@ -1,13 +1,82 @@
+import calendar
+import hashlib
 import json
 import logging
+import os
+import threading
 import time
+from functools import partial
+
+from ..models import BucketItem, BufferItem, TableItem, TableItemBatch
+from ..progress import _Tracker
+from ..report import (
+    STATUS_DONE,
+    STATUS_DRYRUN,
+    STATUS_SKIPPED_EXISTS,
+    STATUS_SKIPPED_MISMATCH,
+)
+from ..tracing import _Tracing
+from .concurrency import AdaptiveLimiter
+from .download import ResumableDownload
+from .retry import RetryPolicy
+from .schema import TableSchema
 
-import boto3
-from more_executors import Executors
+LOG = logging.getLogger("chexus")
 
-from ..models import BucketItem, TableItem
+# boto3, botocore and more_executors are imported where they're first
+# needed rather than here, as importing them takes far longer than any
+# validation or dry run a short-lived caller might exit after
 
-LOG = logging.getLogger("chexus")
+# Groups of keys smaller than this are checked with one HEAD request per
+# key rather than by listing their common prefix
+HEAD_THRESHOLD = 10
+
+# Listing a group's common prefix is abandoned, leaving its keys to be
+# checked individually, once it takes more than one page of this many
+# objects per this many of the group's keys
+LIST_PAGE_SIZE = 1000
+KEYS_PER_LIST_PAGE = 10
+
+# Name of the user-defined object metadata holding an object's sha256
+CHECKSUM_METADATA = "sha256"
+
+# Accepted values of the "on_mismatch" argument to Client.upload
+MISMATCH_MODES = ("overwrite", "report")
+
+# Accepted values of the "skip_unchanged" argument to Client.download
+SKIP_UNCHANGED_MODES = ("checksum", "mtime")
+
+# Accepted values of the "direction" and "compare" arguments to Client.sync
+SYNC_DIRECTIONS = ("upload", "download")
+SYNC_COMPARISONS = ("size", "checksum")
+
+# Accepted values of the "mode" argument to Client.publish
+PUBLISH_MODES = ("query", "batch", "conditional")
+
+# Tasks kept in flight per worker when publishing a TableItemBatch,
+# bounding the number of its items held at once
+PUBLISH_WINDOW = 2
+
+# Most keys DynamoDB accepts per BatchGetItem and items per BatchWriteItem
+BATCH_GET_SIZE = 100
+BATCH_WRITE_SIZE = 25
+
+# Attempts made at a batch request before giving up on the unprocessed
+# remainder, and the base and maximum delays (in seconds) between them
+BATCH_MAX_ATTEMPTS = 8
+BATCH_BACKOFF = 0.05
+BATCH_MAX_BACKOFF = 5
+
+# Size of the connection pool of each thread's DynamoDB resource, which
+# makes one request at a time
+DYNAMODB_POOL_CONNECTIONS = 2
+
+# Number of parts large files are split into, provided the parts are no
+# smaller than the transfer configuration's chunk size
+TRANSFER_TARGET_PARTS = 1000
+
+# Size (in bytes) of the largest object S3 copies with a single request
+MAX_COPY_SIZE = 5 * 1024**3
 
 
 class Client(object):
@@ -43,6 +112,46 @@ class Client(object):
 
         retry_count (int)
             Maximum number of times to retry a failed task.
+
+        schema_ttl (float)
+            Number of seconds for which the key schemas of tables are
+            cached. If not provided, they're cached for the lifetime of
+            the client.
+
+        max_connections (int)
+            Maximum number of connections used at once for transferring
+            files to and from S3, shared between files transferred in
+            parallel and the parts of large files transferred in
+            parallel. Defaults to four per worker. Each thread's
+            connection pool to S3 is sized accordingly.
+
+        transfer_config (:class:`~boto3.s3.transfer.TransferConfig`)
+            Configuration used for every file transfer. If not
+            provided, a configuration is tuned for each file according
+            to its size and the connections available to it.
+
+        max_workers_count (int)
+            Maximum number of threads to which the tasks operating on
+            a bucket or table may grow while the service copes with
+            them. Tasks start out limited to ``workers_count`` per
+            bucket or table, a limit raised gradually while they
+            complete promptly and halved whenever the service throttles
+            them. Defaults to ``workers_count``.
+
+        retry_policy (:class:`~more_executors.RetryPolicy`)
+            Policy deciding which failed tasks are retried, and when.
+            Defaults to a :class:`~chexus.RetryPolicy` attempting tasks
+            up to ``retry_count`` times, retrying only those failing
+            with errors which may not recur.
+
+        rate_limits (dict)
+            :class:`~chexus.RateLimit` objects keyed by the name of the
+            bucket or table whose uploads, downloads, queries and puts
+            they limit.
+
+        tracer (:class:`~chexus.Tracer`)
+            If provided, receives the timing of every request made to
+            AWS and of every wait of a task to be run.
     """
 
     def __init__(
@@ -53,42 +162,531 @@ class Client(object):
         default_region=None,
         workers_count=4,
         retry_count=3,
+        schema_ttl=None,
+        max_connections=None,
+        transfer_config=None,
+        max_workers_count=None,
+        retry_policy=None,
+        rate_limits=None,
+        tracer=None,
     ):
         self._access_key_id = access_id
         self._access_key = access_key
         self._session_token = session_token
         self._default_region = default_region
 
-        self._session = boto3.Session(
-            aws_access_key_id=self._access_key_id,
-            aws_secret_access_key=self._access_key,
-            aws_session_token=self._session_token,
-            region_name=self._default_region,
+        self._tracing = _Tracing(tracer) if tracer else None
+
+        # The session and executor are created on first use
+        self._session_instance = None
+        self._executor_instance = None
+        self._init_lock = threading.Lock()
+
+        # Sessions aren't safe for creating resources from many threads
+        # at once, and resources aren't safe for sharing between threads
+        self._session_lock = threading.Lock()
+        self._local = threading.local()
+
+        max_workers_count = max(workers_count, max_workers_count or 0)
+        self._max_workers_count = max_workers_count
+        self._retry_policy = retry_policy or RetryPolicy(
+            max_attempts=retry_count
         )
 
-        self._executor = Executors.thread_pool(
-            max_workers=workers_count
-        ).with_retry(max_attempts=retry_count)
+        # Adapts the number of tasks in flight against each bucket and
+        # table to throttling by the service
+        self._limiter = AdaptiveLimiter(workers_count, max_workers_count)
+
+        self._rate_limits = dict(rate_limits or {})
+
+        self._workers_count = workers_count
+        self._max_connections = max_connections or workers_count * 4
+        self._transfer_config = transfer_config
+
+        self._schema_ttl = schema_ttl
+        self._schemas = {}
+        self._schemas_lock = threading.Lock()
+
+    @property
+    def _session(self):
+        if self._session_instance is None:
+            with self._init_lock:
+                if self._session_instance is None:
+                    import boto3
+
+                    session = boto3.Session(
+                        aws_access_key_id=self._access_key_id,
+                        aws_secret_access_key=self._access_key,
+                        aws_session_token=self._session_token,
+                        region_name=self._default_region,
+                    )
+                    if self._tracing:
+                        self._tracing.install(session)
+                    self._session_instance = session
+        return self._session_instance
+
+    @property
+    def _executor(self):
+        if self._executor_instance is None:
+            with self._init_lock:
+                if self._executor_instance is None:
+                    from more_executors import Executors
+
+                    self._executor_instance = Executors.thread_pool(
+                        max_workers=self._max_workers_count
+                    ).with_retry(retry_policy=self._retry_policy)
+        return self._executor_instance
+
+    @_executor.setter
+    def _executor(self, executor):
+        self._executor_instance = executor
+
+    def _resource(self, service_name, region_name=None):
+        """Returns the calling thread's own resource for the given
+        service, created on its first use and reused from then on.
+        """
+
+        resources = getattr(self._local, "resources", None)
+        if resources is None:
+            resources = self._local.resources = {}
+
+        key = (service_name, region_name)
+        if key not in resources:
+            pool_size = (
+                self._max_connections
+                if service_name == "s3"
+                else DYNAMODB_POOL_CONNECTIONS
+            )
+            from botocore.config import Config
+
+            with self._session_lock:
+                resources[key] = self._session.resource(
+                    service_name,
+                    region_name=region_name,
+                    config=Config(max_pool_connections=pool_size),
+                )
+
+        return resources[key]
+
+    def _bucket(self, bucket_name):
+        return self._resource("s3").Bucket(bucket_name)
+
+    def _table(self, table_name, region=None):
+        return self._resource("dynamodb", region).Table(table_name)
+
+    def _submit(self, limit_key, fn, *args):
+        """Submits fn to the executor once the limit on tasks in flight
+        for the given bucket or table allows it, returning a future for
+        its result. Tasks held back by one bucket or table's limit don't
+        occupy any of the executor's threads meanwhile.
+        """
+
+        if self._tracing:
+            # Time the task's wait to be run, including for the limit
+            task = self._tracing.task(self._trace_attributes(limit_key))
+            fn, args = self._tracing.run, (task, fn) + args
+
+        return self._limiter.submit(self._executor, limit_key, fn, *args)
 
     @staticmethod
-    def _should_upload(key, bucket):
-        if list(bucket.objects.filter(Prefix=key)):
-            LOG.info("Item already in s3 bucket")
-            return False
-        return True
+    def _trace_attributes(limit_key):
+        if limit_key[0] == "s3":
+            return {"service": "S3", "bucket": limit_key[1]}
+        return {"service": "DynamoDB", "table": limit_key[2]}
+
+    def _rate(self, name, requests=1, size=0, units=0):
+        """Waits for the rate limit of the given bucket or table, if it
+        has one, to allow the given requests, bytes and capacity units.
+        """
+
+        limit = self._rate_limits.get(name)
+        if limit:
+            limit.acquire(requests, size, units)
+
+    def _capacity_args(self, name):
+        # Only have DynamoDB report the capacity consumed by requests
+        # when it's limited
+        limit = self._rate_limits.get(name)
+        if limit and limit.limits_units:
+            return {"ReturnConsumedCapacity": "TOTAL"}
+        return {}
+
+    def _charge(self, name, response, estimate):
+        """Corrects the capacity units acquired for a request by the
+        estimate given to those it consumed.
+        """
+
+        limit = self._rate_limits.get(name)
+        if not limit or not limit.limits_units:
+            return
+
+        consumed = response.get("ConsumedCapacity") or []
+        if isinstance(consumed, dict):
+            consumed = [consumed]
+        limit.charge(
+            sum(float(c.get("CapacityUnits", 0)) for c in consumed) - estimate
+        )
+
+    @staticmethod
+    def _write_units(attrs):
+        # Writes consume a unit per KB of the item written
+        size = len(json.dumps(attrs, default=str))
+        return max(1, (size + 1023) // 1024)
+
+    def _rate_upload(self, bucket_name, size, config):
+        if bucket_name not in self._rate_limits:
+            return
+
+        requests = 1
+        if size and size >= config.multipart_threshold:
+            # Starting and completing the upload, and each part
+            requests = 2 + -(-size // config.multipart_chunksize)
+        self._rate(bucket_name, requests, size or 0)
+
+    def _tuned_transfer_config(self, size=None, files_count=1):
+        """Returns a TransferConfig for a file of the given size, one of
+        the given number of files being transferred.
+
+        The connection budget is divided evenly between the files
+        transferred at once, which one worker each transfers. Files too
+        small to be split into parts are transferred without spawning
+        any threads.
+        """
+
+        from boto3.s3.transfer import TransferConfig
+
+        if self._transfer_config:
+            return self._transfer_config
+
+        config = TransferConfig()
+
+        if size is not None and size < config.multipart_threshold:
+            config.use_threads = False
+            return config
+
+        concurrent_files = max(1, min(self._workers_count, files_count))
+        config.max_concurrency = max(
+            1, self._max_connections // concurrent_files
+        )
+
+        if size:
+            # Fewer, larger parts for very large files
+            config.multipart_chunksize = max(
+                config.multipart_chunksize, size // TRANSFER_TARGET_PARTS
+            )
+
+        return config
+
+    @staticmethod
+    def _head_object(key, bucket):
+        from botocore.exceptions import ClientError
+
+        obj = bucket.Object(key)
+        try:
+            obj.load()
+        except ClientError as err:
+            if err.response.get("Error", {}).get("Code") in (
+                "404",
+                "NoSuchKey",
+            ):
+                return None
+            raise
+        return obj
+
+    @staticmethod
+    def _list_keys(prefix, bucket, max_keys):
+        """Returns the keys of the objects under the given prefix, or
+        None if there are more than max_keys of them.
+        """
+
+        keys = set()
+        # The objects collection transparently follows pagination
+        for obj in bucket.objects.filter(Prefix=prefix):
+            if len(keys) >= max_keys:
+                return None
+            keys.add(obj.key)
+        return keys
+
+    def _list_group(self, group, prefix, bucket_name):
+        self._rate(bucket_name)
+        max_pages = len(group) // KEYS_PER_LIST_PAGE
+        present = self._list_keys(
+            prefix, self._bucket(bucket_name), max_pages * LIST_PAGE_SIZE
+        )
+        if present is None:
+            LOG.debug(
+                "Too many objects under '%s', checking items individually",
+                prefix,
+            )
+            return {}
+        return dict((key, key in present) for key in group)
+
+    @staticmethod
+    def _list_group_failed(exception):
+        # Fall back to checking each key on its own
+        LOG.warning(
+            "Failed to list bucket contents, checking items individually"
+            "\n\t%s",
+            exception,
+        )
+        return {}
+
+    @staticmethod
+    def _merge_dicts(dicts):
+        merged = {}
+        for dct in dicts:
+            merged.update(dct)
+        return merged
+
+    def _existing_keys(self, keys, bucket_name):
+        """Resolves which of the given keys are present in the bucket.
+
+        Keys are grouped by their parent "directory" and each group large
+        enough to warrant it is resolved with a listing of the group's
+        longest common prefix. Groups without a common prefix, such as
+        keys at the root of the bucket, aren't listed, nor are those
+        whose prefix turns out to hold many more objects than the group
+        has keys. Returns a future for a dictionary of keys to their
+        presence; keys omitted from the dictionary are left to be
+        checked individually.
+        """
+
+        groups = {}
+        for key in set(keys):
+            groups.setdefault(key.rpartition("/")[0], []).append(key)
+
+        from more_executors.futures import f_map, f_sequence
+
+        list_fts = []
+        for group in groups.values():
+            prefix = os.path.commonprefix(group)
+            if len(group) < HEAD_THRESHOLD or not prefix:
+                continue
+            list_fts.append(
+                f_map(
+                    self._submit(
+                        ("s3", bucket_name),
+                        self._list_group,
+                        group,
+                        prefix,
+                        bucket_name,
+                    ),
+                    error_fn=self._list_group_failed,
+                )
+            )
+
+        return f_map(f_sequence(list_fts), self._merge_dicts)
+
+    @staticmethod
+    def _log_errors(action, errs):
+        # Report any failures as errors -- raising them could prevent
+        # other items from being processed
+        errs = [err for err in errs if err]
+        if errs:
+            LOG.error(
+                "One or more exceptions occurred during %s\n\t%s",
+                action,
+                "\n\t".join(str(err) for err in errs),
+            )
+
+        LOG.info("%s complete", action.capitalize())
+
+    def _collect(self, fts, action, tracker):
+        """Returns a future for the operation's Report, resolved once all
+        of the given futures are done, having logged any exceptions
+        raised by them.
+        """
+
+        from more_executors.futures import f_map, f_sequence
+
+        errs_ft = f_sequence(
+            [f_map(ft, lambda _: None, error_fn=lambda err: err) for ft in fts]
+        )
+        done_ft = f_map(errs_ft, partial(self._log_errors, action))
+        return f_map(done_ft, tracker.close)
+
+    def _submit_tracked(self, tracker, items, limit_key, fn, *args):
+        """Like _submit, reporting the progress of the given items, which
+        fn processes, to the tracker.
+        """
+
+        ft = self._submit(limit_key, tracker.run, items, fn, *args)
+        tracker.watch(ft, items)
+        return ft
+
+    @staticmethod
+    def _upload_args(item):
+        extra_args = dict(item.content_type)
+        if item.checksum:
+            extra_args["Metadata"] = {CHECKSUM_METADATA: item.checksum}
+        return extra_args
+
+    @staticmethod
+    def _wrong_type(item, expected):
+        message = "Expected type '%s', got '%s' instead" % (
+            expected,
+            type(item),
+        )
+        LOG.error(message)
+        return ValueError(message)
+
+    @staticmethod
+    def _item_size(item):
+        if isinstance(item, BufferItem):
+            return item.size
+        if not isinstance(item, BucketItem):
+            return None
+        try:
+            return os.path.getsize(item.path)
+        except OSError:
+            # Left to fail when uploaded
+            return None
 
-    def _do_upload(self, item, bucket):
-        if not self._should_upload(item.key, bucket):
+    @staticmethod
+    def _transfer_args(config, callback):
+        args = {"Config": config}
+        if callback:
+            args["Callback"] = callback
+        return args
+
+    def _upload_buffer(self, item, bucket, files_count, callback=None):
+        config = self._tuned_transfer_config(item.size, files_count)
+        self._rate_upload(bucket.name, item.size, config)
+
+        if item.checksum:
+            bucket.upload_fileobj(
+                item.open(),
+                item.key,
+                ExtraArgs=self._upload_args(item),
+                **self._transfer_args(config, callback)
+            )
             return
 
+        # A stream's checksum is only known once it's been read, so it's
+        # hashed while uploading and stored by copying the object onto
+        # itself, which transfers no data through the client
+        reader = item._hashing_reader()
+        bucket.upload_fileobj(
+            reader,
+            item.key,
+            ExtraArgs=dict(item.content_type),
+            **self._transfer_args(config, callback)
+        )
+        item.checksum = reader.hexdigest()
+
+        self._rate(bucket.name)
+        bucket.copy(
+            {"Bucket": bucket.name, "Key": item.key},
+            item.key,
+            ExtraArgs=dict(
+                self._upload_args(item), MetadataDirective="REPLACE"
+            ),
+            Config=self._copy_config(config),
+        )
+
+    @staticmethod
+    def _copy_config(config):
+        """Returns a copy of the given TransferConfig copying objects with
+        a single request wherever S3 allows, and in parts otherwise.
+        """
+
+        from boto3.s3.transfer import TransferConfig
+
+        return TransferConfig(
+            multipart_threshold=MAX_COPY_SIZE,
+            multipart_chunksize=max(
+                config.multipart_chunksize, MAX_COPY_SIZE // 10
+            ),
+            max_concurrency=config.max_concurrency,
+            use_threads=config.use_threads,
+        )
+
+    def _do_upload(
+        self,
+        item,
+        bucket_name,
+        exists=None,
+        on_mismatch=None,
+        files_count=1,
+        callback=None,
+    ):
+        bucket = self._bucket(bucket_name)
+
+        obj = None
+        if exists is None or (exists and on_mismatch):
+            self._rate(bucket_name)
+            obj = self._head_object(item.key, bucket)
+            exists = obj is not None
+
+        if exists and not on_mismatch:
+            LOG.info("Item already in s3 bucket")
+            return STATUS_SKIPPED_EXISTS
+
+        if exists:
+            remote_checksum = (obj.metadata or {}).get(CHECKSUM_METADATA)
+            # A stream's checksum isn't known until it's uploaded, so it
+            # can't be found to match
+            if item.checksum and remote_checksum == item.checksum:
+                LOG.info("Item already in s3 bucket")
+                return STATUS_SKIPPED_EXISTS
+
+            if on_mismatch == "report" and not item.checksum:
+                LOG.error(
+                    "Can't verify %s in s3 bucket, its checksum is unknown "
+                    "until uploaded",
+                    item.key,
+                )
+                return STATUS_SKIPPED_MISMATCH
+
+            if on_mismatch == "report":
+                LOG.error(
+                    "Checksum mismatch for %s in s3 bucket, "
+                    "expected '%s' but found '%s'",
+                    item.key,
+                    item.checksum,
+                    remote_checksum,
+                )
+                return STATUS_SKIPPED_MISMATCH
+
+            LOG.info("Checksum mismatch for %s, replacing...", item.key)
+
         LOG.info("Uploading %s...", item.name)
 
-        bucket.upload_file(item.path, item.key, ExtraArgs=item.content_type)
+        if isinstance(item, BufferItem):
+            self._upload_buffer(item, bucket, files_count, callback)
+            return
+
+        size = os.path.getsize(item.path)
+        config = self._tuned_transfer_config(size, files_count)
+        self._rate_upload(bucket_name, size, config)
 
-    def upload(self, items, bucket_name, dryrun=False):
+        bucket.upload_file(
+            item.path,
+            item.key,
+            ExtraArgs=self._upload_args(item),
+            **self._transfer_args(config, callback)
+        )
+
+    def upload(
+        self,
+        items,
+        bucket_name,
+        dryrun=False,
+        on_mismatch=None,
+        progress=None,
+    ):
         """Efficiently uploads files into the specified S3 bucket
         without risk of overwriting or duplicating data.
 
+        Each file's checksum is stored in the uploaded object's
+        metadata so that later uploads may verify existing objects
+        without downloading them. The checksum of a
+        :class:`~chexus.BufferItem` reading a stream is only known once
+        it's been uploaded, so it's stored by then copying the object
+        onto itself within S3, an extra request, or several for objects
+        over 5 GB. Until the copy is done, the object is in the bucket
+        without its checksum, and if the copy fails the item fails.
+
         Args:
             items (:class:`~chexus.BucketItem`, list)
                 One or more representations of an item to upload to the
@@ -100,24 +698,68 @@ class Client(object):
 
             dryrun (bool)
                 If true, only log what would be uploaded.
+
+            on_mismatch (str)
+                How to treat objects already present in the bucket whose
+                stored checksum differs from the item's, or is missing.
+                "overwrite" replaces such objects, "report" logs them as
+                errors and leaves them be. Objects with a matching
+                checksum are always left alone. A stream's checksum
+                isn't known until it's uploaded, so existing objects
+                are never found to match a :class:`~chexus.BufferItem`
+                reading one. If not provided, existing objects are
+                skipped without being compared.
+
+            progress (:class:`~chexus.Progress`)
+                If provided, receives the progress of each item and of
+                the upload as a whole.
+
+        Returns:
+            :class:`~chexus.Report`
+                The outcome of each item.
+        """
+
+        return self.upload_async(
+            items, bucket_name, dryrun, on_mismatch, progress
+        ).result()
+
+    def upload_async(
+        self,
+        items,
+        bucket_name,
+        dryrun=False,
+        on_mismatch=None,
+        progress=None,
+    ):
+        """Like :meth:`upload`, but returns without waiting for the
+        upload to complete.
+
+        Returns:
+            :class:`~concurrent.futures.Future`
+                A future for the :class:`~chexus.Report` of the upload,
+                resolved once every item has been processed.
         """
 
+        if on_mismatch is not None and on_mismatch not in MISMATCH_MODES:
+            raise ValueError(
+                "Expected 'on_mismatch' to be one of %s, got '%s' instead"
+                % (", ".join(MISMATCH_MODES), on_mismatch)
+            )
+
         # Coerce items to list
         if not isinstance(items, (list, tuple)):
             items = [items]
         if isinstance(items, tuple):
             items = list(items)
 
-        bucket = self._session.resource("s3").Bucket(bucket_name)
-
         LOG.info("Starting upload...")
 
-        upload_fts = []
+        tracker = _Tracker(progress, items, self._item_size)
+
+        upload_items = []
         for item in items:
             if not isinstance(item, BucketItem):
-                LOG.error(
-                    "Expected type 'BucketItem', got '%s' instead", type(item)
-                )
+                tracker.finish([item], [self._wrong_type(item, "BucketItem")])
                 continue
 
             if dryrun:
@@ -126,32 +768,139 @@ class Client(object):
                     item.name,
                     bucket_name,
                 )
+                tracker.finish([item], [STATUS_DRYRUN])
                 continue
 
-            upload_fts.append(
-                self._executor.submit(self._do_upload, item, bucket)
-            )
+            upload_items.append(item)
 
-        # Block until all futures have completed
-        # Not using concurrent.futures.as_completed() due to Python 2.7
-        while not all([ft.done() for ft in upload_fts]):
-            time.sleep(1)
+        def submit_uploads(existing):
+            upload_fts = [
+                self._submit_tracked(
+                    tracker,
+                    [item],
+                    ("s3", bucket_name),
+                    self._do_upload,
+                    item,
+                    bucket_name,
+                    existing.get(item.key),
+                    on_mismatch,
+                    len(upload_items),
+                    tracker.callback(item),
+                )
+                for item in upload_items
+            ]
+            return self._collect(upload_fts, "upload", tracker)
 
-        # Report any upload failures as errors -- raising them could
-        # prevent other files from uploading
-        upload_errs = [ft.exception() for ft in upload_fts]
-        # List of errors can contain None types, which aren't helpful
-        if [err for err in upload_errs if err]:
-            LOG.error(
-                "One or more exceptions occurred during upload\n\t%s",
-                "\n\t".join(str(err) for err in upload_errs),
-            )
+        existing_ft = self._existing_keys(
+            [item.key for item in upload_items], bucket_name
+        )
+
+        from more_executors.futures import f_flat_map
+
+        return f_flat_map(existing_ft, submit_uploads)
+
+    @staticmethod
+    def _mtime(obj):
+        return calendar.timegm(obj.last_modified.utctimetuple())
+
+    @staticmethod
+    def _md5(path):
+        md5 = hashlib.md5()
+        with open(path, "rb") as binary:
+            while True:
+                chunk = binary.read(1024 * 1024)
+                if not chunk:
+                    break
+                md5.update(chunk)
+        return md5.hexdigest()
+
+    def _local_copy_matches(self, item, obj, mode):
+        if not os.path.isfile(item.path):
+            return False
+
+        if os.path.getsize(item.path) != obj.content_length:
+            return False
+
+        if mode == "mtime":
+            # Downloads are given their object's modification time
+            return int(os.path.getmtime(item.path)) == self._mtime(obj)
+
+        remote_checksum = (obj.metadata or {}).get(CHECKSUM_METADATA)
+        if remote_checksum:
+            return item._generate_checksum() == remote_checksum
+
+        # The ETags of objects not uploaded in parts are their MD5 sums
+        etag = (obj.e_tag or "").strip('"')
+        if etag and "-" not in etag:
+            return self._md5(item.path) == etag
+
+        return False
+
+    def _do_download(
+        self,
+        item,
+        bucket_name,
+        files_count=1,
+        skip_unchanged=None,
+        callback=None,
+    ):
+        obj = self._bucket(bucket_name).Object(item.key)
+
+        # Attributes of the object are loaded on first access
+        self._rate(bucket_name)
+
+        if skip_unchanged and self._local_copy_matches(
+            item, obj, skip_unchanged
+        ):
+            LOG.info("%s is already up to date", item.path)
+            return STATUS_SKIPPED_EXISTS
+
+        LOG.info("Downloading %s...", item.name)
+
+        config = self._tuned_transfer_config(files_count=files_count)
 
-        LOG.info("Upload complete")
+        # Only a checksum given for the item is expected of the object,
+        # one computed from a file already at its path is not
+        expected_checksum = item._given_checksum or (obj.metadata or {}).get(
+            CHECKSUM_METADATA
+        )
+
+        download = ResumableDownload(
+            obj,
+            item.path,
+            expected_checksum=expected_checksum,
+            range_size=config.multipart_chunksize,
+            max_concurrency=config.max_concurrency,
+            callback=callback,
+        )
+
+        size = obj.content_length
+        self._rate(
+            bucket_name,
+            max(1, -(-size // config.multipart_chunksize)),
+            size,
+        )
+        item.checksum = download.run()
+
+        mtime = self._mtime(obj)
+        os.utime(item.path, (mtime, mtime))
 
-    def download(self, items, bucket_name, dryrun=False):
+    def download(
+        self,
+        items,
+        bucket_name,
+        dryrun=False,
+        skip_unchanged=None,
+        progress=None,
+    ):
         """Efficiently downloads files from the specified S3 bucket.
 
+        Files are downloaded in ranges fetched in parallel, resuming any
+        download previously interrupted, and are only moved into place
+        once verified against the item's checksum, if given, or else
+        the checksum stored with the object on upload. Downloaded files
+        are given the modification time of their object.
+
         Args:
             items (:class:`~chexus.BucketItem`, list)
                 One or more representations of an item to download from
@@ -163,24 +912,77 @@ class Client(object):
 
             dryrun (bool)
                 If true, only log what would be downloaded.
+
+            skip_unchanged (str)
+                If provided, files already at an item's path are left as
+                they are when found to be identical to the object.
+                "checksum" compares the file's checksum to the checksum
+                stored with the object, or its MD5 sum to the object's
+                ETag. "mtime" compares the file's size and modification
+                time to the object's, avoiding reading the file.
+
+            progress (:class:`~chexus.Progress`)
+                If provided, receives the progress of each item and of
+                the download as a whole.
+
+        Returns:
+            :class:`~chexus.Report`
+                The outcome of each item.
+        """
+
+        return self.download_async(
+            items, bucket_name, dryrun, skip_unchanged, progress
+        ).result()
+
+    def download_async(
+        self,
+        items,
+        bucket_name,
+        dryrun=False,
+        skip_unchanged=None,
+        progress=None,
+    ):
+        """Like :meth:`download`, but returns without waiting for the
+        download to complete.
+
+        Returns:
+            :class:`~concurrent.futures.Future`
+                A future for the :class:`~chexus.Report` of the download,
+                resolved once every item has been processed.
         """
 
+        if (
+            skip_unchanged is not None
+            and skip_unchanged not in SKIP_UNCHANGED_MODES
+        ):
+            raise ValueError(
+                "Expected 'skip_unchanged' to be one of %s, got '%s' instead"
+                % (", ".join(SKIP_UNCHANGED_MODES), skip_unchanged)
+            )
+
         # Coerce items to list
         if not isinstance(items, (list, tuple)):
             items = [items]
         if isinstance(items, tuple):
             items = list(items)
 
-        bucket = self._session.resource("s3").Bucket(bucket_name)
-
         LOG.info("Starting download...")
 
-        download_fts = []
+        # Sizes of objects aren't known until each is downloaded
+        tracker = _Tracker(progress, items)
+
+        download_items = []
         for item in items:
             if not isinstance(item, BucketItem):
-                LOG.error(
-                    "Expected type 'BucketItem', got '%s' instead", type(item)
+                tracker.finish([item], [self._wrong_type(item, "BucketItem")])
+                continue
+
+            if isinstance(item, BufferItem):
+                message = (
+                    "Can't download %s, items must have a path" % item.key
                 )
+                LOG.error(message)
+                tracker.finish([item], [ValueError(message)])
                 continue
 
             if dryrun:
@@ -189,66 +991,342 @@ class Client(object):
                     item.name,
                     bucket_name,
                 )
+                tracker.finish([item], [STATUS_DRYRUN])
                 continue
 
-            LOG.info("Downloading %s...", item.name)
-            download_fts.append(
-                self._executor.submit(
-                    bucket.download_file, item.key, item.path
-                )
+            download_items.append(item)
+
+        download_fts = [
+            self._submit_tracked(
+                tracker,
+                [item],
+                ("s3", bucket_name),
+                self._do_download,
+                item,
+                bucket_name,
+                len(download_items),
+                skip_unchanged,
+                tracker.callback(item),
             )
+            for item in download_items
+        ]
 
-        # Block until all futures have completed
-        # Not using concurrent.futures.as_completed() due to Python 2.7
-        while not all([ft.done() for ft in download_fts]):
-            time.sleep(1)
+        return self._collect(download_fts, "download", tracker)
 
-        # Report any download failures as errors -- raising them could
-        # prevent other files from being downloaded
-        upload_errs = [ft.exception() for ft in download_fts]
-        # Filter possible NoneTypes
-        if [err for err in upload_errs if err]:
-            LOG.error(
-                "One or more exceptions occurred during download\n\t%s",
-                "\n\t".join(str(err) for err in upload_errs),
-            )
+    @staticmethod
+    def _walk_files(root):
+        """Yields the path, relative to root, and size of every file
+        under root.
+        """
+
+        scandir = getattr(os, "scandir", None)
+        if not scandir:
+            for dir_path, _, file_names in os.walk(root):
+                for file_name in file_names:
+                    path = os.path.join(dir_path, file_name)
+                    yield os.path.relpath(path, root), os.path.getsize(path)
+            return
 
-        LOG.info("Download complete")
+        rel_dirs = [""]
+        while rel_dirs:
+            rel_dir = rel_dirs.pop()
+            for entry in scandir(os.path.join(root, rel_dir)):
+                rel_path = os.path.join(rel_dir, entry.name)
+                if entry.is_dir(follow_symlinks=False):
+                    rel_dirs.append(rel_path)
+                elif entry.is_file():
+                    yield rel_path, entry.stat().st_size
 
     @staticmethod
-    def _search_table_item(item, table):
-        expr_vals = {}
-        key_exprs = []
-        fil_exprs = []
-
-        for key, value in item.attrs.items():
-            expr_vals.update({":%sval" % key: "%s" % value})
-            if key in [
-                str(a["AttributeName"]) for a in table.attribute_definitions
-            ]:
-                key_exprs.append("%s = :%sval" % (key, key))
+    def _within(path, directory):
+        """Returns True if the given path, once normalized, is inside the
+        given directory.
+        """
+
+        path = os.path.abspath(path)
+        directory = os.path.join(os.path.abspath(directory), "")
+        return path.startswith(directory)
+
+    def _do_sync_upload(
+        self, item, bucket_name, exists, files_count, callback
+    ):
+        # Objects lacking a stored checksum, e.g. uploaded by other
+        # tools, may still be compared by their ETag
+        if exists:
+            self._rate(bucket_name)
+            obj = self._head_object(item.key, self._bucket(bucket_name))
+            if obj is not None and self._local_copy_matches(
+                item, obj, "checksum"
+            ):
+                LOG.info("%s is already up to date", item.key)
+                return STATUS_SKIPPED_EXISTS
+        return self._do_upload(
+            item, bucket_name, False, None, files_count, callback
+        )
+
+    def _do_sync_download(self, item, *args):
+        # Files may be synced into directories which don't exist yet, or
+        # which another worker has just created
+        try:
+            os.makedirs(os.path.dirname(item.path))
+        except OSError:
+            if not os.path.isdir(os.path.dirname(item.path)):
+                raise
+        return self._do_download(item, *args)
+
+    def _list_sizes(self, prefix, bucket_name):
+        self._rate(bucket_name)
+        objects = self._bucket(bucket_name).objects.filter(Prefix=prefix)
+        return dict((obj.key, obj.size) for obj in objects)
+
+    def sync(
+        self,
+        local_dir,
+        bucket_name,
+        prefix="",
+        direction="upload",
+        compare="size",
+        dryrun=False,
+        progress=None,
+    ):
+        """Mirrors a local directory to a prefix of the specified S3
+        bucket, or the other way round.
+
+        The directory is walked and the prefix listed once, and only
+        files missing from the destination or differing from their
+        counterpart are transferred. Files missing from the source are
+        left as they are. Objects whose keys would lead outside of the
+        directory, e.g. by containing "..", fail without being
+        downloaded.
+
+        Args:
+            local_dir (str)
+                The path to the local directory.
+
+            bucket_name (str)
+                The name of the bucket.
+
+            prefix (str)
+                The prefix of the keys of objects mirroring the
+                directory's files, e.g., "repo/os".
+
+            direction (str)
+                "upload" to mirror the directory to the bucket,
+                "download" to mirror the bucket to the directory.
+
+            compare (str)
+                How files present in both places are compared. "size"
+                transfers only those whose sizes differ. "checksum"
+                also compares the checksums of those of equal size, or
+                for objects without a stored checksum, the MD5 sums of
+                those not uploaded in parts with their ETags.
+
+            dryrun (bool)
+                If true, only log what would be transferred.
+
+            progress (:class:`~chexus.Progress`)
+                If provided, receives the progress of each file
+                transferred and of the sync as a whole.
+
+        Returns:
+            :class:`~chexus.Report`
+                The outcome of each file found to need transferring.
+        """
+
+        if direction not in SYNC_DIRECTIONS:
+            raise ValueError(
+                "Expected 'direction' to be one of %s, got '%s' instead"
+                % (", ".join(SYNC_DIRECTIONS), direction)
+            )
+        if compare not in SYNC_COMPARISONS:
+            raise ValueError(
+                "Expected 'compare' to be one of %s, got '%s' instead"
+                % (", ".join(SYNC_COMPARISONS), compare)
+            )
+
+        prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+
+        LOG.info("Starting sync...")
+
+        local_sizes = {}
+        if os.path.isdir(local_dir):
+            for rel_path, size in self._walk_files(local_dir):
+                key = prefix + rel_path.replace(os.sep, "/")
+                local_sizes[key] = size
+
+        remote_sizes = self._submit(
+            ("s3", bucket_name), self._list_sizes, prefix, bucket_name
+        ).result()
+
+        if direction == "upload":
+            sources, destinations = local_sizes, remote_sizes
+        else:
+            sources, destinations = remote_sizes, local_sizes
+
+        transfers = []
+        for key in sorted(sources):
+            if key.endswith("/"):
+                # Directory placeholder objects
+                continue
+
+            exists = key in destinations
+            if exists and sources[key] == destinations[key]:
+                if compare == "size":
+                    continue
             else:
-                fil_exprs.append("%s = :%sval" % (key, key))
+                # Missing or changed, either way transfer it
+                exists = False
+
+            path = os.path.join(local_dir, *key[len(prefix) :].split("/"))
+            transfers.append((BucketItem(path, key=key), exists))
+
+        tracker = _Tracker(progress, [item for item, _ in transfers])
 
-        criteria = {
-            "ExpressionAttributeValues": expr_vals,
-            "KeyConditionExpression": " and ".join(key_exprs),
-            "Select": "ALL_ATTRIBUTES",
-        }
+        submitted = []
+        for item, exists in transfers:
+            key = item.key
 
-        if fil_exprs:
-            criteria.update({"FilterExpression": " and ".join(fil_exprs)})
+            if direction == "download" and not self._within(
+                item.path, local_dir
+            ):
+                message = "Can't download %s, its path is outside of %s" % (
+                    key,
+                    local_dir,
+                )
+                LOG.error(message)
+                tracker.finish([item], [ValueError(message)])
+                continue
 
+            if dryrun:
+                LOG.info(
+                    "Would %s %s %s the '%s' bucket",
+                    direction,
+                    key,
+                    "to" if direction == "upload" else "from",
+                    bucket_name,
+                )
+                tracker.finish([item], [STATUS_DRYRUN])
+                continue
+
+            submitted.append((item, exists))
+
+        sync_fts = []
+        for item, exists in submitted:
+            if direction == "upload":
+                sync_fts.append(
+                    self._submit_tracked(
+                        tracker,
+                        [item],
+                        ("s3", bucket_name),
+                        self._do_sync_upload,
+                        item,
+                        bucket_name,
+                        exists,
+                        len(submitted),
+                        tracker.callback(item),
+                    )
+                )
+            else:
+                sync_fts.append(
+                    self._submit_tracked(
+                        tracker,
+                        [item],
+                        ("s3", bucket_name),
+                        self._do_sync_download,
+                        item,
+                        bucket_name,
+                        len(submitted),
+                        "checksum" if exists else None,
+                        tracker.callback(item),
+                    )
+                )
+
+        return self._collect(sync_fts, "sync", tracker).result()
+
+    def _table_schema(self, table):
+        """Returns the key schema of the given Table resource, describing
+        the table only if it isn't already cached.
+        """
+
+        cache_key = (table.meta.client.meta.region_name, table.name)
+        now = time.time()
+
+        with self._schemas_lock:
+            cached = self._schemas.get(cache_key)
+        if cached and (cached[1] is None or cached[1] > now):
+            return cached[0]
+
+        schema = TableSchema.from_table(table)
+        expiry = now + self._schema_ttl if self._schema_ttl else None
+
+        with self._schemas_lock:
+            self._schemas[cache_key] = (schema, expiry)
+
+        return schema
+
+    def _search_table_item(self, item, table):
+        criteria = self._table_schema(table).query_criteria(item)
+        criteria.update(self._capacity_args(table.name))
+
+        # Queries consume at least a unit, correct it once known
+        self._rate(table.name, units=1)
         response = table.query(**criteria)
+        self._charge(table.name, response, 1)
 
         if "LastEvaluatedKey" in response:
             LOG.warning(
                 "Query limit reached, results truncated\n"
-                "Consider increasing uniqueness of key(s)"
+                "Consider increasing uniqueness of key(s) or using "
+                "search_iter"
             )
 
         return response
 
+    def _search_table_pages(self, item, table, page_size=None, max_items=None):
+        criteria = self._table_schema(table).query_criteria(item)
+        criteria.update(self._capacity_args(table.name))
+        if page_size:
+            criteria["Limit"] = page_size
+
+        found = 0
+        while True:
+            if max_items is not None:
+                # Evaluate no more items than are still wanted
+                criteria["Limit"] = min(
+                    page_size or max_items, max_items - found
+                )
+
+            self._rate(table.name, units=1)
+            response = table.query(**criteria)
+            self._charge(table.name, response, 1)
+            yield response
+
+            found += len(response["Items"])
+            if "LastEvaluatedKey" not in response:
+                return
+            if max_items is not None and found >= max_items:
+                return
+            criteria["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    def _search_table_items(
+        self, item, table_name, region, page_size, max_items
+    ):
+        if max_items is not None and max_items <= 0:
+            return
+
+        # Resolved here so the table belongs to the consuming thread
+        table = self._table(table_name, region)
+
+        count = 0
+        pages = self._search_table_pages(item, table, page_size, max_items)
+        for response in pages:
+            for found in response["Items"]:
+                count += 1
+                yield found
+
+                if count == max_items:
+                    return
+
     def search(self, item, table_name, region=None):
         """Queries the specified table for an item matching the given
         TableItem.
@@ -272,31 +1350,81 @@ class Client(object):
                 "Expected type 'TableItem', got '%s' instead" % type(item)
             )
 
-        table = self._session.resource("dynamodb", region_name=region).Table(
-            table_name
+        return self._search_table_item(item, self._table(table_name, region))
+
+    def search_iter(
+        self, item, table_name, region=None, page_size=None, max_items=None
+    ):
+        """Lazily iterates over every item in the specified table
+        matching the given TableItem.
+
+        Unlike :meth:`search`, results aren't truncated to the first
+        page of the query. Each following page is only requested once
+        the items of the previous one have been consumed.
+
+        Args:
+            item (:class:`~chexus.TableItem`)
+                A representation of a DynamoDB table item.
+
+            table_name (str)
+                The name of the table to search.
+
+            region (str)
+                The name of the AWS region the desired table belongs
+                to. If not provided here or to the calling client,
+                attempts to find it among environment variables and
+                configuration files will be made.
+
+            page_size (int)
+                Maximum number of items evaluated per query request.
+
+            max_items (int)
+                Maximum number of items to yield.
+
+        Returns:
+            generator
+                Matching items, as dictionaries.
+        """
+
+        if not isinstance(item, TableItem):
+            raise ValueError(
+                "Expected type 'TableItem', got '%s' instead" % type(item)
+            )
+
+        return self._search_table_items(
+            item, table_name, region, page_size, max_items
         )
 
-        return self._search_table_item(item, table)
+    @staticmethod
+    def _missing_key(name):
+        LOG.error("Item to publish is missing required key, '%s'", name)
+        return ValueError(
+            "Item to publish is missing required key, '%s'" % name
+        )
+
+    def _skip_publish(self, item, table):
+        """Returns the outcome of an item which shouldn't be published,
+        or None if it should be.
+        """
 
-    def _should_publish(self, item, table):
-        for att in [
-            str(a["AttributeName"]) for a in table.attribute_definitions
-        ]:
+        for att in self._table_schema(table).key_names:
             if not hasattr(item, att) or not getattr(item, att):
-                LOG.error("Item to publish is missing required key, '%s'", att)
-                return False
+                return self._missing_key(att)
 
         response = self._search_table_item(item, table)
 
         if response["Items"]:
             LOG.info("Item already exists in table")
-            return False
+            return STATUS_SKIPPED_EXISTS
 
-        return True
+        return None
 
-    def _do_publish(self, item, table):
-        if not self._should_publish(item, table):
-            return
+    def _do_publish(self, item, table_name, region):
+        table = self._table(table_name, region)
+
+        skipped = self._skip_publish(item, table)
+        if skipped:
+            return skipped
 
         LOG.info(
             "Putting the following item into the '%s' table;\n\t%s",
@@ -304,16 +1432,201 @@ class Client(object):
             json.dumps(item.attrs, sort_keys=True, indent=4),
         )
 
-        table.put_item(Item=item.attrs)
+        units = self._write_units(item.attrs)
+        self._rate(table.name, units=units)
+        response = table.put_item(
+            Item=item.attrs, **self._capacity_args(table.name)
+        )
+        self._charge(table.name, response, units)
+
+    def _do_publish_conditional(self, item, table_name, region):
+        table = self._table(table_name, region)
+        key_names = self._table_schema(table).key_names
+
+        for name in key_names:
+            if not item.attrs.get(name):
+                return self._missing_key(name)
 
-    def publish(self, items, table_name, region=None, dryrun=False):
+        LOG.info(
+            "Putting the following item into the '%s' table;\n\t%s",
+            table.name,
+            json.dumps(item.attrs, sort_keys=True, indent=4),
+        )
+
+        # Only write if no item with the same key exists, leaving the
+        # existence check to DynamoDB in the same request
+        from botocore.exceptions import ClientError
+
+        names = dict(("#k%s" % i, name) for i, name in enumerate(key_names))
+        units = self._write_units(item.attrs)
+        self._rate(table.name, units=units)
+        try:
+            response = table.put_item(
+                Item=item.attrs,
+                ConditionExpression=" and ".join(
+                    "attribute_not_exists(%s)" % name for name in sorted(names)
+                ),
+                ExpressionAttributeNames=names,
+                **self._capacity_args(table.name)
+            )
+            self._charge(table.name, response, units)
+        except ClientError as err:
+            if (
+                err.response.get("Error", {}).get("Code")
+                != "ConditionalCheckFailedException"
+            ):
+                raise
+            LOG.info("Item already exists in table")
+            return STATUS_SKIPPED_EXISTS
+
+    def _redrive(
+        self, operation, request_items, unprocessed_field, table_name, units
+    ):
+        """Calls a batch operation until DynamoDB reports nothing left
+        unprocessed, backing off exponentially between attempts.
+        Returns the responses of every attempt.
+
+        Each attempt waits for the table's rate limit to allow the
+        capacity units estimated by calling units with its requests.
+        """
+
+        responses = []
+        for attempt in range(BATCH_MAX_ATTEMPTS):
+            if attempt:
+                time.sleep(
+                    min(BATCH_BACKOFF * 2 ** (attempt - 1), BATCH_MAX_BACKOFF)
+                )
+
+            estimate = units(request_items[table_name])
+            self._rate(table_name, units=estimate)
+            response = operation(
+                RequestItems=request_items, **self._capacity_args(table_name)
+            )
+            self._charge(table_name, response, estimate)
+            responses.append(response)
+
+            request_items = response.get(unprocessed_field)
+            if not request_items:
+                return responses
+
+        raise RuntimeError(
+            "%s remained after %s attempts"
+            % (unprocessed_field, BATCH_MAX_ATTEMPTS)
+        )
+
+    @staticmethod
+    def _key_id(attrs, key_names):
+        # Stringify values so that numbers compare equal to the Decimals
+        # DynamoDB returns for them
+        return tuple("%s" % attrs[name] for name in key_names)
+
+    def _do_publish_batch(self, items, table_name, region):
+        dynamodb = self._resource("dynamodb", region)
+        table = dynamodb.Table(table_name)
+        key_names = self._table_schema(table).key_names
+
+        # Outcomes of the items not put, by their ids
+        outcomes = {}
+
+        pending = {}
+        for item in items:
+            missing = [name for name in key_names if not item.attrs.get(name)]
+            if missing:
+                outcomes[id(item)] = self._missing_key(missing[0])
+                continue
+
+            key_id = self._key_id(item.attrs, key_names)
+            if key_id in pending:
+                LOG.warning(
+                    "Item to publish duplicates the key of another, "
+                    "skipping;\n\t%s",
+                    json.dumps(item.attrs, sort_keys=True),
+                )
+                outcomes[id(item)] = STATUS_SKIPPED_EXISTS
+                continue
+
+            pending[key_id] = item
+
+        if pending:
+            self._put_batch(dynamodb, table, key_names, pending, outcomes)
+
+        return [outcomes.get(id(item), STATUS_DONE) for item in items]
+
+    def _put_batch(self, dynamodb, table, key_names, pending, outcomes):
+
+        keys = [
+            dict((name, item.attrs[name]) for name in key_names)
+            for item in pending.values()
+        ]
+        responses = self._redrive(
+            dynamodb.batch_get_item,
+            {table.name: {"Keys": keys}},
+            "UnprocessedKeys",
+            table.name,
+            # Reads of items up to 4KB consume a unit each
+            lambda request: len(request["Keys"]),
+        )
+
+        for response in responses:
+            for found in response.get("Responses", {}).get(table.name, []):
+                key_id = self._key_id(found, key_names)
+                item = pending.get(key_id)
+                if item and all(
+                    found.get(attr) == value
+                    for attr, value in item.attrs.items()
+                ):
+                    LOG.info("Item already exists in table")
+                    outcomes[id(item)] = STATUS_SKIPPED_EXISTS
+                    del pending[key_id]
+
+        put_items = list(pending.values())
+        for start in range(0, len(put_items), BATCH_WRITE_SIZE):
+            chunk = put_items[start : start + BATCH_WRITE_SIZE]
+
+            for item in chunk:
+                LOG.debug(
+                    "Putting the following item into the '%s' table;\n\t%s",
+                    table.name,
+                    json.dumps(item.attrs, sort_keys=True, indent=4),
+                )
+
+            self._redrive(
+                dynamodb.batch_write_item,
+                {
+                    table.name: [
+                        {"PutRequest": {"Item": item.attrs}} for item in chunk
+                    ]
+                },
+                "UnprocessedItems",
+                table.name,
+                lambda request: sum(
+                    self._write_units(put["PutRequest"]["Item"])
+                    for put in request
+                ),
+            )
+
+        LOG.info(
+            "Put %s item(s) into the '%s' table", len(put_items), table.name
+        )
+
+    def publish(
+        self,
+        items,
+        table_name,
+        region=None,
+        dryrun=False,
+        mode="query",
+        progress=None,
+    ):
         """Efficiently puts items into the specified DynamoDB table
         without risk of overwriting or duplicating data.
 
         Args:
-            items (:class:`~chexus.TableItem`, list)
+            items (:class:`~chexus.TableItem`, list, batch)
                 One or more representations of an item to publish to the
-                table.
+                table, or a :class:`~chexus.TableItemBatch`, whose items
+                are created only as they're published and whose Report
+                holds the results of only those failing.
 
             table_name (str)
                 The name of the table in which the item will be
@@ -327,53 +1640,206 @@ class Client(object):
 
             dryrun (bool)
                 If true, only log what would be published.
+
+            mode (str)
+                How items are published. "query" checks for and puts
+                each item with its own requests. "batch" checks for up
+                to 100 items per BatchGetItem request and puts up to 25
+                per BatchWriteItem request, greatly reducing the number
+                of requests made for large numbers of items.
+                "conditional" puts each item with a single request which
+                DynamoDB rejects if an item with the same key exists,
+                guaranteeing no item is overwritten even when publishing
+                concurrently.
+
+            progress (:class:`~chexus.Progress`)
+                If provided, receives the progress of each item and of
+                the publish as a whole.
+
+        Returns:
+            :class:`~chexus.Report`
+                The outcome of each item.
+        """
+
+        return self.publish_async(
+            items, table_name, region, dryrun, mode, progress
+        ).result()
+
+    def publish_async(
+        self,
+        items,
+        table_name,
+        region=None,
+        dryrun=False,
+        mode="query",
+        progress=None,
+    ):
+        """Like :meth:`publish`, but returns without waiting for the
+        publish to complete.
+
+        Returns:
+            :class:`~concurrent.futures.Future`
+                A future for the :class:`~chexus.Report` of the publish,
+                resolved once every item has been processed.
         """
 
+        if mode not in PUBLISH_MODES:
+            raise ValueError(
+                "Expected 'mode' to be one of %s, got '%s' instead"
+                % (", ".join(PUBLISH_MODES), mode)
+            )
+
         # Coerce items to list
-        if not isinstance(items, (list, tuple)):
+        if not isinstance(items, (list, tuple, TableItemBatch)):
             items = [items]
         if isinstance(items, tuple):
             items = list(items)
 
-        table = self._session.resource("dynamodb", region_name=region).Table(
-            table_name
-        )
-
         LOG.info("Starting publish...")
 
-        publish_fts = []
+        if isinstance(items, TableItemBatch):
+            return self._publish_stream(
+                items, table_name, region, dryrun, mode, progress
+            )
+
+        tracker = _Tracker(progress, items)
+
+        publish_items = []
         for item in items:
             if not isinstance(item, TableItem):
-                LOG.error(
-                    "Expected type 'TableItem', got '%s' instead", type(item)
-                )
+                tracker.finish([item], [self._wrong_type(item, "TableItem")])
                 continue
 
             if dryrun:
-                LOG.info(
-                    "Would publish the following item to the '%s' table;\n\t%s",
-                    table.name,
-                    json.dumps(item.attrs, sort_keys=True, indent=4),
-                )
+                self._log_dryrun_publish(item, table_name)
+                tracker.finish([item], [STATUS_DRYRUN])
                 continue
 
-            publish_fts.append(
-                self._executor.submit(self._do_publish, item, table)
+            publish_items.append(item)
+
+        group_size = BATCH_GET_SIZE if mode == "batch" else 1
+        publish_fts = [
+            self._submit_publish(
+                tracker,
+                publish_items[start : start + group_size],
+                table_name,
+                region,
+                mode,
             )
+            for start in range(0, len(publish_items), group_size)
+        ]
 
-        # Block until all futures have completed
-        # Not using concurrent.futures.as_completed() due to Python 2.7
-        while not all([ft.done() for ft in publish_fts]):
-            time.sleep(1)
+        return self._collect(publish_fts, "publish", tracker)
 
-        # Report any publish failures as errors -- raising them could
-        # prevent other items from being published
-        publish_errs = [ft.exception() for ft in publish_fts]
-        # Filter possible NoneTypes
-        if [err for err in publish_errs if err]:
-            LOG.error(
-                "One or more exceptions occurred during publish\n\t%s",
-                "\n\t".join(str(err) for err in publish_errs),
+    @staticmethod
+    def _log_dryrun_publish(item, table_name):
+        LOG.info(
+            "Would publish the following item to the '%s' table;\n\t%s",
+            table_name,
+            json.dumps(item.attrs, sort_keys=True, indent=4),
+        )
+
+    def _submit_publish(self, tracker, items, table_name, region, mode):
+        """Submits the publish of the given items, a batch of them in
+        "batch" mode and otherwise just one.
+        """
+
+        if mode == "batch":
+            return self._submit_tracked(
+                tracker,
+                items,
+                ("dynamodb", region, table_name),
+                self._do_publish_batch,
+                items,
+                table_name,
+                region,
             )
 
-        LOG.info("Publish complete")
+        (item,) = items
+        return self._submit_tracked(
+            tracker,
+            items,
+            ("dynamodb", region, table_name),
+            (
+                self._do_publish_conditional
+                if mode == "conditional"
+                else self._do_publish
+            ),
+            item,
+            table_name,
+            region,
+        )
+
+    def _publish_stream(
+        self, batch, table_name, region, dryrun, mode, progress
+    ):
+        """Like publish_async, for the items of a TableItemBatch, created
+        from its rows only as the tasks in flight allow.
+        """
+
+        from more_executors import Executors
+
+        tracker = _Tracker(progress, None)
+        group_size = BATCH_GET_SIZE if mode == "batch" else 1
+        window = self._max_workers_count * PUBLISH_WINDOW
+
+        def feed():
+            slots = threading.Semaphore(window)
+            errors = []
+
+            def done(ft):
+                if ft.exception() is not None:
+                    errors.append(ft.exception())
+                slots.release()
+
+            def submit(group):
+                slots.acquire()
+                self._submit_publish(
+                    tracker, group, table_name, region, mode
+                ).add_done_callback(done)
+
+            try:
+                try:
+                    group = []
+                    for row in batch.rows:
+                        try:
+                            item = batch.item(row)
+                        except ValueError as err:
+                            LOG.error("Invalid row in batch: %s", err)
+                            tracker.add([row])
+                            tracker.finish([row], [err])
+                            continue
+
+                        tracker.add([item])
+                        if dryrun:
+                            self._log_dryrun_publish(item, table_name)
+                            tracker.finish([item], [STATUS_DRYRUN])
+                            continue
+
+                        group.append(item)
+                        if len(group) == group_size:
+                            submit(group)
+                            group = []
+
+                    if group:
+                        submit(group)
+                finally:
+                    # Wait for the tasks still in flight
+                    for _ in range(window):
+                        slots.acquire()
+            except Exception as err:
+                # Such as the batch's file failing to be read, after
+                # which none of its rows can be
+                errors.append(err)
+                raise
+            finally:
+                self._log_errors("publish", errors)
+                report = tracker.close()
+
+            return report
+
+        feeder = Executors.thread_pool(max_workers=1)
+        feed_ft = feeder.submit(feed)
+        feeder.shutdown(wait=False)
+
+        return feed_ft
@@ -0,0 +1,307 @@
+import logging
+import re
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from functools import partial
+
+LOG = logging.getLogger("chexus")
+
+# Error codes with which S3 and DynamoDB ask for requests to slow down
+THROTTLE_CODES = frozenset(
+    [
+        "SlowDown",
+        "503",
+        "Throttling",
+        "ThrottlingException",
+        "ThrottledException",
+        "RequestLimitExceeded",
+        "RequestThrottled",
+        "RequestThrottledException",
+        "TooManyRequestsException",
+        "ProvisionedThroughputExceededException",
+        "TransactionInProgressException",
+    ]
+)
+
+_ERROR_CODE_RE = re.compile(r"An error occurred \((\w+)\)")
+
+# Latencies (in seconds) short enough to be down to scheduling rather than
+# the service, which never count against growing a limit
+LATENCY_FLOOR = 0.05
+
+
+def error_code(err):
+    """Returns the AWS error code of the given exception, or None."""
+
+    from boto3.exceptions import S3UploadFailedError
+    from botocore.exceptions import ClientError
+
+    if isinstance(err, ClientError):
+        return err.response.get("Error", {}).get("Code")
+
+    if isinstance(err, S3UploadFailedError):
+        # The transfer manager only keeps the message of the error
+        # failing the upload, which names its code in parentheses
+        match = _ERROR_CODE_RE.search(str(err))
+        if match:
+            return match.group(1)
+
+    return None
+
+
+def is_throttle(err):
+    """Returns True if the given exception is a throttling error."""
+
+    return error_code(err) in THROTTLE_CODES
+
+
+class AdaptiveLimit(object):
+    """Limits the number of operations in flight against one bucket or
+    table, adapting the limit to how the service copes with them.
+
+    The limit grows additively, by one for each limit's worth of
+    operations completing without throttling or excessive latency, and
+    is cut multiplicatively when the service throttles an operation.
+    Operations started before a cut don't cut it again, so a burst of
+    throttling caused by one limit only halves it once.
+
+    Args:
+        initial (int)
+            Number of operations allowed in flight to begin with.
+
+        maximum (int)
+            Number of operations the limit may grow to.
+
+        minimum (int)
+            Number of operations the limit may be cut to.
+
+        decrease (float)
+            Factor by which the limit is cut on throttling.
+
+        latency_tolerance (float)
+            How many times longer than average an operation may take
+            while still counting towards growing the limit.
+    """
+
+    def __init__(
+        self,
+        initial,
+        maximum,
+        minimum=1,
+        decrease=0.5,
+        latency_tolerance=2.0,
+    ):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.decrease = decrease
+        self.latency_tolerance = latency_tolerance
+
+        self._limit = float(max(minimum, min(initial, maximum)))
+        self._in_flight = 0
+        self._epoch = 0
+        self._latency = None
+        self._lock = threading.Lock()
+
+    @property
+    def limit(self):
+        """The number of operations currently allowed in flight."""
+
+        return max(self.minimum, int(self._limit))
+
+    def try_acquire(self):
+        """Returns a token for the first attempt at a new operation, to
+        pass to :meth:`record` once it's done, or None if the limit
+        doesn't allow another operation in flight. The operation is
+        counted as in flight until passed to :meth:`free`.
+        """
+
+        with self._lock:
+            if self._in_flight >= self.limit:
+                return None
+            self._in_flight += 1
+            return (self._epoch, time.time())
+
+    def attempt(self, enter=False):
+        """Returns a token for an attempt at an operation, to pass to
+        :meth:`record` once it's done.
+
+        Args:
+            enter (bool)
+                If true, the operation isn't already in flight and is
+                counted as such from now on, regardless of the limit,
+                until passed to :meth:`free`.
+        """
+
+        with self._lock:
+            if enter:
+                self._in_flight += 1
+            return (self._epoch, time.time())
+
+    def free(self):
+        """Ends an operation in flight whose attempts have each been
+        recorded, without recording anything further.
+        """
+
+        with self._lock:
+            self._in_flight -= 1
+
+    def record(self, token, exception=None):
+        """Records the outcome of the attempt begun as the given token,
+        adjusting the limit accordingly.
+        """
+
+        with self._lock:
+            self._record(token, exception)
+
+    def _record(self, token, exception):
+        epoch, started = token
+        latency = time.time() - started
+
+        if exception is not None and is_throttle(exception):
+            if epoch == self._epoch:
+                self._limit = max(self.minimum, self._limit * self.decrease)
+                self._epoch += 1
+                LOG.debug("Throttled, cut concurrency limit to %s", self.limit)
+        elif exception is None:
+            healthy = self._latency is None or latency <= (
+                max(self._latency, LATENCY_FLOOR) * self.latency_tolerance
+            )
+            self._latency = (
+                latency
+                if self._latency is None
+                else self._latency * 0.9 + latency * 0.1
+            )
+            if healthy and self._limit < self.maximum:
+                self._limit = min(
+                    self.maximum, self._limit + 1.0 / self._limit
+                )
+
+
+class AdaptiveLimiter(object):
+    """Holds a separate :class:`AdaptiveLimit` for each bucket or table
+    operated on, created on first use.
+
+    Args:
+        initial (int)
+            Number of operations initially allowed in flight per
+            bucket or table.
+
+        maximum (int)
+            Number of operations each limit may grow to.
+    """
+
+    def __init__(self, initial, maximum):
+        self.initial = initial
+        self.maximum = maximum
+        self._limits = {}
+        self._queues = {}
+        self._dispatching = set()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the limit for the given bucket or table key."""
+
+        with self._lock:
+            if key not in self._limits:
+                self._limits[key] = AdaptiveLimit(self.initial, self.maximum)
+            return self._limits[key]
+
+    def submit(self, executor, key, fn, *args):
+        """Returns a future for the result of fn, submitted to the given
+        executor once the limit for the given key allows it.
+
+        Until then, the call is queued here rather than waiting in one
+        of the executor's threads, so that calls waiting for one bucket
+        or table don't hold up those for others. Each attempt the
+        executor makes at the call is recorded against the limit. A
+        failed attempt leaves the limit while the executor waits to
+        retry it, and the retry runs without waiting on the limit again,
+        which is left to hold back calls not yet started.
+        """
+
+        call = _LimitedCall(
+            self.get(key), partial(self._dispatch, executor, key), fn, args
+        )
+        with self._lock:
+            self._queues.setdefault(key, deque()).append(call)
+        self._dispatch(executor, key)
+        return call.future
+
+    def _dispatch(self, executor, key):
+        """Submits queued calls for the given key while its limit allows
+        them, unless another thread is already doing so.
+        """
+
+        limit = self.get(key)
+
+        with self._lock:
+            if key in self._dispatching:
+                return
+            self._dispatching.add(key)
+
+        while True:
+            with self._lock:
+                queue = self._queues[key]
+                token = limit.try_acquire() if queue else None
+                if token is None:
+                    self._dispatching.discard(key)
+                    return
+                call = queue.popleft()
+
+            if not call.future.set_running_or_notify_cancel():
+                limit.free()
+                continue
+
+            call.in_flight = True
+            try:
+                ft = executor.submit(call.attempt)
+            except Exception as err:  # pylint: disable=broad-except
+                call.leave()
+                call.future.set_exception(err)
+                continue
+
+            # Calls completing in the submitting thread don't dispatch
+            # more from within this loop, which goes on to do so itself
+            ft.add_done_callback(call.finished)
+
+
+class _LimitedCall(object):
+    # A call submitted to an executor through an AdaptiveLimiter, whose
+    # attempts are each recorded against the limit for its key
+
+    def __init__(self, limit, dispatch, fn, args):
+        self.limit = limit
+        self.dispatch = dispatch
+        self.fn = fn
+        self.args = args
+        self.future = Future()
+        self.in_flight = False
+
+    def attempt(self):
+        # Retries re-enter the limit they left on failing
+        token = self.limit.attempt(enter=not self.in_flight)
+        self.in_flight = True
+        try:
+            result = self.fn(*self.args)
+        except BaseException as err:
+            self.limit.record(token, err)
+            self.leave()
+            raise
+        self.limit.record(token)
+        return result
+
+    def leave(self):
+        if self.in_flight:
+            self.in_flight = False
+            self.limit.free()
+            self.dispatch()
+
+    def finished(self, ft):
+        self.leave()
+
+        try:
+            self.future.set_result(ft.result())
+        except Exception as err:  # pylint: disable=broad-except
+            self.future.set_exception(err)
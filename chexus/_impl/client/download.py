@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+LOG = logging.getLogger("chexus")
+
+# Suffixes of the files holding a download in progress and the record of
+# which of its ranges are complete
+PART_SUFFIX = ".part"
+STATE_SUFFIX = ".part.json"
+
+# os.rename won't replace existing files on Windows, os.replace is
+# unavailable on Python 2
+_replace = getattr(os, "replace", os.rename)
+
+
+class _OrderedHasher(object):
+    # Feeds ranges to a hash in order, however they're completed. Ranges
+    # completed by a previous attempt, or too far ahead of the hash to be
+    # worth holding in memory, are read back from the part file when
+    # their turn comes.
+
+    def __init__(self, path, range_size, max_buffered):
+        self._path = path
+        self._range_size = range_size
+        self._max_buffered = max_buffered
+        self._sha256 = hashlib.sha256()
+        self._pending = {}
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def add(self, index, data=None):
+        with self._lock:
+            if index - self._next > self._max_buffered:
+                data = None
+            self._pending[index] = data
+            while self._next in self._pending:
+                data = self._pending.pop(self._next)
+                if data is None:
+                    with open(self._path, "rb") as part:
+                        part.seek(self._next * self._range_size)
+                        data = part.read(self._range_size)
+                self._sha256.update(data)
+                self._next += 1
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+
+class ResumableDownload(object):
+    """Downloads an S3 object to a file in byte ranges fetched in
+    parallel.
+
+    The object is written to a sparse part file beside the destination,
+    with a small record of completed ranges kept alongside it so that an
+    interrupted download resumes where it left off. The content is
+    hashed as it's written and only moved to the destination if its
+    sha256 matches the expected checksum.
+
+    Args:
+        obj (S3.Object)
+            The object to download.
+
+        path (str)
+            The destination path.
+
+        expected_checksum (str)
+            The sha256 checksum the content must have. If not provided,
+            the content isn't verified.
+
+        range_size (int)
+            Number of bytes fetched per request.
+
+        max_concurrency (int)
+            Maximum number of ranges fetched at once.
+
+        callback (callable)
+            Called with the number of bytes of each range fetched.
+    """
+
+    def __init__(
+        self,
+        obj,
+        path,
+        expected_checksum=None,
+        range_size=8 * 1024 * 1024,
+        max_concurrency=4,
+        callback=None,
+    ):
+        self.obj = obj
+        self.path = path
+        self.expected_checksum = expected_checksum
+        self.range_size = range_size
+        self.max_concurrency = max_concurrency
+        self.callback = callback
+
+        self.part_path = path + PART_SUFFIX
+        self.state_path = path + STATE_SUFFIX
+
+        self._state = None
+        self._state_lock = threading.Lock()
+
+    def _load_state(self, size, etag):
+        # Resume only if the object hasn't changed since, and the part
+        # file was split the same way
+        state = {
+            "etag": etag,
+            "size": size,
+            "range_size": self.range_size,
+            "done": [],
+        }
+
+        try:
+            with open(self.state_path, "rb") as state_file:
+                saved = json.loads(state_file.read().decode("utf-8"))
+        except (IOError, OSError, ValueError):
+            saved = None
+
+        if (
+            saved
+            and os.path.isfile(self.part_path)
+            and all(saved.get(k) == state[k] for k in state if k != "done")
+        ):
+            state["done"] = saved.get("done", [])
+            LOG.info(
+                "Resuming download of %s, %s of %s range(s) complete",
+                self.path,
+                len(state["done"]),
+                self._range_count(size),
+            )
+            return state
+
+        with open(self.part_path, "wb") as part:
+            part.truncate(size)
+        return state
+
+    def _save_state(self):
+        tmp_path = self.state_path + ".tmp"
+        with open(tmp_path, "wb") as state_file:
+            state_file.write(json.dumps(self._state).encode("utf-8"))
+        _replace(tmp_path, self.state_path)
+
+    def _range_count(self, size):
+        return (size + self.range_size - 1) // self.range_size
+
+    def _fetch_range(self, index, size, etag, hasher):
+        start = index * self.range_size
+        end = min(start + self.range_size, size) - 1
+
+        response = self.obj.get(
+            Range="bytes=%s-%s" % (start, end), IfMatch=etag
+        )
+        data = response["Body"].read()
+        if len(data) != end - start + 1:
+            from botocore.exceptions import IncompleteReadError
+
+            # Retryable, resuming from the ranges already complete
+            raise IncompleteReadError(
+                actual_bytes=len(data), expected_bytes=end - start + 1
+            )
+
+        with open(self.part_path, "r+b") as part:
+            part.seek(start)
+            part.write(data)
+
+        hasher.add(index, data)
+
+        if self.callback:
+            self.callback(len(data))
+
+        with self._state_lock:
+            self._state["done"].append(index)
+            self._save_state()
+
+    def _discard(self):
+        for path in (self.part_path, self.state_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def run(self):
+        """Downloads the object, raising an exception if it can't be
+        downloaded or doesn't match its expected checksum.
+        """
+
+        # Attributes of the object are loaded on first access
+        size = self.obj.content_length
+        etag = self.obj.e_tag
+
+        self._state = self._load_state(size, etag)
+        done = set(self._state["done"])
+
+        hasher = _OrderedHasher(
+            self.part_path, self.range_size, self.max_concurrency * 2
+        )
+        missing = []
+        for index in range(self._range_count(size)):
+            if index in done:
+                hasher.add(index)
+            else:
+                missing.append(index)
+
+        if len(missing) > 1 and self.max_concurrency > 1:
+            from more_executors import Executors
+
+            with Executors.thread_pool(
+                max_workers=min(self.max_concurrency, len(missing))
+            ) as exc:
+                fts = [
+                    exc.submit(self._fetch_range, index, size, etag, hasher)
+                    for index in missing
+                ]
+                for ft in fts:
+                    ft.result()
+        else:
+            for index in missing:
+                self._fetch_range(index, size, etag, hasher)
+
+        checksum = hasher.hexdigest()
+        if self.expected_checksum and checksum != self.expected_checksum:
+            self._discard()
+            raise IOError(
+                "Checksum mismatch for %s, expected '%s' but got '%s'"
+                % (self.obj.key, self.expected_checksum, checksum)
+            )
+
+        _replace(self.part_path, self.path)
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+
+        return checksum
@@ -0,0 +1,113 @@
+import threading
+import time
+
+
+class _TokenBucket(object):
+    # Tokens accrue at a steady rate up to a burst's worth. Takers may
+    # overdraw it, waiting until the debt would have been paid off, so
+    # that amounts larger than the burst are still let through in time
+
+    def __init__(self, rate, burst):
+        self.rate = float(rate)
+        self.capacity = self.rate * burst
+        self._tokens = self.capacity
+        self._updated = time.time()
+
+    def take(self, amount, now):
+        """Takes the given amount, returning how many seconds the taker
+        must wait before going ahead.
+        """
+
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self.rate
+        )
+        self._updated = now
+        self._tokens = min(self.capacity, self._tokens - amount)
+        return max(0.0, -self._tokens / self.rate)
+
+
+class RateLimit(object):
+    """Limits the rate at which a :class:`~chexus.Client` operates on a
+    bucket or table.
+
+    Each limit is enforced by a token bucket, letting through bursts of
+    up to ``burst`` seconds' worth of operations after a lull and a
+    steady rate otherwise. Operations wait, rather than fail, for the
+    rate to allow them.
+
+    Args:
+        requests_per_second (float)
+            Maximum number of requests made per second.
+
+        bytes_per_second (float)
+            Maximum number of bytes transferred per second.
+
+        units_per_second (float)
+            Maximum number of DynamoDB capacity units, read and write,
+            consumed per second. Capacity is reserved by estimate before
+            each request and corrected by the capacity the request
+            actually consumed.
+
+        burst (float)
+            Number of seconds' worth of each limit which may be used at
+            once.
+    """
+
+    def __init__(
+        self,
+        requests_per_second=None,
+        bytes_per_second=None,
+        units_per_second=None,
+        burst=1.0,
+    ):
+        self.requests_per_second = requests_per_second
+        self.bytes_per_second = bytes_per_second
+        self.units_per_second = units_per_second
+        self.burst = burst
+
+        self._buckets = {}
+        for name, rate in (
+            ("requests", requests_per_second),
+            ("size", bytes_per_second),
+            ("units", units_per_second),
+        ):
+            if rate:
+                self._buckets[name] = _TokenBucket(rate, burst)
+        self._lock = threading.Lock()
+
+    @property
+    def limits_units(self):
+        """True if the limit applies to capacity units."""
+
+        return "units" in self._buckets
+
+    def _take(self, amounts):
+        with self._lock:
+            now = time.time()
+            return max(
+                [0.0]
+                + [
+                    self._buckets[name].take(amount, now)
+                    for name, amount in amounts.items()
+                    if amount and name in self._buckets
+                ]
+            )
+
+    def acquire(self, requests=1, size=0, units=0):
+        """Waits for the limit to allow the given number of requests,
+        bytes and capacity units.
+        """
+
+        delay = self._take(
+            {"requests": requests, "size": size, "units": units}
+        )
+        if delay:
+            time.sleep(delay)
+
+    def charge(self, units):
+        """Accounts for capacity units consumed beyond those acquired,
+        or returns those acquired but not consumed if negative. The
+        difference is made up by later operations.
+        """
+
+        self._take({"units": units})
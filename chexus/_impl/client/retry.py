@@ -0,0 +1,144 @@
+import logging
+import random
+import threading
+
+from .concurrency import THROTTLE_CODES, error_code, is_throttle
+
+LOG = logging.getLogger("chexus")
+
+# Error codes of failures which may succeed if tried again, besides
+# throttling
+TRANSIENT_CODES = frozenset(
+    [
+        "500",
+        "502",
+        "504",
+        "InternalError",
+        "InternalFailure",
+        "InternalServerError",
+        "ServiceUnavailable",
+        "RequestTimeout",
+        "RequestTimeoutException",
+        "PriorRequestNotComplete",
+        "IDPCommunicationError",
+    ]
+)
+
+
+def is_retryable(err):
+    """Returns True if the given exception is one a task may succeed
+    despite if tried again, such as throttling, a failure on the
+    service's side or a dropped connection, and False if it's one which
+    retrying can't fix, such as an invalid request or missing
+    permissions.
+    """
+
+    from boto3.exceptions import S3UploadFailedError
+    from botocore.exceptions import (
+        ConnectionError as BotoConnectionError,
+        HTTPClientError,
+        IncompleteReadError,
+    )
+
+    if isinstance(
+        err, (BotoConnectionError, HTTPClientError, IncompleteReadError)
+    ):
+        return True
+
+    code = error_code(err)
+    if code is not None:
+        return code in THROTTLE_CODES or code in TRANSIENT_CODES
+
+    # Uploads failing without a response from the service
+    return isinstance(err, S3UploadFailedError)
+
+
+class RetryPolicy(object):
+    """The policy by which a :class:`~chexus.Client` retries failed
+    tasks, implementing the interface of
+    :class:`~more_executors.RetryPolicy`.
+
+    Only tasks failing with errors which may not recur are retried,
+    after a delay chosen at random up to a maximum doubling with each
+    attempt. Retries of tasks failing on the service's side or losing
+    their connection are drawn from a budget shared by every task the
+    policy applies to, refilled gradually by tasks succeeding, so that
+    a service failing most requests isn't sent several times as many.
+    Retries of throttled tasks don't draw on the budget, the client
+    already backing off from a throttling service by cutting the tasks
+    it has in flight.
+
+    Args:
+        max_attempts (int)
+            Maximum number of times a task is attempted.
+
+        sleep (float)
+            Maximum delay (in seconds) before retrying a task the first
+            time, doubling for each later attempt.
+
+        max_sleep (float)
+            Maximum delay (in seconds) before any attempt.
+
+        budget (float)
+            Number of retries of tasks failing other than by throttling
+            which may be made while no tasks succeed.
+
+        refund (float)
+            Number of retries returned to the budget, up to its
+            original size, by each task succeeding.
+    """
+
+    def __init__(
+        self, max_attempts=3, sleep=1.0, max_sleep=60.0, budget=50, refund=0.1
+    ):
+        self.max_attempts = max_attempts
+        self.sleep = sleep
+        self.max_sleep = max_sleep
+        self.budget = budget
+        self.refund = refund
+
+        self._tokens = float(budget)
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self):
+        """The number of retries currently left in the budget."""
+
+        return self._tokens
+
+    def is_retryable(self, exception):
+        """Returns True if a task failing with the given exception may
+        be retried. Override to classify errors differently.
+        """
+
+        return is_retryable(exception)
+
+    def should_retry(self, attempt, future):
+        exception = future.exception()
+
+        if exception is None:
+            with self._lock:
+                self._tokens = min(self.budget, self._tokens + self.refund)
+            return False
+
+        if attempt >= self.max_attempts or not self.is_retryable(exception):
+            return False
+
+        if is_throttle(exception):
+            return True
+
+        with self._lock:
+            if self._tokens < 1:
+                LOG.warning(
+                    "Retry budget exhausted, not retrying\n\t%s", exception
+                )
+                return False
+            self._tokens -= 1
+
+        return True
+
+    def sleep_time(self, attempt, future):  # pylint: disable=unused-argument
+        # Full jitter spreads out retries of tasks which failed together
+        return random.uniform(
+            0, min(self.max_sleep, self.sleep * 2 ** (attempt - 1))
+        )
@@ -0,0 +1,105 @@
+import threading
+
+
+class TableSchema(object):
+    """The key schema of a DynamoDB table and its secondary indexes.
+
+    Also holds query templates compiled for each distinct set of
+    attributes searched for, so that querying for an item only requires
+    binding its values.
+
+    Args:
+        key_names (list)
+            Names of the table's key attributes, hash key first.
+
+        indexes (dict)
+            Names of each secondary index's key attributes, hash key
+            first, keyed by index name.
+    """
+
+    def __init__(self, key_names, indexes=None):
+        self.key_names = key_names
+        self.indexes = indexes or {}
+        self._templates = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key_names(key_schema):
+        # Hash key first, then range key
+        return [
+            str(k["AttributeName"])
+            for k in sorted(
+                key_schema or [], key=lambda k: k["KeyType"] != "HASH"
+            )
+        ]
+
+    @classmethod
+    def from_table(cls, table):
+        """Describes the given Table resource."""
+
+        indexes = {}
+        for index in list(table.global_secondary_indexes or []) + list(
+            table.local_secondary_indexes or []
+        ):
+            indexes[index["IndexName"]] = cls._key_names(index["KeySchema"])
+
+        return cls(cls._key_names(table.key_schema), indexes)
+
+    def _index_for(self, attr_names):
+        # Use the table itself where its hash key is given, otherwise the
+        # first index whose hash key is
+        if not self.key_names or self.key_names[0] in attr_names:
+            return None, self.key_names
+
+        for name in sorted(self.indexes):
+            key_names = self.indexes[name]
+            if key_names and key_names[0] in attr_names:
+                return name, key_names
+
+        return None, self.key_names
+
+    def query_template(self, attr_names):
+        """Returns query arguments, without values, for items having the
+        given attribute names.
+        """
+
+        attr_names = tuple(attr_names)
+
+        with self._lock:
+            if attr_names in self._templates:
+                return self._templates[attr_names]
+
+        index, key_names = self._index_for(attr_names)
+
+        key_exprs = []
+        fil_exprs = []
+        for key in attr_names:
+            if key in key_names:
+                key_exprs.append("%s = :%sval" % (key, key))
+            else:
+                fil_exprs.append("%s = :%sval" % (key, key))
+
+        template = {"KeyConditionExpression": " and ".join(key_exprs)}
+
+        if index:
+            # Indexes may not project every attribute
+            template["IndexName"] = index
+        else:
+            template["Select"] = "ALL_ATTRIBUTES"
+
+        if fil_exprs:
+            template["FilterExpression"] = " and ".join(fil_exprs)
+
+        with self._lock:
+            self._templates[attr_names] = template
+
+        return template
+
+    def query_criteria(self, item):
+        """Returns query arguments searching for the given TableItem."""
+
+        criteria = dict(self.query_template(item.attrs))
+        criteria["ExpressionAttributeValues"] = dict(
+            (":%sval" % key, "%s" % value) for key, value in item.attrs.items()
+        )
+        return criteria
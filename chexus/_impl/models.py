@@ -1,8 +1,31 @@
+import csv
+import datetime
+import decimal
 import hashlib
+import io
+import itertools
 import json
 import os
+import re
 
-import dateutil
+# Number of bytes read from a file at a time when computing its checksum
+CHECKSUM_CHUNK_SIZE = 1024 * 1024
+
+# Accepted types of the attributes declared by a TableItemSchema
+ATTRIBUTE_TYPES = ("datetime", "json")
+
+# Types of text, which on Python 2 includes unicode as well as str
+try:
+    _TEXT_TYPES = (str, unicode)  # pylint: disable=undefined-variable
+except NameError:
+    _TEXT_TYPES = (str,)
+
+# An ISO 8601 date, optionally with a time and UTC offset
+_ISO_DATETIME_RE = re.compile(
+    r"^(\d{4})-(\d{2})-(\d{2})"
+    r"(?:[T ](\d{2}):(\d{2})(?::(\d{2})(?:[.,](\d+))?)?"
+    r"(Z|[+-]\d{2}:?\d{2})?)?$"
+)
 
 
 class BucketItem(object):
@@ -19,28 +42,101 @@ class BucketItem(object):
 
         checksum (str):
             The checksum of the file.
-            This attribute is set if a checksum is not provided and the
-            file exists.
+            If a checksum is not provided, it's computed when first
+            accessed, provided the file exists.
 
         key (str):
             The object key of the S3 file object.
             This attribute is set with the name attribute if no key is
             provided.
+
+        checksum_cache (:class:`~chexus.ChecksumCache`):
+            A cache consulted for the file's checksum before computing
+            it, and updated after.
     """
 
-    def __init__(self, file_path, file_name=None, checksum=None, key=None):
+    def __init__(
+        self,
+        file_path,
+        file_name=None,
+        checksum=None,
+        key=None,
+        checksum_cache=None,
+    ):
         self.path = file_path
         self.name = file_name or os.path.basename(self.path)
-        self.checksum = checksum or self._generate_checksum()
+        self.checksum_cache = checksum_cache
+        self._given_checksum = checksum
+        self._generated_checksum = None
         self.key = key or self.name
         self.content_type = self._generate_content_type()
 
+    @property
+    def checksum(self):
+        """The sha256 checksum of the file, or None if it doesn't exist."""
+
+        if self._given_checksum:
+            return self._given_checksum
+        if not self._generated_checksum:
+            self._generated_checksum = self._generate_checksum()
+        return self._generated_checksum
+
+    @checksum.setter
+    def checksum(self, value):
+        self._given_checksum = value
+
+    @classmethod
+    def generate_checksums(cls, items, workers_count=4):
+        """Computes the checksums of many items concurrently.
+
+        Hashing releases the GIL, so files are read and hashed in
+        parallel threads. Items whose checksum is already known are
+        left untouched.
+
+        Args:
+            items (list)
+                The BucketItems whose checksums to compute.
+
+            workers_count (int)
+                Maximum number of files hashed at once.
+
+        Returns:
+            list
+                The given items.
+        """
+
+        items = list(items)
+        pending = [
+            item
+            for item in items
+            if not (item._given_checksum or item._generated_checksum)
+        ]
+
+        if pending:
+            from more_executors import Executors
+
+            with Executors.thread_pool(max_workers=workers_count) as exc:
+                fts = [exc.submit(item._generate_checksum) for item in pending]
+                for item, ft in zip(pending, fts):
+                    item._generated_checksum = ft.result()
+
+        return items
+
     def _generate_checksum(self):
+        if not os.path.isfile(self.path):
+            return None
+
+        if self.checksum_cache:
+            return self.checksum_cache.checksum(self.path, self._hash_file)
+
+        return self._hash_file()
+
+    def _hash_file(self):
         if os.path.isfile(self.path):
             sha256 = hashlib.sha256()
             with open(self.path, "rb") as binary:
                 while True:
-                    chunk = binary.read(4096)
+                    chunk = binary.read(CHECKSUM_CHUNK_SIZE)
                     if not chunk:
                         break
                     sha256.update(chunk)
@@ -50,7 +146,11 @@ class BucketItem(object):
         return None
 
     def _generate_content_type(self):
-        ext = os.path.splitext(self.path)[1]
+        return self._content_type_for(self.path)
+
+    @staticmethod
+    def _content_type_for(path):
+        ext = os.path.splitext(path)[1]
         if ext == ".xml":
             return {"ContentType": "application/xml"}
         if ext == ".gz":
@@ -61,31 +161,155 @@ class BucketItem(object):
         return {}
 
 
+class _HashingReader(object):
+    # Wraps a readable stream, hashing everything read from it
+
+    def __init__(self, stream):
+        self._stream = stream
+        self._sha256 = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._stream.read(size)
+        self._sha256.update(data)
+        return data
+
+    def hexdigest(self):
+        return self._sha256.hexdigest()
+
+
+class BufferItem(BucketItem):
+    """Represents an object in an AWS S3 bucket whose content is held
+    in memory or read from a stream, rather than a file.
+
+    Args:
+        data (bytes, memoryview, file-like object):
+            The object's content, or a readable binary stream of it.
+            Streams are read from their current position. Streams that
+            can't be rewound can't be retried should uploading fail.
+
+        key (str):
+            The object key of the S3 file object.
+
+        file_name (str):
+            The name of the content.
+            This attribute is set with the key if a name is not
+            provided, and determines the object's content type.
+
+        checksum (str):
+            The checksum of the content.
+            If a checksum is not provided, it's computed when first
+            accessed for bytes and memoryviews, and while uploading for
+            streams.
+    """
+
+    def __init__(self, data, key, file_name=None, checksum=None):
+        self.data = data
+        self._start = None
+        if hasattr(data, "read") and hasattr(data, "seek"):
+            try:
+                self._start = data.tell()
+            except (IOError, OSError, ValueError):
+                pass
+        self._opened = False
+
+        # Not backed by any file
+        super(BufferItem, self).__init__(
+            None,
+            file_name=file_name or key.rpartition("/")[2],
+            checksum=checksum,
+            key=key,
+        )
+
+    @property
+    def is_stream(self):
+        """True if the content is read from a stream."""
+
+        return hasattr(self.data, "read")
+
+    @property
+    def size(self):
+        """Size of the content in bytes, or None for streams."""
+
+        if self.is_stream:
+            return None
+        return memoryview(self.data).nbytes
+
+    def open(self):
+        """Returns a readable binary stream of the content, from its
+        start. Streams are rewound if they've been read before.
+        """
+
+        if isinstance(self.data, bytes):
+            return io.BytesIO(self.data)
+        if not self.is_stream:
+            return io.BytesIO(memoryview(self.data).tobytes())
+
+        if self._opened:
+            if self._start is None:
+                raise IOError(
+                    "Stream for %s has been consumed and can't be rewound"
+                    % self.key
+                )
+            self.data.seek(self._start)
+
+        self._opened = True
+        return self.data
+
+    def _hashing_reader(self):
+        # For computing the checksum of streams in the same pass as
+        # uploading them
+        return _HashingReader(self.open())
+
+    def _generate_checksum(self):
+        if self.is_stream:
+            return None
+        return hashlib.sha256(memoryview(self.data)).hexdigest()
+
+    def _generate_content_type(self):
+        return self._content_type_for(self.name)
+
+
 class TableItem(object):
     """Represents an item in an AWS DynamoDB table.
 
+    Items whose attributes have declared types are created by a
+    :class:`~chexus.TableItemSchema`.
+
     Args:
         kwargs
             Keyword arguments from which attributes are created.
-            Dictionary values are converted to JSON strings.
-            Values able to be parsed as dates and/or times are
-            converted to ISO format datetime strings.
+            Dictionary values are converted to JSON strings, and
+            :class:`~datetime.datetime` and :class:`~datetime.date`
+            values to ISO format datetime strings. Other values are
+            kept as they are.
     """
 
     def __init__(self, **kwargs):
-        self.attrs = kwargs
-
-        for key, value in self.attrs.items():
-            value = self._sanitize_value(value) if value else value
+        self._set_attrs(kwargs, None)
 
-            self.attrs[key] = value
+    def _set_attrs(self, attrs, schema):
+        self.attrs = self._coerce(attrs, schema)
 
+        for key, value in self.attrs.items():
             if not hasattr(self, key):
                 setattr(self, key, value)
 
-    def _sanitize_value(self, value):
-        # Coerce any dates, times to standard format
-        value = self._parse_datetime(value)
+    @classmethod
+    def _coerce(cls, attrs, schema):
+        # Converts the given attributes in place, returning them
+        for key, value in attrs.items():
+            if value:
+                attrs[key] = (
+                    schema.coerce(key, value)
+                    if schema
+                    else cls._sanitize_value(value)
+                )
+        return attrs
+
+    @staticmethod
+    def _sanitize_value(value):
+        if isinstance(value, (datetime.datetime, datetime.date)):
+            return _datetime_isoformat(value)
 
         # Serialize any dictionaries
         if isinstance(value, dict):
@@ -93,10 +317,360 @@ class TableItem(object):
 
         return value
 
+
+def _datetime_isoformat(value):
+    # Dates are given as midnight on the day, as dateutil parses them
+    if not isinstance(value, datetime.datetime):
+        value = datetime.datetime.combine(value, datetime.time())
+    return value.isoformat()
+
+
+def _parse_iso_datetime(value):
+    """Returns the given ISO 8601 date or time in the ISO format which
+    datetime (and so dateutil) gives it, or None if it isn't one.
+    """
+
+    match = _ISO_DATETIME_RE.match(value)
+    if not match:
+        return None
+
+    year, month, day, hour, minute, second, fraction, offset = match.groups()
+    try:
+        parsed = datetime.datetime(
+            int(year),
+            int(month),
+            int(day),
+            int(hour or 0),
+            int(minute or 0),
+            int(second or 0),
+            int((fraction or "0")[:6].ljust(6, "0")),
+        )
+    except ValueError:
+        # Out of range, e.g. a 13th month
+        return None
+
+    result = parsed.isoformat()
+    if offset:
+        if offset == "Z":
+            offset = "+00:00"
+        elif ":" not in offset:
+            offset = "%s:%s" % (offset[:3], offset[3:])
+        result += offset
+    return result
+
+
+class TableItemSchema(object):
+    """Declares the types of the attributes of a DynamoDB table's items,
+    by which the values of items it creates are converted.
+
+    Values of attributes declared as "datetime" must be ISO 8601 dates
+    or times, or :class:`~datetime.datetime` or :class:`~datetime.date`
+    objects, and are converted to ISO format datetime strings. Values of
+    attributes declared as "json" are converted to JSON strings.
+    Attributes whose types aren't declared are converted as they are by
+    :class:`~chexus.TableItem`.
+
+    Args:
+        types (dict)
+            Type names, "datetime" or "json", keyed by attribute name.
+
+        fuzzy (bool)
+            If true, dates and times not in ISO 8601 format, such as
+            "Feb. 1, 2020", are parsed by :mod:`dateutil`, and values
+            unable to be parsed are kept as they are. If no types are
+            declared, every value able to be parsed as a date or time is
+            converted.
+
+    Raises:
+        ValueError
+            If an unknown type is declared.
+    """
+
+    def __init__(self, types=None, fuzzy=False):
+        self.types = dict(types or {})
+        self.fuzzy = fuzzy
+
+        for name, type_name in self.types.items():
+            if type_name not in ATTRIBUTE_TYPES:
+                raise ValueError(
+                    "Expected type of '%s' to be one of %s, got '%s' instead"
+                    % (name, ", ".join(ATTRIBUTE_TYPES), type_name)
+                )
+
+    def item(self, **kwargs):
+        """Returns a :class:`~chexus.TableItem` of the given attributes,
+        converted according to their declared types.
+
+        Raises:
+            ValueError
+                If a value can't be converted to its declared type.
+        """
+
+        item = TableItem.__new__(TableItem)
+        item._set_attrs(kwargs, self)
+        return item
+
+    def coerce(self, name, value):
+        """Returns the given value of the named attribute converted
+        according to its declared type.
+
+        Raises:
+            ValueError
+                If the value can't be converted to its declared type.
+        """
+
+        type_name = self.types.get(name)
+
+        if type_name == "json":
+            return (
+                value if isinstance(value, _TEXT_TYPES) else json.dumps(value)
+            )
+
+        if isinstance(value, _TEXT_TYPES) and (
+            type_name == "datetime" or (self.fuzzy and not self.types)
+        ):
+            return self._coerce_datetime(name, value)
+
+        if type_name == "datetime" and not isinstance(
+            value, (datetime.datetime, datetime.date)
+        ):
+            raise ValueError(
+                "Expected '%s' to be a date or time, got '%s' instead"
+                % (name, value)
+            )
+
+        return TableItem._sanitize_value(value)
+
+    def _coerce_datetime(self, name, value):
+        parsed = _parse_iso_datetime(value)
+        if parsed is not None:
+            return parsed
+
+        if self.fuzzy:
+            import dateutil.parser
+
+            try:
+                return dateutil.parser.parse(value).isoformat()
+            except (OverflowError, ValueError):
+                # Doesn't appear to be a date or time
+                return value
+
+        raise ValueError(
+            "Expected '%s' to be an ISO 8601 date or time, got '%s' instead"
+            % (name, value)
+        )
+
+
+class TableItemBatch(object):
+    """A batch of items for a DynamoDB table, held as rows of values
+    sharing one sequence of attribute names, rather than as
+    :class:`~chexus.TableItem` objects.
+
+    Items are only created from rows as they're iterated over, so a
+    batch of rows read lazily from a file or generator may be published
+    while holding only the items in flight. Such a batch can only be
+    iterated over once, and its ``count`` of rows is None, as is the
+    case for every batch created by :meth:`from_dicts`, :meth:`from_csv`
+    and :meth:`from_json_lines`. Only a batch given its rows as a
+    sequence has a count. Rows which can't be read, such as lines of
+    invalid JSON, fail to be published without stopping the others.
+
+    Args:
+        columns (list)
+            The names of the attributes, in the order of each row's
+            values.
+
+        rows (iterable)
+            Sequences of attribute values, one for each column. Rows
+            with fewer values lack the attributes of the remaining
+            columns.
+
+        schema (:class:`~chexus.TableItemSchema`)
+            If provided, converts the values of the items according to
+            their declared types.
+    """
+
+    def __init__(self, columns, rows, schema=None):
+        self.columns = tuple(columns)
+        self.rows = rows
+        self.schema = schema
+
+        self.count = len(rows) if hasattr(rows, "__len__") else None
+
+    @classmethod
+    def from_dicts(cls, records, columns=None, schema=None):
+        """Returns a batch of the given dictionaries of attributes.
+
+        Args:
+            records (iterable)
+                Dictionaries of attribute values, keyed by name.
+
+            columns (list)
+                The names of the attributes the records may have.
+                Defaults to the names of the first record's attributes.
+
+            schema (:class:`~chexus.TableItemSchema`)
+                If provided, converts the values of the items according
+                to their declared types.
+        """
+
+        records = iter(records)
+        if columns is None:
+            # Named after the first record, rather than any unreadable
+            # lines preceding it
+            leading = []
+            for first in records:
+                leading.append(first)
+                if isinstance(first, dict):
+                    columns = list(first)
+                    break
+            records = itertools.chain(leading, records)
+            columns = columns or ()
+
+        return cls(columns, cls._dict_rows(records, tuple(columns)), schema)
+
+    @classmethod
+    def from_csv(cls, stream, schema=None, **fmtparams):
+        """Returns a batch of the rows of the given CSV file, whose first
+        row names the attributes. Empty values are taken to be absent.
+
+        Args:
+            stream (file-like object)
+                The CSV file, opened in text mode.
+
+            schema (:class:`~chexus.TableItemSchema`)
+                If provided, converts the values of the items according
+                to their declared types.
+
+            fmtparams
+                Formatting parameters passed to :func:`csv.reader`.
+        """
+
+        reader = csv.reader(stream, **fmtparams)
+        columns = next(reader, [])
+        return cls(columns, cls._csv_rows(reader), schema)
+
     @staticmethod
-    def _parse_datetime(value):
-        try:
-            return dateutil.parser.parse(value).isoformat()
-        except (TypeError, ValueError):
-            # String doesn't appear to be a date or time
-            return value
+    def _csv_rows(reader):
+        while True:
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as err:
+                # Left to be rejected once reached, as are the rows of
+                # other batches which can't be read
+                yield ValueError(
+                    "Invalid CSV on line %s: %s" % (reader.line_num, err)
+                )
+                continue
+            if row:
+                yield tuple(
+                    value if value != "" else _MISSING for value in row
+                )
+
+    @classmethod
+    def from_json_lines(cls, stream, columns=None, schema=None):
+        """Returns a batch of the JSON objects on each line of the given
+        file. Numbers with fractions are read as
+        :class:`~decimal.Decimal`, as DynamoDB requires.
+
+        Args:
+            stream (file-like object)
+                The file of JSON lines.
+
+            columns (list)
+                The names of the attributes the objects may have.
+                Defaults to the names of the first object's attributes.
+
+            schema (:class:`~chexus.TableItemSchema`)
+                If provided, converts the values of the items according
+                to their declared types.
+        """
+
+        return cls.from_dicts(cls._json_records(stream), columns, schema)
+
+    @staticmethod
+    def _json_records(stream):
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line, parse_float=decimal.Decimal)
+            except ValueError as err:
+                yield ValueError("Invalid JSON on line %s: %s" % (number, err))
+
+    @staticmethod
+    def _dict_rows(records, columns):
+        names = frozenset(columns)
+        for record in records:
+            if isinstance(record, ValueError):
+                yield record
+            elif not isinstance(record, dict):
+                yield ValueError(
+                    "Expected a record of attributes, got '%s' instead"
+                    % (record,)
+                )
+            elif names.issuperset(record):
+                yield tuple(record.get(name, _MISSING) for name in columns)
+            else:
+                # Left as it is, to be rejected once reached
+                yield record
+
+    def __iter__(self):
+        for row in self.rows:
+            yield self.item(row)
+
+    def attrs(self, row):
+        """Returns the dictionary of the attributes of the given row, as
+        given.
+
+        Raises:
+            ValueError
+                If the row has more values than there are columns, is a
+                record of attributes not among the columns, or couldn't
+                be read.
+        """
+
+        if isinstance(row, ValueError):
+            raise row
+        if isinstance(row, dict):
+            unknown = sorted(set(row) - set(self.columns))
+            raise ValueError(
+                "Expected attributes to be among %s, got '%s' instead"
+                % (", ".join(self.columns), "', '".join(unknown))
+            )
+        if len(row) > len(self.columns):
+            raise ValueError(
+                "Expected at most %s values, got %s instead"
+                % (len(self.columns), len(row))
+            )
+        return dict(
+            (name, value)
+            for name, value in zip(self.columns, row)
+            if value is not _MISSING
+        )
+
+    def item(self, row):
+        """Returns a :class:`~chexus.TableItem` of the given row.
+
+        Raises:
+            ValueError
+                If the row's values can't be converted to items'.
+        """
+
+        item = TableItem.__new__(TableItem)
+        item._set_attrs(self.attrs(row), self.schema)
+        return item
+
+    def payloads(self):
+        """Yields the attributes of each row, converted as those of
+        items are, as dictionaries ready to be put into DynamoDB.
+        """
+
+        for row in self.rows:
+            yield TableItem._coerce(self.attrs(row), self.schema)
+
+
+# Value of an attribute absent from a row
+_MISSING = object()
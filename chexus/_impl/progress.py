@@ -0,0 +1,379 @@
+import logging
+import random
+import threading
+import time
+
+from .report import STATUS_DONE, STATUS_FAILED, ItemResult, Report
+
+LOG = logging.getLogger("chexus")
+
+# Most durations of items sampled for the latency percentiles of
+# operations whose results aren't all held
+DURATION_SAMPLES = 10000
+
+
+class ProgressStats(object):
+    """A snapshot of the progress of an upload, download or publish.
+
+    Args:
+        items_total (int)
+            Number of items being processed, or None if not known up
+            front.
+
+        items_done (int)
+            Number of items processed, successfully or not.
+
+        items_failed (int)
+            Number of items which failed to be processed.
+
+        bytes_total (int)
+            Number of bytes expected to be transferred, or None if not
+            known up front.
+
+        bytes_done (int)
+            Number of bytes transferred.
+
+        elapsed (float)
+            Number of seconds since the operation started.
+    """
+
+    def __init__(
+        self,
+        items_total,
+        items_done,
+        items_failed,
+        bytes_total,
+        bytes_done,
+        elapsed,
+    ):
+        self.items_total = items_total
+        self.items_done = items_done
+        self.items_failed = items_failed
+        self.bytes_total = bytes_total
+        self.bytes_done = bytes_done
+        self.elapsed = elapsed
+
+    @property
+    def items_per_second(self):
+        """Average number of items processed per second."""
+
+        return self.items_done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def bytes_per_second(self):
+        """Average number of bytes transferred per second."""
+
+        return self.bytes_done / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def megabytes_per_second(self):
+        """Average number of megabytes (MiB) transferred per second."""
+
+        return self.bytes_per_second / (1024 * 1024)
+
+    @property
+    def eta(self):
+        """Estimated number of seconds until the operation completes,
+        going by bytes where their total is known and items otherwise,
+        or None if there's no progress to go by yet.
+        """
+
+        if self.bytes_total and self.bytes_per_second:
+            remaining = max(0, self.bytes_total - self.bytes_done)
+            return remaining / self.bytes_per_second
+
+        if self.items_per_second and self.items_total is not None:
+            remaining = self.items_total - self.items_done
+            return remaining / self.items_per_second
+
+        return None
+
+    def __repr__(self):
+        return (
+            "<ProgressStats items=%s/%s failed=%s bytes=%s/%s "
+            "elapsed=%.1fs>"
+            % (
+                self.items_done,
+                self.items_total,
+                self.items_failed,
+                self.bytes_done,
+                self.bytes_total,
+                self.elapsed,
+            )
+        )
+
+
+class Progress(object):
+    """Receives the progress of an upload, download or publish.
+
+    Subclass and override the methods of interest, then pass an
+    instance as the ``progress`` argument of a :class:`~chexus.Client`
+    method. Methods are called from the client's worker threads, so
+    must be thread-safe, and should return promptly. Exceptions raised
+    by them are logged and otherwise ignored.
+
+    Args:
+        interval (float)
+            Minimum number of seconds between calls to :meth:`updated`
+            as bytes are transferred. It's always called as items
+            finish.
+    """
+
+    def __init__(self, interval=1.0):
+        self.interval = interval
+
+    def started(self, stats):
+        """Called once before any item is processed."""
+
+    def item_started(self, item):
+        """Called when an item's first attempt starts."""
+
+    def item_transferred(self, item, bytes_count):
+        """Called with each number of bytes of an item transferred."""
+
+    def item_finished(self, item, exception=None):
+        """Called once an item is processed, with the exception which
+        failed it, if any.
+        """
+
+    def updated(self, stats):
+        """Called with a :class:`~chexus.ProgressStats` for the whole
+        operation as it progresses.
+        """
+
+    def finished(self, stats):
+        """Called once every item has been processed."""
+
+
+class _Tracker(object):
+    # Aggregates the progress of an operation's items and reports it to
+    # a Progress, if there is one, recording the outcome of each item
+    # for the operation's Report. Items retried have the bytes their
+    # failed attempts transferred discounted.
+    #
+    # Given no items, items are streamed, each added as it's reached;
+    # only the results of those failing are held, the others counted.
+
+    def __init__(self, progress, items, size_of=None):
+        self.progress = progress
+        self.streaming = items is None
+        self.items_total = None if self.streaming else len(items)
+        self.bytes_total = None
+        self.items_done = 0
+        self.items_failed = 0
+        self.bytes_done = 0
+
+        self._started = time.time()
+        self._last_update = self._started
+        self._order = [id(item) for item in items or []]
+        self._results = {}
+        # For streamed items
+        self._numbers = {}
+        self._added = 0
+        self._omitted = {}
+        self._durations = []
+        self._sampled = 0
+        self._item_bytes = {}
+        self._item_sizes = {}
+        self._attempts = {}
+        self._item_started = {}
+        self._lock = threading.Lock()
+
+        if progress and size_of:
+            self.bytes_total = 0
+            for item in items:
+                size = size_of(item) or 0
+                self._item_sizes[id(item)] = size
+                self.bytes_total += size
+
+        self._notify("started", self.stats())
+
+    def _notify(self, method, *args):
+        if not self.progress:
+            return
+        try:
+            getattr(self.progress, method)(*args)
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception("Progress callback '%s' failed", method)
+
+    def stats(self):
+        return ProgressStats(
+            self.items_total,
+            self.items_done,
+            self.items_failed,
+            self.bytes_total,
+            self.bytes_done,
+            time.time() - self._started,
+        )
+
+    def add(self, items):
+        """Records the given streamed items as the operation's next."""
+
+        with self._lock:
+            for item in items:
+                self._numbers[id(item)] = self._added
+                self._added += 1
+
+    def run(self, items, fn, *args):
+        """Calls fn as an attempt at processing the given items."""
+
+        with self._lock:
+            first = []
+            for item in items:
+                if id(item) in self._item_bytes:
+                    # Retried, start counting its bytes afresh
+                    self.bytes_done -= self._item_bytes[id(item)]
+                else:
+                    first.append(item)
+                    self._item_started[id(item)] = time.time()
+                self._item_bytes[id(item)] = 0
+                self._attempts[id(item)] = self._attempts.get(id(item), 0) + 1
+
+        for item in first:
+            self._notify("item_started", item)
+
+        return fn(*args)
+
+    def callback(self, item):
+        """Returns a callback to be called with the number of bytes of
+        the given item transferred, or None if progress isn't reported.
+        """
+
+        if not self.progress:
+            return None
+        return lambda bytes_count: self.transferred(item, bytes_count)
+
+    def transferred(self, item, bytes_count):
+        with self._lock:
+            self._item_bytes[id(item)] = (
+                self._item_bytes.get(id(item), 0) + bytes_count
+            )
+            self.bytes_done += bytes_count
+
+            now = time.time()
+            due = now - self._last_update >= self.progress.interval
+            if due:
+                self._last_update = now
+                stats = self.stats()
+
+        self._notify("item_transferred", item, bytes_count)
+        if due:
+            self._notify("updated", stats)
+
+    def watch(self, ft, items):
+        """Records the outcome of the given items once ft is done.
+
+        Its result may be the status of every item, a list of the status
+        or exception of each item, or None if every item is done.
+        """
+
+        def finish(ft):
+            exception = ft.exception()
+            if exception is not None:
+                outcomes = [exception] * len(items)
+            elif isinstance(ft.result(), list):
+                outcomes = ft.result()
+            else:
+                outcomes = [ft.result() or STATUS_DONE] * len(items)
+            self.finish(items, outcomes)
+
+        ft.add_done_callback(finish)
+
+    def finish(self, items, outcomes):
+        """Records the outcome, a status or the exception failing it, of
+        each of the given items.
+        """
+
+        now = time.time()
+        finished = []
+        with self._lock:
+            for item, outcome in zip(items, outcomes):
+                exception = None
+                status = outcome
+                if isinstance(outcome, BaseException):
+                    exception, status = outcome, STATUS_FAILED
+
+                self.items_done += 1
+                if exception is not None:
+                    self.items_failed += 1
+                elif self.bytes_total is not None:
+                    # Items skipped, or smaller than expected, won't
+                    # transfer all the bytes expected of them
+                    self.bytes_total -= self._item_sizes.get(
+                        id(item), 0
+                    ) - self._item_bytes.get(id(item), 0)
+
+                started = self._item_started.get(id(item))
+                result = ItemResult(
+                    item,
+                    status,
+                    exception=exception,
+                    bytes_count=self._item_bytes.get(id(item), 0),
+                    attempts=self._attempts.get(id(item), 0),
+                    duration=now - started if started else 0.0,
+                )
+                if self.streaming:
+                    self._record_streamed(item, result)
+                else:
+                    self._results[id(item)] = result
+                finished.append((item, exception))
+
+            self._last_update = now
+            stats = self.stats()
+
+        for item, exception in finished:
+            self._notify("item_finished", item, exception)
+        self._notify("updated", stats)
+
+    def _record_streamed(self, item, result):
+        # Streamed items are let go of once finished, when their ids may
+        # be reused by later items
+        number = self._numbers.pop(id(item), None)
+        for bookkeeping in (
+            self._item_bytes,
+            self._item_sizes,
+            self._attempts,
+            self._item_started,
+        ):
+            bookkeeping.pop(id(item), None)
+
+        if result.status == STATUS_FAILED:
+            self._results[number] = result
+        else:
+            self._omitted[result.status] = (
+                self._omitted.get(result.status, 0) + 1
+            )
+
+        if result.attempts:
+            # Reservoir sampling keeps each duration equally likely to
+            # be among those sampled
+            self._sampled += 1
+            if len(self._durations) < DURATION_SAMPLES:
+                self._durations.append(result.duration)
+            else:
+                index = random.randrange(self._sampled)
+                if index < DURATION_SAMPLES:
+                    self._durations[index] = result.duration
+
+    def close(self, _=None):
+        """Reports the operation as finished, returning its Report."""
+
+        if self.streaming:
+            self.items_total = self._added
+            self._notify("finished", self.stats())
+            return Report(
+                [self._results[key] for key in sorted(self._results)],
+                time.time() - self._started,
+                omitted=self._omitted,
+                durations=self._durations,
+            )
+
+        self._notify("finished", self.stats())
+        return Report(
+            [
+                self._results[key]
+                for key in self._order
+                if key in self._results
+            ],
+            time.time() - self._started,
+        )
@@ -0,0 +1,185 @@
+import math
+
+# Statuses of an item processed by a Client operation
+STATUS_DONE = "done"
+STATUS_SKIPPED_EXISTS = "skipped-exists"
+STATUS_SKIPPED_MISMATCH = "skipped-mismatch"
+STATUS_FAILED = "failed"
+STATUS_DRYRUN = "dry-run"
+
+
+class ItemResult(object):
+    """The outcome of processing one item in an upload, download or
+    publish.
+
+    Args:
+        item
+            The item processed.
+
+        status (str)
+            "done" if the item was transferred or published,
+            "skipped-exists" if it was already present, or up to date,
+            at its destination, "skipped-mismatch" if it was left alone
+            despite differing from an object already present, "failed"
+            if it couldn't be processed, or "dry-run" if the operation
+            was a dry run.
+
+        exception (Exception)
+            The exception which failed the item, if any.
+
+        bytes_count (int)
+            Number of bytes of the item transferred.
+
+        attempts (int)
+            Number of times processing the item was attempted.
+
+        duration (float)
+            Number of seconds from the item's first attempt starting to
+            its last finishing.
+    """
+
+    def __init__(
+        self,
+        item,
+        status,
+        exception=None,
+        bytes_count=0,
+        attempts=0,
+        duration=0.0,
+    ):
+        self.item = item
+        self.status = status
+        self.exception = exception
+        self.bytes_count = bytes_count
+        self.attempts = attempts
+        self.duration = duration
+
+    def __repr__(self):
+        return "<ItemResult %r status=%s attempts=%s duration=%.3fs>" % (
+            self.item,
+            self.status,
+            self.attempts,
+            self.duration,
+        )
+
+
+class Report(object):
+    """The outcome of an upload, download or publish, holding an
+    :class:`~chexus.ItemResult` for each item given, in order.
+
+    Publishes of a :class:`~chexus.TableItemBatch` only hold the results
+    of items which failed, counting the others, so as not to hold every
+    item published.
+
+    Args:
+        results (list)
+            The :class:`~chexus.ItemResult` of each item.
+
+        duration (float)
+            Number of seconds the operation took.
+
+        omitted (dict)
+            Numbers of the items whose results aren't held, keyed by
+            their status.
+
+        durations (list)
+            Durations of items sampled for latency percentiles, where
+            not every item's result is held.
+    """
+
+    def __init__(self, results, duration=0.0, omitted=None, durations=None):
+        self.results = results
+        self.duration = duration
+        self.omitted = dict(omitted or {})
+        self.durations = durations
+
+    def __iter__(self):
+        return iter(self.results)
+
+    def __len__(self):
+        return len(self.results) + sum(self.omitted.values())
+
+    def with_status(self, status):
+        """Returns the results held of items having the given status."""
+
+        return [result for result in self.results if result.status == status]
+
+    def count(self, status):
+        """Returns the number of items having the given status, including
+        those whose results aren't held.
+        """
+
+        return len(self.with_status(status)) + self.omitted.get(status, 0)
+
+    @property
+    def done(self):
+        """Results of the items transferred or published."""
+
+        return self.with_status(STATUS_DONE)
+
+    @property
+    def skipped(self):
+        """Results of the items left alone at their destination."""
+
+        return [
+            result
+            for result in self.results
+            if result.status
+            in (STATUS_SKIPPED_EXISTS, STATUS_SKIPPED_MISMATCH)
+        ]
+
+    @property
+    def failed(self):
+        """Results of the items which couldn't be processed."""
+
+        return self.with_status(STATUS_FAILED)
+
+    @property
+    def ok(self):
+        """True if no item failed."""
+
+        return not self.failed
+
+    @property
+    def bytes_count(self):
+        """Number of bytes transferred in all."""
+
+        return sum(result.bytes_count for result in self.results)
+
+    def latency_percentile(self, percent):
+        """Returns the duration under which the given percentage of the
+        items attempted were processed, or None if none were attempted.
+        """
+
+        if self.durations is not None:
+            durations = sorted(self.durations)
+        else:
+            durations = sorted(
+                result.duration for result in self.results if result.attempts
+            )
+        if not durations:
+            return None
+
+        # Nearest rank
+        rank = max(1, int(math.ceil(percent / 100.0 * len(durations))))
+        return durations[rank - 1]
+
+    @property
+    def latency_percentiles(self):
+        """The 50th, 90th and 99th percentiles of the durations of the
+        items attempted, keyed by percentage.
+        """
+
+        return dict(
+            (percent, self.latency_percentile(percent))
+            for percent in (50, 90, 99)
+        )
+
+    def __repr__(self):
+        return "<Report done=%s skipped=%s failed=%s duration=%.3fs>" % (
+            self.count(STATUS_DONE),
+            self.count(STATUS_SKIPPED_EXISTS)
+            + self.count(STATUS_SKIPPED_MISMATCH),
+            self.count(STATUS_FAILED),
+            self.duration,
+        )
@@ -0,0 +1,219 @@
+import logging
+import threading
+import time
+
+LOG = logging.getLogger("chexus")
+
+# Name of the span timing a task's wait in the client's executor
+WAIT_SPAN = "chexus.wait"
+
+
+class TraceSpan(object):
+    """A timed request to AWS, or wait of a task in a
+    :class:`~chexus.Client`'s executor, as reported to a
+    :class:`~chexus.Tracer`.
+
+    Requests are named after their service and operation, e.g.
+    "S3.HeadObject" or "DynamoDB.Query", while waits are named
+    "chexus.wait".
+
+    Args:
+        name (str)
+            The name of the span.
+
+        attributes (dict)
+            Details of the span, which may be "service", "operation",
+            "bucket", "key" and "table" naming what was requested,
+            "attempt", the number of the attempt at the task within
+            which the span occurred, and "retries", the number of times
+            boto retried a request itself.
+
+        start (float)
+            Time, in seconds since the epoch, at which the span started.
+
+        duration (float)
+            Number of seconds the span took.
+
+        exception (Exception)
+            The exception which failed a request, if any.
+    """
+
+    def __init__(self, name, attributes, start, duration, exception=None):
+        self.name = name
+        self.attributes = attributes
+        self.start = start
+        self.duration = duration
+        self.exception = exception
+
+    def __repr__(self):
+        return "<TraceSpan %s %r duration=%.3fs>" % (
+            self.name,
+            self.attributes,
+            self.duration,
+        )
+
+
+class Tracer(object):
+    """Receives a :class:`~chexus.TraceSpan` for every request a
+    :class:`~chexus.Client` makes to AWS, and for every wait of its
+    tasks to be run by its executor.
+
+    Pass an instance as the ``tracer`` argument of a Client, either
+    given a callback or subclassed to override :meth:`span_finished`.
+    Spans are reported from the client's worker threads, so handling
+    them must be thread-safe, and should be prompt. Exceptions raised
+    handling them are logged and otherwise ignored.
+
+    Args:
+        callback (callable)
+            Called with each span as it finishes.
+    """
+
+    def __init__(self, callback=None):
+        self.callback = callback
+
+    def span_finished(self, span):
+        """Called with each span as it finishes."""
+
+        if self.callback:
+            self.callback(span)
+
+
+class OpenTelemetryTracer(Tracer):
+    """A :class:`~chexus.Tracer` recording each span in OpenTelemetry.
+
+    Args:
+        tracer (:class:`opentelemetry.trace.Tracer`)
+            The tracer with which spans are recorded.
+    """
+
+    def __init__(self, tracer):
+        super(OpenTelemetryTracer, self).__init__()
+        self.tracer = tracer
+
+    def span_finished(self, span):
+        # Only imported where OpenTelemetry is in use
+        # pylint: disable=import-error
+        from opentelemetry.trace import Status, StatusCode
+
+        otel_span = self.tracer.start_span(
+            span.name,
+            attributes=span.attributes,
+            start_time=int(span.start * 1e9),
+        )
+        if span.exception is not None:
+            otel_span.record_exception(span.exception)
+            otel_span.set_status(Status(StatusCode.ERROR))
+        otel_span.end(end_time=int((span.start + span.duration) * 1e9))
+
+
+class _Task(object):
+    # The attempts at one task submitted to the executor
+    def __init__(self, attributes):
+        self.attributes = attributes
+        self.attempt = 0
+        self.ready = time.time()
+
+
+class _Tracing(object):
+    # Times the requests made by a session's clients, through botocore's
+    # events, and the waits of tasks in the executor, reporting them to
+    # a Tracer.
+
+    def __init__(self, tracer):
+        self.tracer = tracer
+        self._local = threading.local()
+
+    def _report(self, name, attributes, start, duration, exception=None):
+        try:
+            self.tracer.span_finished(
+                TraceSpan(name, attributes, start, duration, exception)
+            )
+        except Exception:  # pylint: disable=broad-except
+            LOG.exception("Tracer failed to handle span '%s'", name)
+
+    def install(self, session):
+        """Times the requests of every client the given boto3 session
+        creates from now on.
+        """
+
+        events = session.events
+        events.register("before-parameter-build", self._request_started)
+        events.register("after-call", self._request_finished)
+        events.register("after-call-error", self._request_failed)
+
+    def _request_started(self, params, model, context, **_kwargs):
+        attributes = {
+            "service": model.service_model.service_id,
+            "operation": model.name,
+        }
+        if params.get("Bucket"):
+            attributes["bucket"] = params["Bucket"]
+        # Only S3 keys, DynamoDB keys being attribute values
+        if params.get("Key") and not isinstance(params["Key"], dict):
+            attributes["key"] = params["Key"]
+        if params.get("TableName"):
+            attributes["table"] = params["TableName"]
+        elif isinstance(params.get("RequestItems"), dict):
+            attributes["table"] = ",".join(sorted(params["RequestItems"]))
+
+        attempt = getattr(self._local, "attempt", None)
+        if attempt:
+            attributes["attempt"] = attempt
+
+        context["chexus_trace"] = (attributes, time.time())
+
+    def _request_ended(self, context, exception=None, parsed=None):
+        if "chexus_trace" not in context:
+            return
+        attributes, start = context.pop("chexus_trace")
+
+        retries = ((parsed or {}).get("ResponseMetadata") or {}).get(
+            "RetryAttempts"
+        )
+        if retries:
+            attributes["retries"] = retries
+
+        self._report(
+            "%s.%s" % (attributes["service"], attributes["operation"]),
+            attributes,
+            start,
+            time.time() - start,
+            exception,
+        )
+
+    def _request_finished(self, http_response, parsed, model, context, **_):
+        exception = None
+        if http_response.status_code >= 300:
+            from botocore.exceptions import ClientError
+
+            exception = ClientError(parsed, model.name)
+        self._request_ended(context, exception, parsed)
+
+    def _request_failed(self, exception, context, **_kwargs):
+        self._request_ended(context, exception)
+
+    def task(self, attributes):
+        """Returns a task, whose attempts are to be made by run, having
+        the given attributes.
+        """
+
+        return _Task(attributes)
+
+    def run(self, task, fn, *args):
+        """Calls fn as an attempt at the given task, having reported how
+        long it waited since being submitted or last attempted.
+        """
+
+        now = time.time()
+        task.attempt += 1
+
+        attributes = dict(task.attributes, attempt=task.attempt)
+        self._report(WAIT_SPAN, attributes, task.ready, now - task.ready)
+
+        self._local.attempt = task.attempt
+        try:
+            return fn(*args)
+        finally:
+            self._local.attempt = None
+            task.ready = time.time()
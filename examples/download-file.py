@@ -72,15 +72,14 @@ def main():
 
     download_item = BucketItem(file_path=p.file_path, key=p.object_key)
 
-    if download_item.checksum:
-        resp = input(
-            "File already exists. Do you want to overwrite it? [y/N]:  "
-        )
-        if str(resp).lower() not in ("yes", "y"):
-            LOG.info("Aborting...")
-            return
-
-    client.download(items=download_item, bucket_name=p.bucket, dryrun=p.dryrun)
+    # An existing file identical to the object is left as it is, and any
+    # other is replaced
+    client.download(
+        items=download_item,
+        bucket_name=p.bucket,
+        dryrun=p.dryrun,
+        skip_unchanged="checksum",
+    )
 
     downloaded_item = BucketItem(file_path=p.file_path, key=p.object_key)
     assert downloaded_item.checksum
@@ -19,6 +19,8 @@ class MockedClient(Client):
             Client.__init__(
                 self, access_id, access_key, session_token, default_region
             )
+            # Sessions are created on first use
+            self._session  # pylint: disable=pointless-statement
         # Only use one retry attempt on tests
         self._executor = Executors.thread_pool(max_workers=4).with_retry(
             max_attempts=1
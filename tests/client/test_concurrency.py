@@ -0,0 +1,203 @@
+import threading
+
+import pytest
+from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import ClientError
+from more_executors import Executors
+
+from chexus import BucketItem, RetryPolicy
+from chexus._impl.client.concurrency import (
+    AdaptiveLimit,
+    AdaptiveLimiter,
+    is_throttle,
+)
+from . import MockedClient
+
+
+def throttle():
+    return ClientError(
+        {"Error": {"Code": "SlowDown", "Message": "Please reduce"}},
+        "PutObject",
+    )
+
+
+def test_is_throttle():
+    """Recognizes throttling errors of either service"""
+
+    assert is_throttle(throttle())
+    assert is_throttle(
+        ClientError(
+            {"Error": {"Code": "ProvisionedThroughputExceededException"}},
+            "PutItem",
+        )
+    )
+    assert is_throttle(
+        S3UploadFailedError(
+            "Failed to upload a to b: An error occurred (SlowDown) when "
+            "calling the PutObject operation: Please reduce"
+        )
+    )
+    assert not is_throttle(
+        ClientError({"Error": {"Code": "AccessDenied"}}, "PutObject")
+    )
+    assert not is_throttle(ValueError("SlowDown"))
+
+
+def test_limit_grows_additively():
+    """Grows by about one per limit's worth of healthy operations"""
+
+    limiter = AdaptiveLimiter(2, maximum=4)
+    executor = Executors.sync()
+
+    for _ in range(3):
+        limiter.submit(executor, "key", lambda: None).result()
+    assert limiter.get("key").limit == 3
+
+    for _ in range(10):
+        limiter.submit(executor, "key", lambda: None).result()
+    assert limiter.get("key").limit == 4
+
+
+def test_limit_cut_once_per_burst():
+    """Throttling of operations in flight together halves the limit once"""
+
+    limit = AdaptiveLimit(8, maximum=8)
+
+    tokens = [limit.attempt() for _ in range(4)]
+    for token in tokens:
+        limit.record(token, throttle())
+    assert limit.limit == 4
+
+    # Throttled again after the cut
+    limit.record(limit.attempt(), throttle())
+    assert limit.limit == 2
+
+    for _ in range(5):
+        limit.record(limit.attempt(), throttle())
+    assert limit.limit == 1
+
+
+def test_limit_holds_on_errors():
+    """Neither grows nor shrinks on other errors"""
+
+    limiter = AdaptiveLimiter(2, maximum=4)
+
+    def fail():
+        raise ValueError("oops")
+
+    ft = limiter.submit(Executors.sync(), "key", fail)
+
+    assert isinstance(ft.exception(), ValueError)
+    assert limiter.get("key").limit == 2
+
+
+def test_limit_blocks_excess():
+    """Holds back operations beyond the limit until others complete"""
+
+    limiter = AdaptiveLimiter(1, maximum=1)
+    executor = Executors.thread_pool(max_workers=2)
+    blocked = threading.Event()
+
+    done = threading.Event()
+
+    held_ft = limiter.submit(executor, "key", blocked.wait)
+    excess_ft = limiter.submit(executor, "key", done.set)
+    assert not done.wait(0.1)
+
+    blocked.set()
+    assert done.wait(5)
+    assert [held_ft.result(5), excess_ft.result(5)] == [True, None]
+    executor.shutdown()
+
+
+def test_limit_try_acquire():
+    """Declines operations beyond the limit without waiting"""
+
+    limit = AdaptiveLimit(1, maximum=1)
+
+    token = limit.try_acquire()
+    assert token is not None
+    assert limit.try_acquire() is None
+
+    limit.record(token)
+    limit.free()
+    assert limit.try_acquire() is not None
+
+
+def test_limiter_queues_outside_executor():
+    """Calls held back by one key's limit leave threads free for others"""
+
+    limiter = AdaptiveLimiter(1, 1)
+    executor = Executors.thread_pool(max_workers=2)
+    blocked = threading.Event()
+
+    held_fts = [
+        limiter.submit(executor, "busy", blocked.wait) for _ in range(3)
+    ]
+    other_ft = limiter.submit(executor, "other", lambda: "done")
+
+    # Only one call for the busy key is in the executor, so the other
+    # key's call isn't stuck behind those queued for it
+    assert other_ft.result(5) == "done"
+    assert not any(ft.done() for ft in held_fts)
+
+    blocked.set()
+    assert [ft.result(5) for ft in held_fts] == [True, True, True]
+    executor.shutdown()
+
+
+def test_limiter_synchronous_executor():
+    """Dispatches calls completing as they're submitted without recursing"""
+
+    limiter = AdaptiveLimiter(1, 1)
+    executor = Executors.sync()
+
+    fts = [limiter.submit(executor, "key", abs, -i) for i in range(5000)]
+
+    assert [ft.result() for ft in fts] == list(range(5000))
+    assert limiter.get("key").try_acquire() is not None
+
+
+def test_limiter_records_each_attempt():
+    """Throttled attempts cut the limit even when a retry succeeds"""
+
+    limiter = AdaptiveLimiter(4, 4)
+    executor = Executors.thread_pool(max_workers=2).with_retry(
+        retry_policy=RetryPolicy(max_attempts=3, sleep=0)
+    )
+    errors = [throttle()]
+
+    def flaky():
+        if errors:
+            raise errors.pop()
+        return "done"
+
+    assert limiter.submit(executor, "key", flaky).result(5) == "done"
+    limit = limiter.get("key")
+    assert limit.limit == 2
+
+    # Should've left the limit once, despite entering it twice
+    assert limit.try_acquire() is not None
+    assert limit.try_acquire() is not None
+    assert limit.try_acquire() is None
+    executor.shutdown()
+
+
+def test_upload_throttled():
+    """Throttled uploads cut the bucket's limit, leaving others be"""
+
+    item = BucketItem("tests/test_data/somefile.txt")
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+    mocked_bucket.upload_file.side_effect = S3UploadFailedError(
+        "An error occurred (SlowDown) when calling the PutObject operation"
+    )
+
+    client.upload(item, "test_bucket")
+
+    assert client._limiter.get(("s3", "test_bucket")).limit == 2
+    assert client._limiter.get(("s3", "other_bucket")).limit == 4
@@ -1,49 +1,252 @@
+import hashlib
+import io
+import json
 import logging
+import os
+from datetime import datetime
 
 import mock
 import pytest
+from boto3.s3.transfer import TransferConfig
 from botocore.exceptions import ClientError
 
 from chexus import BucketItem, TableItem
 from .mocked_client import MockedClient
 
 
+def mock_object(mocked_bucket, content, checksum=None):
+    """Makes the bucket's objects serve the given content"""
+
+    obj = mocked_bucket.Object.return_value
+    obj.key = "somefile"
+    obj.content_length = len(content)
+    obj.e_tag = '"some-etag"'
+    obj.last_modified = datetime(2020, 2, 1, 12, 30)
+    obj.metadata = {"sha256": checksum or hashlib.sha256(content).hexdigest()}
+
+    def get(Range, IfMatch):
+        start, end = [int(i) for i in Range.split("=")[1].split("-")]
+        return {"Body": io.BytesIO(content[start : end + 1])}
+
+    obj.get.side_effect = get
+    return obj
+
+
 @pytest.mark.parametrize("dryrun", [True, False])
-def test_download(dryrun, caplog):
+def test_download(dryrun, tmpdir, caplog):
     """Can download BucketItems"""
 
     items = (
-        BucketItem("tests/test_data/somefile.txt"),
-        BucketItem("tests/test_data/somefile2.txt"),
-        BucketItem("tests/test_data/somefile3.txt"),
+        BucketItem(str(tmpdir.join("somefile.txt"))),
+        BucketItem(str(tmpdir.join("somefile2.txt"))),
+        BucketItem(str(tmpdir.join("somefile3.txt"))),
     )
 
     client = MockedClient()
     mocked_bucket = client._session.resource().Bucket()
-
-    # Searching for the file returns an iterable of matches
-    mocked_bucket.download_file.return_value = []
+    obj = mock_object(mocked_bucket, b"some content")
 
     with caplog.at_level(logging.DEBUG):
         client.download(items, "test_bucket", dryrun=dryrun)
 
-    # Expected calls to download_file
-    download_calls = [mock.call(item.key, item.path) for item in items]
-
     if dryrun:
         # Should've only logged what would've been done
         for msg in ["Would download", "somefile.txt", "somefile2.txt"]:
             assert msg in caplog.text
-        mocked_bucket.download_file.assert_not_called()
+        obj.get.assert_not_called()
+        assert tmpdir.listdir() == []
     else:
-        # Should've downloaded
-        mocked_bucket.download_file.assert_has_calls(
-            download_calls, any_order=True
+        assert "One or more exceptions occurred" not in caplog.text
+
+        # Should've downloaded each item...
+        mocked_bucket.Object.assert_has_calls(
+            [mock.call(item.key) for item in items], any_order=True
         )
+        for item in items:
+            with open(item.path, "rb") as f:
+                assert f.read() == b"some content"
+            assert item.checksum == obj.metadata["sha256"]
+            # ...with the object's modification time
+            assert os.path.getmtime(item.path) == 1580560200
+
+        # ...leaving nothing else behind
+        assert len(tmpdir.listdir()) == len(items)
 
     assert "Download complete" in caplog.text
 
 
+def test_download_ranges(tmpdir):
+    """Downloads large files in ranges"""
+
+    item = BucketItem(str(tmpdir.join("somefile")))
+    content = b"0123456789" * 2 + b"01234"
+
+    client = MockedClient()
+    client._transfer_config = TransferConfig(
+        multipart_chunksize=10, max_concurrency=3
+    )
+    mocked_bucket = client._session.resource().Bucket()
+    obj = mock_object(mocked_bucket, content)
+
+    client.download(item, "test_bucket")
+
+    obj.get.assert_has_calls(
+        [
+            mock.call(Range="bytes=0-9", IfMatch='"some-etag"'),
+            mock.call(Range="bytes=10-19", IfMatch='"some-etag"'),
+            mock.call(Range="bytes=20-24", IfMatch='"some-etag"'),
+        ],
+        any_order=True,
+    )
+    with open(item.path, "rb") as f:
+        assert f.read() == content
+
+
+def test_download_resume(tmpdir, caplog):
+    """Resumes interrupted downloads"""
+
+    item = BucketItem(str(tmpdir.join("somefile")))
+    content = b"0123456789" * 2 + b"01234"
+
+    # A previous attempt got the first range
+    with open(item.path + ".part", "wb") as f:
+        f.write(content[:10])
+        f.truncate(len(content))
+    with open(item.path + ".part.json", "w") as f:
+        json.dump(
+            {
+                "etag": '"some-etag"',
+                "size": len(content),
+                "range_size": 10,
+                "done": [0],
+            },
+            f,
+        )
+
+    client = MockedClient()
+    client._transfer_config = TransferConfig(
+        multipart_chunksize=10, max_concurrency=3
+    )
+    mocked_bucket = client._session.resource().Bucket()
+    obj = mock_object(mocked_bucket, content)
+
+    with caplog.at_level(logging.DEBUG):
+        client.download(item, "test_bucket")
+
+    assert "1 of 3 range(s) complete" in caplog.text
+
+    # Should've only fetched the remaining ranges...
+    assert sorted(c[1]["Range"] for c in obj.get.call_args_list) == [
+        "bytes=10-19",
+        "bytes=20-24",
+    ]
+
+    # ...and verified the whole file
+    with open(item.path, "rb") as f:
+        assert f.read() == content
+    assert not os.path.exists(item.path + ".part")
+    assert not os.path.exists(item.path + ".part.json")
+
+
+def test_download_checksum_mismatch(tmpdir, caplog):
+    """Doesn't keep downloads not matching their checksum"""
+
+    item = BucketItem(str(tmpdir.join("somefile")))
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mock_object(mocked_bucket, b"corrupted", checksum="abc123")
+
+    with caplog.at_level(logging.DEBUG):
+        client.download(item, "test_bucket")
+
+    for msg in [
+        "One or more exceptions occurred during download",
+        "Checksum mismatch for somefile, expected 'abc123'",
+    ]:
+        assert msg in caplog.text
+
+    assert tmpdir.listdir() == []
+
+
+def test_download_replaces_existing(tmpdir, caplog):
+    """Replaces existing files without expecting their checksum"""
+
+    path = str(tmpdir.join("somefile"))
+    with open(path, "wb") as f:
+        f.write(b"old content")
+
+    item = BucketItem(path)
+    old_checksum = item.checksum
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    obj = mock_object(mocked_bucket, b"new content")
+
+    with caplog.at_level(logging.DEBUG):
+        client.download(item, "test_bucket")
+
+    assert "One or more exceptions occurred" not in caplog.text
+    with open(path, "rb") as f:
+        assert f.read() == b"new content"
+    assert item.checksum == obj.metadata["sha256"] != old_checksum
+
+
+@pytest.mark.parametrize("skip_unchanged", ["checksum", "mtime"])
+def test_download_skip_unchanged(skip_unchanged, tmpdir, caplog):
+    """Skips files already matching their object"""
+
+    items = [
+        BucketItem(str(tmpdir.join("unchanged"))),
+        BucketItem(str(tmpdir.join("changed"))),
+        BucketItem(str(tmpdir.join("missing"))),
+    ]
+    with open(items[0].path, "wb") as f:
+        f.write(b"some content")
+    with open(items[1].path, "wb") as f:
+        f.write(b"some CONTENT")
+    for item in items[:2]:
+        os.utime(item.path, (1580560200, 1580560200))
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    obj = mock_object(mocked_bucket, b"some content")
+
+    with caplog.at_level(logging.DEBUG):
+        client.download(items, "test_bucket", skip_unchanged=skip_unchanged)
+
+    assert "%s is already up to date" % items[0].path in caplog.text
+
+    if skip_unchanged == "checksum":
+        # Should've found the changed file by its content...
+        assert obj.get.call_count == 2
+        with open(items[1].path, "rb") as f:
+            assert f.read() == b"some content"
+    else:
+        # ...but not by its size and modification time
+        assert obj.get.call_count == 1
+
+
+def test_download_skip_unchanged_etag(tmpdir, caplog):
+    """Compares files to objects' ETags when they have no checksum"""
+
+    item = BucketItem(str(tmpdir.join("somefile")))
+    with open(item.path, "wb") as f:
+        f.write(b"some content")
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    obj = mock_object(mocked_bucket, b"some content")
+    obj.metadata = {}
+    obj.e_tag = '"%s"' % hashlib.md5(b"some content").hexdigest()
+
+    with caplog.at_level(logging.DEBUG):
+        client.download(item, "test_bucket", skip_unchanged="checksum")
+
+    assert "is already up to date" in caplog.text
+    obj.get.assert_not_called()
+
+
 def test_download_invalid_item(caplog):
     """Doesn't attempt to download invalid items"""
 
@@ -69,25 +272,46 @@ def test_download_invalid_item(caplog):
     ]:
         assert msg in caplog.text
 
-    client._session.resource().Bucket().download_file.assert_not_called()
+    client._session.resource().Bucket().Object.assert_not_called()
 
 
-def test_download_exceptions(caplog):
+def test_download_exceptions(tmpdir, caplog):
     """Exceptions raised from download are expressed in error logging"""
 
-    item = BucketItem("tests/test_data/somefile3.txt")
+    item = BucketItem(str(tmpdir.join("somefile3.txt")))
 
     client = MockedClient()
     # Files not preset in the S3 bucket
-    client._session.resource().Bucket().download_file.side_effect = [
-        ClientError({"Error": {"Code": "404"}}, "download")
-    ]
+    obj = client._session.resource().Bucket().Object.return_value
+    type(obj).metadata = mock.PropertyMock(
+        side_effect=ClientError({"Error": {"Code": "404"}}, "HeadObject")
+    )
 
     with caplog.at_level(logging.DEBUG):
         client.download(item, "test_bucket")
 
     for msg in [
         "One or more exceptions occurred during download",
-        "An error occurred (404) when calling the download operation: Unknown",
+        "An error occurred (404) when calling the HeadObject operation: "
+        "Unknown",
     ]:
         assert msg in caplog.text
+
+
+def test_download_async(tmpdir, caplog):
+    """Can download without blocking"""
+
+    item = BucketItem(str(tmpdir.join("somefile.txt")))
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mock_object(mocked_bucket, b"some content")
+
+    with caplog.at_level(logging.DEBUG):
+        download_ft = client.download_async(item, "test_bucket")
+        # Returned future resolves once the download is done
+        assert download_ft.result(timeout=10).ok
+
+    with open(item.path, "rb") as f:
+        assert f.read() == b"some content"
+    assert "Download complete" in caplog.text
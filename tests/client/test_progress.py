@@ -0,0 +1,137 @@
+import threading
+
+from botocore.exceptions import ClientError
+
+from chexus import BucketItem, Progress, ProgressStats, TableItem
+from . import MockedClient
+
+
+class RecordingProgress(Progress):
+    def __init__(self):
+        super(RecordingProgress, self).__init__(interval=0)
+        self.events = []
+        self.lock = threading.Lock()
+
+    def record(self, *event):
+        with self.lock:
+            self.events.append(event)
+
+    def started(self, stats):
+        self.record("started", stats.items_total, stats.bytes_total)
+
+    def item_started(self, item):
+        self.record("item_started", item)
+
+    def item_transferred(self, item, bytes_count):
+        self.record("item_transferred", item, bytes_count)
+
+    def item_finished(self, item, exception=None):
+        self.record("item_finished", item, exception)
+
+    def updated(self, stats):
+        self.record("updated", stats)
+
+    def finished(self, stats):
+        self.record("finished", stats)
+
+    def named(self, name):
+        return [event[1:] for event in self.events if event[0] == name]
+
+
+def test_progress_stats():
+    """Computes rates and an ETA"""
+
+    stats = ProgressStats(10, 4, 1, 8 * 1024 * 1024, 2 * 1024 * 1024, 2.0)
+
+    assert stats.items_per_second == 2.0
+    assert stats.megabytes_per_second == 1.0
+    assert stats.eta == 6.0
+
+    # Going by items where bytes aren't known
+    stats = ProgressStats(10, 4, 0, None, 0, 2.0)
+    assert stats.eta == 3.0
+
+    assert ProgressStats(10, 0, 0, None, 0, 0).eta is None
+
+    # Streamed items have no total
+    assert ProgressStats(None, 4, 0, None, 0, 2.0).eta is None
+
+
+def test_upload_progress():
+    """Reports the progress of each item and of the whole upload"""
+
+    items = [
+        BucketItem("tests/test_data/somefile.txt"),
+        BucketItem("tests/test_data/somefile2.txt"),
+    ]
+    progress = RecordingProgress()
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+
+    def upload_file(path, key, **kwargs):
+        # Transferred in two chunks
+        kwargs["Callback"](6000)
+        kwargs["Callback"](4000)
+
+    mocked_bucket.upload_file.side_effect = upload_file
+
+    client.upload(items, "test_bucket", progress=progress)
+
+    assert progress.events[0] == ("started", 2, 20009)
+    assert sorted(i.key for (i,) in progress.named("item_started")) == [
+        "somefile.txt",
+        "somefile2.txt",
+    ]
+    assert len(progress.named("item_transferred")) == 4
+    assert [e for _, e in progress.named("item_finished")] == [None, None]
+
+    (stats,) = progress.named("finished")[0]
+    assert progress.events[-1][0] == "finished"
+    assert stats.items_done == 2
+    assert stats.items_failed == 0
+    assert stats.bytes_done == 20000
+    assert stats.bytes_total == 20000
+
+
+def test_upload_progress_skipped():
+    """Discounts the bytes of items skipped from the total"""
+
+    item = BucketItem("tests/test_data/somefile.txt")
+    progress = RecordingProgress()
+
+    client = MockedClient()
+
+    client.upload(item, "test_bucket", progress=progress)
+
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.upload_file.assert_not_called()
+
+    (stats,) = progress.named("finished")[0]
+    assert stats.items_done == 1
+    assert stats.bytes_total == 0
+
+
+def test_publish_progress_failed():
+    """Reports items failing"""
+
+    items = [TableItem(key1="a"), TableItem(key1="b")]
+    progress = RecordingProgress()
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+    mocked_table.name = "test_table"
+    mocked_table.key_schema = [{"AttributeName": "key1", "KeyType": "HASH"}]
+    mocked_table.put_item.side_effect = ValueError("oops")
+
+    client.publish(items, "test_table", mode="conditional", progress=progress)
+
+    finished = progress.named("item_finished")
+    assert len(finished) == 2
+    assert all(isinstance(err, ValueError) for _, err in finished)
+
+    (stats,) = progress.named("finished")[0]
+    assert stats.items_failed == 2
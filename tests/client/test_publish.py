@@ -1,9 +1,17 @@
+import io
 import logging
 
 import mock
 import pytest
-
-from chexus import BucketItem, TableItem
+from botocore.exceptions import ClientError
+
+from chexus import (
+    BucketItem,
+    Progress,
+    TableItem,
+    TableItemBatch,
+    TableItemSchema,
+)
 from . import MockedClient
 
 
@@ -59,10 +67,10 @@ def test_publish_duplicate(caplog):
         "Items": [{"key1": "test", "key2": 1234}]
     }
 
-    # Expected table attributes
-    mocked_table.attribute_definitions = [
-        {"AttributeName": "key1", "AttributeType": "S"},
-        {"AttributeName": "key2", "AttributeType": "S"},
+    # Expected table keys
+    mocked_table.key_schema = [
+        {"AttributeName": "key1", "KeyType": "HASH"},
+        {"AttributeName": "key2", "KeyType": "RANGE"},
     ]
 
     with caplog.at_level(logging.DEBUG):
@@ -116,8 +124,8 @@ def test_publish_without_table_key(caplog):
     mocked_table.query.return_value = {"Items": []}
 
     # Table contains unexpected keys
-    mocked_table.attribute_definitions = [
-        {"AttributeName": "Nope", "AttributeType": "S"},
+    mocked_table.key_schema = [
+        {"AttributeName": "Nope", "KeyType": "HASH"},
     ]
 
     with caplog.at_level(logging.DEBUG):
@@ -137,10 +145,10 @@ def test_publish_error(caplog):
     # Querying the table returns a dictionary of matching record items
     mocked_table.query.return_value = {"Items": []}
 
-    # Expected table attributes
-    mocked_table.attribute_definitions = [
-        {"AttributeName": "key1", "AttributeType": "S"},
-        {"AttributeName": "key2", "AttributeType": "S"},
+    # Expected table keys
+    mocked_table.key_schema = [
+        {"AttributeName": "key1", "KeyType": "HASH"},
+        {"AttributeName": "key2", "KeyType": "RANGE"},
     ]
 
     # Some internal error when attempting to put the item
@@ -157,3 +165,298 @@ def test_publish_error(caplog):
         "Something went wrong",
     ]:
         assert msg in caplog.text
+
+
+def test_publish_async(caplog):
+    """Can publish without blocking"""
+
+    item = TableItem(key1="test", key2=1234)
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+    mocked_table.query.return_value = {"Items": []}
+
+    with caplog.at_level(logging.DEBUG):
+        publish_ft = client.publish_async(item, "test_table")
+        # Returned future resolves once the publish is done
+        assert publish_ft.result(timeout=10).ok
+
+    mocked_table.put_item.assert_called_once_with(
+        Item={"key1": "test", "key2": 1234}
+    )
+    assert "Publish complete" in caplog.text
+
+
+def test_publish_batch(caplog):
+    """Can publish TableItems in batches"""
+
+    items = [TableItem(key1="test-%03d" % i, key2=i) for i in range(150)]
+
+    client = MockedClient()
+    dynamodb = client._session.resource()
+    mocked_table = dynamodb.Table()
+    mocked_table.name = "test_table"
+    mocked_table.key_schema = [{"AttributeName": "key1", "KeyType": "HASH"}]
+
+    # The first item is already present, the second is present but stale
+    dynamodb.batch_get_item.return_value = {
+        "Responses": {
+            "test_table": [
+                {"key1": "test-000", "key2": 0},
+                {"key1": "test-001", "key2": 999},
+            ]
+        },
+        "UnprocessedKeys": {},
+    }
+    dynamodb.batch_write_item.return_value = {"UnprocessedItems": {}}
+
+    with caplog.at_level(logging.DEBUG):
+        client.publish(items, "test_table", mode="batch")
+
+    # Should've checked for existing items in batches of up to 100...
+    assert dynamodb.batch_get_item.call_count == 2
+    for call in dynamodb.batch_get_item.call_args_list:
+        assert len(call[1]["RequestItems"]["test_table"]["Keys"]) <= 100
+    assert "Item already exists in table" in caplog.text
+
+    # ...and put all others in batches of up to 25
+    put = []
+    for call in dynamodb.batch_write_item.call_args_list:
+        requests = call[1]["RequestItems"]["test_table"]
+        assert len(requests) <= 25
+        put.extend(req["PutRequest"]["Item"] for req in requests)
+
+    assert len(put) == 149
+    assert {"key1": "test-000", "key2": 0} not in put
+    assert {"key1": "test-001", "key2": 1} in put
+
+    # Should not have made any single-item requests
+    mocked_table.query.assert_not_called()
+    mocked_table.put_item.assert_not_called()
+    assert "Publish complete" in caplog.text
+
+
+def test_publish_batch_unprocessed(caplog):
+    """Re-drives unprocessed batch requests"""
+
+    item = TableItem(key1="test", key2=1234)
+
+    client = MockedClient()
+    dynamodb = client._session.resource()
+    mocked_table = dynamodb.Table()
+    mocked_table.name = "test_table"
+    mocked_table.key_schema = [{"AttributeName": "key1", "KeyType": "HASH"}]
+
+    unprocessed_keys = {"test_table": {"Keys": [{"key1": "test"}]}}
+    dynamodb.batch_get_item.side_effect = [
+        {"Responses": {}, "UnprocessedKeys": unprocessed_keys},
+        {"Responses": {"test_table": []}},
+    ]
+    unprocessed_items = {
+        "test_table": [
+            {"PutRequest": {"Item": {"key1": "test", "key2": 1234}}}
+        ]
+    }
+    dynamodb.batch_write_item.side_effect = [
+        {"UnprocessedItems": unprocessed_items},
+        {"UnprocessedItems": {}},
+    ]
+
+    with caplog.at_level(logging.DEBUG):
+        client.publish(item, "test_table", mode="batch")
+
+    dynamodb.batch_get_item.assert_called_with(RequestItems=unprocessed_keys)
+    dynamodb.batch_write_item.assert_called_with(
+        RequestItems=unprocessed_items
+    )
+    assert "One or more exceptions occurred" not in caplog.text
+
+
+def test_publish_bad_mode():
+    """Rejects unknown publish modes"""
+
+    client = MockedClient()
+
+    with pytest.raises(ValueError) as err:
+        client.publish(TableItem(key1="test"), "test_table", mode="fast")
+
+    assert "Expected 'mode' to be one of" in str(err.value)
+    client._session.resource().Table().put_item.assert_not_called()
+
+
+def test_publish_conditional(caplog):
+    """Can publish TableItems with conditional puts"""
+
+    items = [
+        TableItem(key1="test", key2=1234),
+        TableItem(key1="testing", key2=5678),
+    ]
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+    mocked_table.key_schema = [
+        {"AttributeName": "key1", "KeyType": "HASH"},
+        {"AttributeName": "key2", "KeyType": "RANGE"},
+    ]
+
+    # The second item already exists
+    def put_item(Item, **kwargs):
+        if Item["key1"] == "testing":
+            raise ClientError(
+                {"Error": {"Code": "ConditionalCheckFailedException"}},
+                "PutItem",
+            )
+
+    mocked_table.put_item.side_effect = put_item
+
+    with caplog.at_level(logging.DEBUG):
+        client.publish(items, "test_table", mode="conditional")
+
+    # Should not have searched the table first...
+    mocked_table.query.assert_not_called()
+
+    # ...but put each item only where its key is absent
+    mocked_table.put_item.assert_has_calls(
+        [
+            mock.call(
+                Item=item.attrs,
+                ConditionExpression="attribute_not_exists(#k0) and "
+                "attribute_not_exists(#k1)",
+                ExpressionAttributeNames={"#k0": "key1", "#k1": "key2"},
+            )
+            for item in items
+        ],
+        any_order=True,
+    )
+
+    assert "Item already exists in table" in caplog.text
+    assert "One or more exceptions occurred" not in caplog.text
+
+
+def test_publish_item_batch():
+    """Publishes the rows of a TableItemBatch as they're reached"""
+
+    rows = ({"key1": "test-%03d" % i, "key2": i} for i in range(150))
+    batch = TableItemBatch.from_dicts(rows)
+
+    client = MockedClient()
+    dynamodb = client._session.resource()
+    mocked_table = dynamodb.Table()
+    mocked_table.name = "test_table"
+    mocked_table.key_schema = [{"AttributeName": "key1", "KeyType": "HASH"}]
+    dynamodb.batch_get_item.return_value = {
+        "Responses": {"test_table": [{"key1": "test-000", "key2": 0}]}
+    }
+    dynamodb.batch_write_item.return_value = {}
+
+    report = client.publish(batch, "test_table", mode="batch")
+
+    put = []
+    for call in dynamodb.batch_write_item.call_args_list:
+        requests = call[1]["RequestItems"]["test_table"]
+        put.extend(req["PutRequest"]["Item"] for req in requests)
+
+    assert len(put) == 149
+    assert {"key1": "test-149", "key2": 149} in put
+
+    # Only the results of items failing are held
+    assert len(report) == 150
+    assert report.count("done") == 149
+    assert report.count("skipped-exists") == 1
+    assert report.results == []
+    assert report.ok
+
+
+def test_publish_item_batch_invalid_rows(caplog):
+    """Fails rows unable to be made items, publishing the rest"""
+
+    records = [
+        {"key1": "a", "released": "2020-02-01"},
+        {"key1": "b", "released": "Feb. 1, 2020"},
+        {"key1": "c", "other": "attribute"},
+        {"key1": "d"},
+    ]
+    batch = TableItemBatch.from_dicts(
+        records, schema=TableItemSchema({"released": "datetime"})
+    )
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+    mocked_table.name = "test_table"
+    mocked_table.key_schema = [{"AttributeName": "key1", "KeyType": "HASH"}]
+    mocked_table.query.return_value = {"Items": []}
+
+    report = client.publish(batch, "test_table")
+
+    mocked_table.put_item.assert_has_calls(
+        [
+            mock.call(Item={"key1": "a", "released": "2020-02-01T00:00:00"}),
+            mock.call(Item={"key1": "d"}),
+        ],
+        any_order=True,
+    )
+
+    assert [result.item for result in report.failed] == [
+        ("b", "Feb. 1, 2020"),
+        records[2],
+    ]
+    assert "ISO 8601" in str(report.failed[0].exception)
+    assert "got 'other' instead" in str(report.failed[1].exception)
+    assert report.count("done") == 2
+    assert "Invalid row in batch" in caplog.text
+
+
+def test_publish_item_batch_dryrun():
+    """Publishes nothing from a TableItemBatch in a dry run"""
+
+    batch = TableItemBatch(["key1"], [("a",), ("b",)])
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+
+    report = client.publish(batch, "test_table", dryrun=True)
+
+    mocked_table.put_item.assert_not_called()
+    assert report.count("dry-run") == 2
+
+
+def test_publish_item_batch_unreadable_rows():
+    """Fails lines unable to be parsed, publishing the rest"""
+
+    stream = io.StringIO('{"key1": "a"}\nnot json\n{"key1": "b"}\n')
+    batch = TableItemBatch.from_json_lines(stream)
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+    mocked_table.name = "test_table"
+    mocked_table.key_schema = [{"AttributeName": "key1", "KeyType": "HASH"}]
+    mocked_table.query.return_value = {"Items": []}
+
+    report = client.publish(batch, "test_table")
+
+    assert report.count("done") == 2
+    assert len(report.failed) == 1
+    assert "Invalid JSON on line 2" in str(report.failed[0].exception)
+
+
+def test_publish_item_batch_read_error():
+    """Finishes the report and progress when a batch can't be read"""
+
+    def rows():
+        yield ("a",)
+        raise IOError("Disk on fire")
+
+    batch = TableItemBatch(["key1"], rows())
+    progress = mock.Mock(spec=Progress, interval=1.0)
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+    mocked_table.name = "test_table"
+    mocked_table.key_schema = [{"AttributeName": "key1", "KeyType": "HASH"}]
+    mocked_table.query.return_value = {"Items": []}
+
+    with pytest.raises(IOError):
+        client.publish(batch, "test_table", progress=progress)
+
+    mocked_table.put_item.assert_called_once_with(Item={"key1": "a"})
+    assert progress.finished.called
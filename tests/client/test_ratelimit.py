@@ -0,0 +1,123 @@
+import mock
+from botocore.exceptions import ClientError
+
+from chexus import BucketItem, RateLimit, TableItem
+from . import MockedClient
+
+
+class FakeClock(object):
+    """Stands in for time.time and time.sleep"""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.slept = 0.0
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.slept += seconds
+        self.now += seconds
+
+
+def test_rate_limit_requests():
+    """Lets through a burst, then a steady rate"""
+
+    clock = FakeClock()
+    with mock.patch("time.time", clock.time), mock.patch(
+        "time.sleep", clock.sleep
+    ):
+        limit = RateLimit(requests_per_second=10, burst=1.0)
+
+        for _ in range(10):
+            limit.acquire()
+        assert clock.slept == 0
+
+        for _ in range(20):
+            limit.acquire()
+        assert abs(clock.slept - 2.0) < 1e-6
+
+
+def test_rate_limit_overdraw():
+    """Lets through amounts larger than the burst, making up for them"""
+
+    clock = FakeClock()
+    with mock.patch("time.time", clock.time), mock.patch(
+        "time.sleep", clock.sleep
+    ):
+        limit = RateLimit(bytes_per_second=100)
+
+        limit.acquire(size=300)
+        assert abs(clock.slept - 2.0) < 1e-6
+
+        limit.acquire(size=100)
+        assert abs(clock.slept - 3.0) < 1e-6
+
+
+def test_rate_limit_charge():
+    """Corrects estimated capacity units by those consumed"""
+
+    clock = FakeClock()
+    with mock.patch("time.time", clock.time), mock.patch(
+        "time.sleep", clock.sleep
+    ):
+        limit = RateLimit(units_per_second=10)
+
+        limit.acquire(units=1)
+        limit.charge(29)
+        limit.acquire(units=1)
+        assert abs(clock.slept - 2.1) < 1e-6
+
+        # Unused units are returned, up to the burst
+        limit.charge(-100)
+        limit.acquire(units=10)
+        assert abs(clock.slept - 2.1) < 1e-6
+
+
+def test_upload_rate_limited():
+    """Uploads wait for their bucket's rate limit"""
+
+    item = BucketItem("tests/test_data/somefile.txt")
+    limit = mock.MagicMock()
+
+    client = MockedClient()
+    client._rate_limits = {"test_bucket": limit}
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+
+    client.upload(item, "test_bucket")
+    client.upload(item, "other_bucket")
+
+    # A HEAD request, then the upload of the file in one request
+    assert limit.acquire.mock_calls == [
+        mock.call(1, 0, 0),
+        mock.call(1, 10000, 0),
+    ]
+
+
+def test_publish_rate_limited():
+    """Puts wait for their table's rate limit, corrected by the capacity
+    they consumed"""
+
+    item = TableItem(key1="test", attr1="value")
+    limit = RateLimit(units_per_second=100)
+
+    client = MockedClient()
+    client._rate_limits = {"test_table": limit}
+    dynamodb = client._session.resource()
+    mocked_table = dynamodb.Table()
+    mocked_table.name = "test_table"
+    mocked_table.key_schema = [{"AttributeName": "key1", "KeyType": "HASH"}]
+    mocked_table.put_item.return_value = {
+        "ConsumedCapacity": {"TableName": "test_table", "CapacityUnits": 4.0}
+    }
+
+    with mock.patch.object(limit, "charge") as charge:
+        client.publish(item, "test_table", mode="conditional")
+
+    assert (
+        mocked_table.put_item.call_args[1]["ReturnConsumedCapacity"] == "TOTAL"
+    )
+    charge.assert_called_once_with(3.0)
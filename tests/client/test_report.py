@@ -0,0 +1,150 @@
+import logging
+
+import mock
+from botocore.exceptions import ClientError
+from more_executors import Executors
+
+from chexus import BucketItem, ItemResult, Report, RetryPolicy, TableItem
+from . import MockedClient
+
+
+def test_report_latency_percentiles():
+    """Computes percentiles of the durations of items attempted"""
+
+    results = [
+        ItemResult("item%s" % i, "done", attempts=1, duration=i)
+        for i in range(1, 101)
+    ]
+    results.append(ItemResult("dry", "dry-run"))
+
+    report = Report(results)
+
+    assert report.latency_percentiles == {50: 50, 90: 90, 99: 99}
+    assert report.latency_percentile(100) == 100
+    assert Report([]).latency_percentile(50) is None
+
+
+def test_report_omitted():
+    """Counts the items whose results aren't held"""
+
+    failed = ItemResult("item", "failed", attempts=1, duration=5)
+    report = Report([failed], omitted={"done": 3}, durations=[1, 2, 3, 5])
+
+    assert len(report) == 4
+    assert report.done == []
+    assert report.count("done") == 3
+    assert report.count("failed") == 1
+    assert report.latency_percentiles == {50: 2, 90: 5, 99: 5}
+
+
+def test_upload_report(caplog):
+    """Reports the outcome of each item uploaded, in order"""
+
+    new = BucketItem("tests/test_data/somefile.txt")
+    present = BucketItem("tests/test_data/somefile2.txt")
+    broken = BucketItem("tests/test_data/somefile3.txt")
+    items = [new, "not an item", present, broken]
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+
+    def get_object(key):
+        obj = mock.MagicMock()
+        if key != present.key:
+            obj.load.side_effect = ClientError(
+                {"Error": {"Code": "404"}}, "HeadObject"
+            )
+        return obj
+
+    def upload_file(path, key, **kwargs):
+        if key == broken.key:
+            raise IOError("Disk on fire")
+
+    mocked_bucket.Object.side_effect = get_object
+    mocked_bucket.upload_file.side_effect = upload_file
+
+    with caplog.at_level(logging.DEBUG):
+        report = client.upload(items, "test_bucket")
+
+    assert [result.item for result in report] == items
+    assert [result.status for result in report] == [
+        "done",
+        "failed",
+        "skipped-exists",
+        "failed",
+    ]
+    assert isinstance(report.results[1].exception, ValueError)
+    assert str(report.results[3].exception) == "Disk on fire"
+    assert report.results[0].attempts == 1
+    assert report.results[1].attempts == 0
+    assert report.failed == [report.results[1], report.results[3]]
+    assert not report.ok
+
+    # Only the exceptions are logged
+    assert "None" not in caplog.text
+
+
+def test_upload_report_dryrun():
+    """Reports items not uploaded in a dry run"""
+
+    item = BucketItem("tests/test_data/somefile.txt")
+
+    client = MockedClient()
+    report = client.upload(item, "test_bucket", dryrun=True)
+
+    assert [result.status for result in report] == ["dry-run"]
+    assert report.ok
+
+
+def test_upload_report_attempts():
+    """Counts the attempts at an item"""
+
+    item = BucketItem("tests/test_data/somefile.txt")
+
+    client = MockedClient()
+    client._executor = Executors.thread_pool(max_workers=4).with_retry(
+        retry_policy=RetryPolicy(max_attempts=3, sleep=0)
+    )
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+    mocked_bucket.upload_file.side_effect = [
+        ClientError({"Error": {"Code": "SlowDown"}}, "PutObject"),
+        None,
+    ]
+
+    (result,) = client.upload(item, "test_bucket")
+
+    assert result.status == "done"
+    assert result.attempts == 2
+    assert result.exception is None
+
+
+def test_publish_batch_report():
+    """Reports the outcome of each item published in a batch"""
+
+    items = [
+        TableItem(key1="new"),
+        TableItem(key1="present"),
+        TableItem(attr1="no key"),
+    ]
+
+    client = MockedClient()
+    dynamodb = client._session.resource()
+    mocked_table = dynamodb.Table()
+    mocked_table.name = "test_table"
+    mocked_table.key_schema = [{"AttributeName": "key1", "KeyType": "HASH"}]
+    dynamodb.batch_get_item.return_value = {
+        "Responses": {"test_table": [{"key1": "present"}]}
+    }
+    dynamodb.batch_write_item.return_value = {}
+
+    report = client.publish(items, "test_table", mode="batch")
+
+    assert [result.status for result in report] == [
+        "done",
+        "skipped-exists",
+        "failed",
+    ]
+    assert "missing required key" in str(report.results[2].exception)
@@ -0,0 +1,166 @@
+import mock
+import pytest
+from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import ClientError, EndpointConnectionError
+from more_executors import Executors
+from more_executors.futures import f_return, f_return_error
+
+from chexus import BucketItem, RetryPolicy
+from chexus._impl.client.retry import is_retryable
+from . import MockedClient
+
+
+def client_error(code):
+    return ClientError({"Error": {"Code": code}}, "PutObject")
+
+
+@pytest.mark.parametrize(
+    "err, retryable",
+    [
+        (client_error("SlowDown"), True),
+        (client_error("ProvisionedThroughputExceededException"), True),
+        (client_error("InternalError"), True),
+        (client_error("503"), True),
+        (client_error("AccessDenied"), False),
+        (client_error("ValidationException"), False),
+        (client_error("NoSuchBucket"), False),
+        (EndpointConnectionError(endpoint_url="https://s3"), True),
+        (
+            S3UploadFailedError(
+                "An error occurred (InternalError) when calling the "
+                "UploadPart operation"
+            ),
+            True,
+        ),
+        (
+            S3UploadFailedError(
+                "An error occurred (AccessDenied) when calling the "
+                "PutObject operation"
+            ),
+            False,
+        ),
+        (S3UploadFailedError("Connection reset by peer"), True),
+        (ValueError("oops"), False),
+    ],
+)
+def test_is_retryable(err, retryable):
+    """Classifies errors as retryable or fatal"""
+
+    assert is_retryable(err) is retryable
+
+
+def test_retry_policy_attempts():
+    """Retries retryable errors until out of attempts"""
+
+    policy = RetryPolicy(max_attempts=3)
+    throttled = f_return_error(client_error("SlowDown"))
+
+    assert policy.should_retry(1, throttled)
+    assert policy.should_retry(2, throttled)
+    assert not policy.should_retry(3, throttled)
+    assert not policy.should_retry(1, f_return_error(ValueError("oops")))
+    assert not policy.should_retry(1, f_return(None))
+
+
+def test_retry_policy_full_jitter():
+    """Sleeps a random time up to an exponentially growing maximum"""
+
+    policy = RetryPolicy(sleep=1.0, max_sleep=6.0)
+    throttled = f_return_error(client_error("SlowDown"))
+
+    with mock.patch("random.uniform") as uniform:
+        for attempt in range(1, 5):
+            policy.sleep_time(attempt, throttled)
+
+    assert uniform.mock_calls == [
+        mock.call(0, 1.0),
+        mock.call(0, 2.0),
+        mock.call(0, 4.0),
+        mock.call(0, 6.0),
+    ]
+
+
+def test_retry_policy_budget():
+    """Stops retrying once the budget is spent, until tasks succeed"""
+
+    policy = RetryPolicy(max_attempts=10, budget=2, refund=0.5)
+    failed = f_return_error(client_error("InternalError"))
+
+    assert policy.should_retry(1, failed)
+    assert policy.should_retry(1, failed)
+    assert not policy.should_retry(1, failed)
+
+    policy.should_retry(1, f_return(None))
+    policy.should_retry(1, f_return(None))
+    assert policy.tokens == 1
+    assert policy.should_retry(1, failed)
+
+
+def test_retry_policy_throttle_free():
+    """Retries throttled tasks without spending the budget"""
+
+    policy = RetryPolicy(max_attempts=10, budget=1)
+    throttled = f_return_error(client_error("SlowDown"))
+
+    for _ in range(5):
+        assert policy.should_retry(1, throttled)
+    assert policy.tokens == 1
+
+
+def test_upload_throttled_batch():
+    """Completes a batch throttled beyond the retry budget"""
+
+    items = [
+        BucketItem("tests/test_data/somefile.txt", key="file-%s" % i)
+        for i in range(20)
+    ]
+
+    client = MockedClient()
+    client._executor = Executors.thread_pool(max_workers=4).with_retry(
+        retry_policy=RetryPolicy(max_attempts=3, sleep=0, budget=1)
+    )
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+
+    # Every upload is throttled once before succeeding
+    throttled = set()
+
+    def upload_file(path, key, **kwargs):
+        if key not in throttled:
+            throttled.add(key)
+            raise S3UploadFailedError(
+                "An error occurred (SlowDown) when calling the PutObject "
+                "operation"
+            )
+
+    mocked_bucket.upload_file.side_effect = upload_file
+
+    report = client.upload(items, "test_bucket")
+
+    assert report.ok
+    assert mocked_bucket.upload_file.call_count == 2 * len(items)
+
+
+@pytest.mark.parametrize("code, attempts", [("AccessDenied", 1), ("500", 3)])
+def test_upload_retries(code, attempts):
+    """Retries uploads only when they may succeed"""
+
+    item = BucketItem("tests/test_data/somefile.txt")
+
+    client = MockedClient()
+    client._executor = Executors.thread_pool(max_workers=4).with_retry(
+        retry_policy=RetryPolicy(max_attempts=3, sleep=0)
+    )
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+    mocked_bucket.upload_file.side_effect = S3UploadFailedError(
+        "An error occurred (%s) when calling the PutObject operation" % code
+    )
+
+    client.upload(item, "test_bucket")
+
+    assert mocked_bucket.upload_file.call_count == attempts
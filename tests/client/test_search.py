@@ -1,5 +1,6 @@
 import logging
 
+import mock
 import pytest
 
 from chexus import TableItem
@@ -17,9 +18,9 @@ def test_search():
         "Items": [{"key1": 1234, "att1": "foo"}]
     }
 
-    # Expected table attributes
-    mocked_table.attribute_definitions = [
-        {"AttributeName": "key1", "AttributeType": "S"},
+    # Expected table keys
+    mocked_table.key_schema = [
+        {"AttributeName": "key1", "KeyType": "HASH"},
     ]
 
     client.search(item, "test_table")
@@ -58,9 +59,9 @@ def test_search_response_too_large(caplog):
         "LastEvaluatedKey": {"key1": "test"},
     }
 
-    # Expected table attributes
-    mocked_table.attribute_definitions = [
-        {"AttributeName": "key1", "AttributeType": "S"},
+    # Expected table keys
+    mocked_table.key_schema = [
+        {"AttributeName": "key1", "KeyType": "HASH"},
     ]
 
     with caplog.at_level(logging.DEBUG):
@@ -74,3 +75,167 @@ def test_search_response_too_large(caplog):
     )
 
     assert "Query limit reached, results truncated" in caplog.text
+
+
+def test_search_schema_cached():
+    """Describes each table only once"""
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+    mocked_table.query.return_value = {"Items": []}
+
+    key_schema = mock.PropertyMock(
+        return_value=[{"AttributeName": "key1", "KeyType": "HASH"}]
+    )
+    type(mocked_table).key_schema = key_schema
+
+    for value in ("hello", "world", "again"):
+        client.search(TableItem(key1=1234, attr1=value), "test_table")
+
+    key_schema.assert_called_once()
+    mocked_table.query.assert_called_with(
+        ExpressionAttributeValues={":key1val": "1234", ":attr1val": "again"},
+        FilterExpression="attr1 = :attr1val",
+        KeyConditionExpression="key1 = :key1val",
+        Select="ALL_ATTRIBUTES",
+    )
+
+
+def test_search_schema_expired():
+    """Describes tables again once their cached schema expires"""
+
+    client = MockedClient()
+    client._schema_ttl = 60
+    mocked_table = client._session.resource().Table()
+    mocked_table.query.return_value = {"Items": []}
+
+    key_schema = mock.PropertyMock(
+        return_value=[{"AttributeName": "key1", "KeyType": "HASH"}]
+    )
+    type(mocked_table).key_schema = key_schema
+
+    item = TableItem(key1=1234, attr1="hello")
+    with mock.patch("time.time") as mocked_time:
+        for now in (0, 30, 90):
+            mocked_time.return_value = now
+            client.search(item, "test_table")
+
+    # Described at first, then again once the first expired
+    assert key_schema.call_count == 2
+
+
+def test_search_index():
+    """Queries a secondary index when the table's key isn't given"""
+
+    item = TableItem(attr1="hello", attr2="world")
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+    mocked_table.query.return_value = {"Items": []}
+    mocked_table.key_schema = [{"AttributeName": "key1", "KeyType": "HASH"}]
+    mocked_table.global_secondary_indexes = [
+        {
+            "IndexName": "attr1-index",
+            "KeySchema": [{"AttributeName": "attr1", "KeyType": "HASH"}],
+        }
+    ]
+    mocked_table.local_secondary_indexes = None
+
+    client.search(item, "test_table")
+
+    mocked_table.query.assert_called_with(
+        ExpressionAttributeValues={":attr1val": "hello", ":attr2val": "world"},
+        FilterExpression="attr2 = :attr2val",
+        IndexName="attr1-index",
+        KeyConditionExpression="attr1 = :attr1val",
+    )
+
+
+def test_search_iter(caplog):
+    """Can lazily iterate over every page of results"""
+
+    item = TableItem(key1=1234, attr1="hello")
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+    mocked_table.key_schema = [{"AttributeName": "key1", "KeyType": "HASH"}]
+
+    # Results span three pages
+    mocked_table.query.side_effect = [
+        {"Items": [{"n": 1}, {"n": 2}], "LastEvaluatedKey": {"key1": "a"}},
+        {"Items": [], "LastEvaluatedKey": {"key1": "b"}},
+        {"Items": [{"n": 3}]},
+    ]
+
+    with caplog.at_level(logging.DEBUG):
+        results = client.search_iter(item, "test_table", page_size=2)
+
+        # Shouldn't have queried until iterated over
+        mocked_table.query.assert_not_called()
+
+        assert next(results) == {"n": 1}
+        assert mocked_table.query.call_count == 1
+
+        assert list(results) == [{"n": 2}, {"n": 3}]
+
+    assert mocked_table.query.call_count == 3
+    mocked_table.query.assert_called_with(
+        ExpressionAttributeValues={":key1val": "1234", ":attr1val": "hello"},
+        ExclusiveStartKey={"key1": "b"},
+        FilterExpression="attr1 = :attr1val",
+        KeyConditionExpression="key1 = :key1val",
+        Limit=2,
+        Select="ALL_ATTRIBUTES",
+    )
+    assert "results truncated" not in caplog.text
+
+
+def test_search_iter_max_items():
+    """Stops requesting pages once enough items are found"""
+
+    item = TableItem(key1=1234)
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+    mocked_table.query.side_effect = [
+        {"Items": [{"n": 1}, {"n": 2}], "LastEvaluatedKey": {"key1": "a"}},
+        {"Items": [{"n": 3}, {"n": 4}], "LastEvaluatedKey": {"key1": "b"}},
+        {"Items": [{"n": 5}]},
+    ]
+
+    results = client.search_iter(item, "test_table", max_items=3)
+
+    assert list(results) == [{"n": 1}, {"n": 2}, {"n": 3}]
+    assert mocked_table.query.call_count == 2
+    # Should've asked for no more items than were still wanted
+    assert [c[1]["Limit"] for c in mocked_table.query.call_args_list] == [
+        3,
+        1,
+    ]
+
+
+def test_search_iter_max_items_page_end():
+    """Doesn't request another page when the last one ends at the limit"""
+
+    item = TableItem(key1=1234)
+
+    client = MockedClient()
+    mocked_table = client._session.resource().Table()
+    mocked_table.query.side_effect = [
+        {"Items": [{"n": 1}, {"n": 2}], "LastEvaluatedKey": {"key1": "a"}},
+        {"Items": [{"n": 3}, {"n": 4}], "LastEvaluatedKey": {"key1": "b"}},
+    ]
+
+    results = client.search_iter(item, "test_table", page_size=2, max_items=4)
+
+    assert list(results) == [{"n": 1}, {"n": 2}, {"n": 3}, {"n": 4}]
+    assert mocked_table.query.call_count == 2
+
+
+def test_search_iter_invalid_item():
+    client = MockedClient()
+
+    with pytest.raises(ValueError) as err:
+        client.search_iter("not a table item", "test_table")
+
+    assert "Expected type 'TableItem'" in str(err.value)
@@ -0,0 +1,220 @@
+import hashlib
+import logging
+import os
+
+import mock
+import pytest
+
+from . import MockedClient
+
+
+def make_tree(tmpdir, files):
+    for rel_path, content in files.items():
+        path = tmpdir.join(*rel_path.split("/"))
+        path.dirpath().ensure(dir=True)
+        path.write(content)
+
+
+def mock_listing(mocked_bucket, sizes):
+    mocked_bucket.objects.filter.return_value = [
+        mock.MagicMock(key=key, size=size) for key, size in sizes.items()
+    ]
+
+
+@pytest.mark.parametrize("dryrun", [True, False])
+def test_sync_upload(dryrun, tmpdir, caplog):
+    """Uploads only files missing from or differing in the bucket"""
+
+    make_tree(
+        tmpdir,
+        {"a.txt": "same", "sub/b.txt": "changed", "sub/c.txt": "new"},
+    )
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mock_listing(
+        mocked_bucket,
+        {"repo/a.txt": 4, "repo/sub/b.txt": 3, "repo/extra.txt": 10},
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        client.sync(str(tmpdir), "test_bucket", "/repo/", dryrun=dryrun)
+
+    # Should've listed the prefix once...
+    mocked_bucket.objects.filter.assert_called_once_with(Prefix="repo/")
+    # ...without checking any object individually
+    mocked_bucket.Object.assert_not_called()
+
+    if dryrun:
+        for msg in [
+            "Would upload repo/sub/b.txt",
+            "Would upload repo/sub/c.txt",
+        ]:
+            assert msg in caplog.text
+        mocked_bucket.upload_file.assert_not_called()
+    else:
+        uploaded = sorted(
+            (c[0][0], c[0][1])
+            for c in mocked_bucket.upload_file.call_args_list
+        )
+        assert uploaded == [
+            (os.path.join(str(tmpdir), "sub", "b.txt"), "repo/sub/b.txt"),
+            (os.path.join(str(tmpdir), "sub", "c.txt"), "repo/sub/c.txt"),
+        ]
+
+    assert "Would upload repo/a.txt" not in caplog.text
+    assert "Sync complete" in caplog.text
+
+
+def test_sync_upload_checksum(tmpdir):
+    """Compares checksums of files of equal size when asked to"""
+
+    make_tree(tmpdir, {"a.txt": "same", "b.txt": "diff"})
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mock_listing(mocked_bucket, {"a.txt": 4, "b.txt": 4})
+
+    checksums = {
+        "a.txt": hashlib.sha256(b"same").hexdigest(),
+        "b.txt": "stale",
+    }
+
+    def get_object(key):
+        obj = mock.MagicMock(content_length=4)
+        obj.metadata = {"sha256": checksums[key]}
+        return obj
+
+    mocked_bucket.Object.side_effect = get_object
+
+    client.sync(str(tmpdir), "test_bucket", compare="checksum")
+
+    # Should've checked both objects, but replaced only the stale one
+    assert mocked_bucket.Object.call_count == 2
+    assert [c[0][1] for c in mocked_bucket.upload_file.call_args_list] == [
+        "b.txt"
+    ]
+
+
+def test_sync_upload_checksum_etag(tmpdir):
+    """Compares files with the ETags of objects lacking a checksum"""
+
+    make_tree(tmpdir, {"a.txt": "same", "b.txt": "diff", "c.txt": "part"})
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mock_listing(mocked_bucket, {"a.txt": 4, "b.txt": 4, "c.txt": 4})
+
+    etags = {
+        "a.txt": hashlib.md5(b"same").hexdigest(),
+        "b.txt": hashlib.md5(b"stale").hexdigest(),
+        # Objects uploaded in parts don't have their MD5 sum as ETag
+        "c.txt": hashlib.md5(b"part").hexdigest() + "-2",
+    }
+
+    def get_object(key):
+        return mock.MagicMock(
+            content_length=4, metadata={}, e_tag='"%s"' % etags[key]
+        )
+
+    mocked_bucket.Object.side_effect = get_object
+
+    client.sync(str(tmpdir), "test_bucket", compare="checksum")
+
+    # Should've left the object whose ETag matches, replacing the others
+    assert sorted(
+        c[0][1] for c in mocked_bucket.upload_file.call_args_list
+    ) == ["b.txt", "c.txt"]
+
+
+def test_sync_files_count(tmpdir):
+    """Tunes transfers for the number of files actually transferred"""
+
+    make_tree(tmpdir, {"a.txt": "same", "b.txt": "new"})
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mock_listing(mocked_bucket, {"a.txt": 4})
+
+    with mock.patch.object(
+        client, "_tuned_transfer_config", wraps=client._tuned_transfer_config
+    ) as tuned:
+        client.sync(str(tmpdir), "test_bucket")
+
+    # Only one of the two files differs, so it's the only one in flight
+    tuned.assert_called_once_with(3, 1)
+
+
+def test_sync_download(tmpdir):
+    """Downloads only objects missing from or differing in the directory"""
+
+    make_tree(tmpdir, {"a.txt": "same", "sub/b.txt": "changed"})
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mock_listing(
+        mocked_bucket,
+        {
+            "repo/a.txt": 4,
+            "repo/sub/b.txt": 3,
+            "repo/new/c.txt": 3,
+            "repo/new/": 0,
+        },
+    )
+
+    with mock.patch.object(client, "_do_download") as do_download:
+        client.sync(str(tmpdir), "test_bucket", "repo", direction="download")
+
+    downloaded = sorted(
+        (c[0][0].key, c[0][0].path) for c in do_download.call_args_list
+    )
+    assert downloaded == [
+        ("repo/new/c.txt", os.path.join(str(tmpdir), "new", "c.txt")),
+        ("repo/sub/b.txt", os.path.join(str(tmpdir), "sub", "b.txt")),
+    ]
+    # Should've made directories for new files
+    assert tmpdir.join("new").isdir()
+
+
+def test_sync_download_outside_dir(tmpdir, caplog):
+    """Fails only the objects whose keys lead outside of the directory"""
+
+    local_dir = tmpdir.join("a", "b")
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mock_listing(
+        mocked_bucket,
+        {"mirror/../../escape.txt": 3, "mirror/sub/ok.txt": 3},
+    )
+
+    with mock.patch.object(client, "_do_download") as do_download:
+        report = client.sync(
+            str(local_dir), "test_bucket", "mirror", direction="download"
+        )
+
+    # Should've downloaded the other object, into a new directory...
+    assert [c[0][0].key for c in do_download.call_args_list] == [
+        "mirror/sub/ok.txt"
+    ]
+    assert local_dir.join("sub").isdir()
+
+    # ...and failed the one which would've escaped it
+    assert [result.item.key for result in report.failed] == [
+        "mirror/../../escape.txt"
+    ]
+    assert "its path is outside of" in caplog.text
+    assert not tmpdir.join("escape.txt").exists()
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"direction": "sideways"}, {"compare": "mtime"}]
+)
+def test_sync_invalid_args(kwargs, tmpdir):
+    client = MockedClient()
+
+    with pytest.raises(ValueError) as err:
+        client.sync(str(tmpdir), "test_bucket", **kwargs)
+
+    assert "to be one of" in str(err.value)
+    client._session.resource().Bucket().objects.filter.assert_not_called()
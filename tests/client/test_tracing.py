@@ -0,0 +1,105 @@
+import logging
+
+import pytest
+from botocore.exceptions import ClientError
+from botocore.stub import Stubber
+from more_executors import Executors
+
+from chexus import BucketItem, Client, RetryPolicy, TableItem, Tracer
+from chexus._impl.tracing import _Tracing
+from . import MockedClient
+
+
+def test_tracing_requests():
+    """Reports a span for each request made to AWS"""
+
+    spans = []
+    client = Client(
+        "access_id",
+        "access_key",
+        default_region="us-east-1",
+        tracer=Tracer(spans.append),
+    )
+    dynamodb = client._resource("dynamodb").meta.client
+
+    with Stubber(dynamodb) as stub:
+        stub.add_response(
+            "describe_table",
+            {
+                "Table": {
+                    "KeySchema": [{"AttributeName": "key1", "KeyType": "HASH"}]
+                }
+            },
+        )
+        stub.add_response("query", {"Items": [], "Count": 0})
+        stub.add_client_error(
+            "query",
+            "ProvisionedThroughputExceededException",
+            http_status_code=400,
+        )
+
+        client.search(TableItem(key1="a"), "test_table")
+        with pytest.raises(ClientError):
+            client.search(TableItem(key1="b"), "test_table")
+
+    assert [span.name for span in spans] == [
+        "DynamoDB.DescribeTable",
+        "DynamoDB.Query",
+        "DynamoDB.Query",
+    ]
+    assert spans[1].attributes == {
+        "service": "DynamoDB",
+        "operation": "Query",
+        "table": "test_table",
+    }
+    assert spans[1].exception is None
+    assert spans[1].duration >= 0
+    assert "ProvisionedThroughput" in str(spans[2].exception)
+
+
+def test_tracing_waits():
+    """Reports a span for each task's wait for each attempt"""
+
+    item = BucketItem("tests/test_data/somefile.txt")
+    spans = []
+
+    client = MockedClient()
+    client._tracing = _Tracing(Tracer(spans.append))
+    client._executor = Executors.thread_pool(max_workers=4).with_retry(
+        retry_policy=RetryPolicy(max_attempts=3, sleep=0)
+    )
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+    mocked_bucket.upload_file.side_effect = [
+        ClientError({"Error": {"Code": "SlowDown"}}, "PutObject"),
+        None,
+    ]
+
+    client.upload(item, "test_bucket")
+
+    waits = [span for span in spans if span.name == "chexus.wait"]
+    assert [span.attributes for span in waits] == [
+        {"service": "S3", "bucket": "test_bucket", "attempt": 1},
+        {"service": "S3", "bucket": "test_bucket", "attempt": 2},
+    ]
+    assert all(span.duration >= 0 for span in waits)
+
+
+def test_tracing_tracer_fails(caplog):
+    """Logs exceptions raised by the tracer without failing"""
+
+    def broken(span):
+        raise RuntimeError("Tracer on fire")
+
+    client = MockedClient()
+    client._tracing = _Tracing(Tracer(broken))
+
+    with caplog.at_level(logging.ERROR):
+        report = client.publish(
+            TableItem(key1="a"), "test_table", mode="conditional"
+        )
+
+    assert report.ok
+    assert "Tracer failed to handle span 'chexus.wait'" in caplog.text
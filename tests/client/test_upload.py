@@ -1,12 +1,18 @@
+import hashlib
+import io
 import logging
+from collections import namedtuple
 
 import mock
 import pytest
 from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import ClientError
 
-from chexus import BucketItem, TableItem
+from chexus import BucketItem, BufferItem, TableItem
 from . import MockedClient
 
+ObjectSummary = namedtuple("ObjectSummary", ["key"])
+
 
 @pytest.mark.parametrize("dryrun", [True, False])
 def test_upload(dryrun, caplog):
@@ -24,16 +30,25 @@ def test_upload(dryrun, caplog):
     client = MockedClient()
     mocked_bucket = client._session.resource().Bucket()
 
-    # Searching for the file returns an iterable of matches
-    mocked_bucket.objects.filter.return_value = []
+    # Checking for the file finds nothing
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
 
     with caplog.at_level(logging.DEBUG):
         client.upload(items, "test_bucket", dryrun=dryrun)
 
-    # Expected calls to Bucket methods objects.filters and upload_file
-    objects_calls = [mock.call(Prefix=item.key) for item in items]
+    # Expected calls to Bucket methods Object and upload_file
+    objects_calls = [mock.call(item.key) for item in items]
     upload_calls = [
-        mock.call(item.path, item.key, ExtraArgs=item.content_type)
+        mock.call(
+            item.path,
+            item.key,
+            ExtraArgs=dict(
+                item.content_type, Metadata={"sha256": item.checksum}
+            ),
+            Config=mock.ANY,
+        )
         for item in items
     ]
 
@@ -52,9 +67,9 @@ def test_upload(dryrun, caplog):
         mocked_bucket.upload_file.assert_not_called()
     else:
         # Should've checked bucket for duplicate file...
-        mocked_bucket.objects.filter.assert_has_calls(
-            objects_calls, any_order=True
-        )
+        mocked_bucket.Object.assert_has_calls(objects_calls, any_order=True)
+        # ...without listing, as there are so few files
+        mocked_bucket.objects.filter.assert_not_called()
 
         # ...and proceeded with upload
         assert "Content already present in s3 bucket" not in caplog.text
@@ -75,22 +90,167 @@ def test_upload_duplicate(caplog):
     client = MockedClient()
     mocked_bucket = client._session.resource().Bucket()
 
-    # Searching for the file returns an iterable of matches
-    mocked_bucket.objects.filter.return_value = [
-        {"ObjectSummary_obj": {"key": item.key, "bucket": "mocked_bucket"}}
-    ]
-
     with caplog.at_level(logging.DEBUG):
         client.upload(item, "mocked_bucket")
 
     # Should've checked bucket for duplicate file...
-    mocked_bucket.objects.filter.assert_called_with(Prefix=item.key)
+    mocked_bucket.Object.assert_called_with(item.key)
     # ...and found one
     assert "Item already in s3 bucket" in caplog.text
     # Should not have tried to upload
     mocked_bucket.upload_file.assert_not_called()
 
 
+@pytest.mark.parametrize(
+    "remote_checksum,on_mismatch,uploaded",
+    [
+        (
+            "ee21ae5cd21ff1bb2263f7c98a8557d42646ed1ec660d9c1f7c3f4e781bc6710",
+            "overwrite",
+            False,
+        ),
+        ("stale", "overwrite", True),
+        (None, "overwrite", True),
+        ("stale", "report", False),
+    ],
+)
+def test_upload_checksum_mismatch(
+    remote_checksum, on_mismatch, uploaded, caplog
+):
+    """Compares stored checksums of existing objects when asked to"""
+
+    item = BucketItem("tests/test_data/somefile.txt")
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.metadata = (
+        {"sha256": remote_checksum} if remote_checksum else {}
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        client.upload(item, "test_bucket", on_mismatch=on_mismatch)
+
+    assert mocked_bucket.upload_file.called == uploaded
+    if on_mismatch == "report":
+        assert "Checksum mismatch for somefile.txt" in caplog.text
+        assert "found 'stale'" in caplog.text
+
+
+def test_upload_bad_mismatch_mode():
+    """Rejects unknown checksum mismatch modes"""
+
+    client = MockedClient()
+
+    with pytest.raises(ValueError) as err:
+        client.upload(
+            BucketItem("tests/test_data/somefile.txt"),
+            "test_bucket",
+            on_mismatch="ignore",
+        )
+
+    assert "Expected 'on_mismatch' to be one of" in str(err.value)
+    client._session.resource().Bucket().upload_file.assert_not_called()
+
+
+def test_upload_many(caplog):
+    """Checks large batches against one listing of their common prefix"""
+
+    items = [
+        BucketItem("tests/test_data/somefile.txt", key="repo/file-%02d" % i)
+        for i in range(20)
+    ]
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+
+    # Every other file is already present
+    mocked_bucket.objects.filter.return_value = [
+        mock.MagicMock(key=item.key) for item in items[::2]
+    ]
+
+    with caplog.at_level(logging.DEBUG):
+        client.upload(items, "test_bucket")
+
+    # Should've listed the common prefix once...
+    mocked_bucket.objects.filter.assert_called_once_with(Prefix="repo/file-")
+    # ...without checking any file individually
+    mocked_bucket.Object.assert_not_called()
+
+    # Should've uploaded only the missing files
+    assert sorted(
+        c[0][1] for c in mocked_bucket.upload_file.call_args_list
+    ) == sorted(item.key for item in items[1::2])
+
+
+def test_upload_list_failure(caplog):
+    """Falls back to checking items individually if listing fails"""
+
+    items = [
+        BucketItem("tests/test_data/somefile.txt", key="repo/file-%02d" % i)
+        for i in range(10)
+    ]
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.objects.filter.side_effect = ClientError(
+        {"Error": {"Code": "AccessDenied"}}, "ListObjects"
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        client.upload(items, "test_bucket")
+
+    assert "Failed to list bucket contents" in caplog.text
+    # Should've checked every file individually and found them present
+    assert mocked_bucket.Object.call_count == len(items)
+    mocked_bucket.upload_file.assert_not_called()
+
+
+def test_upload_many_root_keys():
+    """Doesn't list the whole bucket to check keys at its root"""
+
+    # Named after their checksums, as by the examples
+    items = [
+        BucketItem(
+            "tests/test_data/somefile.txt",
+            key=hashlib.sha256(str(i).encode()).hexdigest(),
+        )
+        for i in range(12)
+    ]
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+
+    client.upload(items, "test_bucket")
+
+    # Should've checked every file individually instead
+    mocked_bucket.objects.filter.assert_not_called()
+    assert mocked_bucket.Object.call_count == len(items)
+
+
+def test_upload_many_crowded_prefix(caplog):
+    """Stops listing a prefix holding far more objects than are checked"""
+
+    items = [
+        BucketItem("tests/test_data/somefile.txt", key="repo/file-%02d" % i)
+        for i in range(20)
+    ]
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.objects.filter.return_value = iter(
+        ObjectSummary("repo/file-%05d" % i) for i in range(100000)
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        client.upload(items, "test_bucket")
+
+    assert "Too many objects under 'repo/file-'" in caplog.text
+    # Should've listed no more than two pages' worth of objects...
+    assert len(list(mocked_bucket.objects.filter.return_value)) == 97999
+    # ...before checking every file individually
+    assert mocked_bucket.Object.call_count == len(items)
+
+
 def test_upload_invalid_item(caplog):
     """Doesn't attempt to upload invalid items"""
 
@@ -129,8 +289,12 @@ def test_upload_exceptions(caplog):
     ]
 
     client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
     # Uploading fails twice before succeeding
-    client._session.resource().Bucket().upload_file.side_effect = [
+    mocked_bucket.upload_file.side_effect = [
         S3UploadFailedError("Error uploading somefile3.txt"),
         S3UploadFailedError("Error uploading somefile2.txt"),
         mock.DEFAULT,
@@ -145,3 +309,237 @@ def test_upload_exceptions(caplog):
         "Error uploading somefile2.txt",
     ]:
         assert msg in caplog.text
+
+
+def test_upload_async(caplog):
+    """Can upload without blocking"""
+
+    item = BucketItem("tests/test_data/somefile.txt")
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        upload_ft = client.upload_async(item, "test_bucket")
+        # Returned future resolves once the upload is done
+        assert upload_ft.result(timeout=10).ok
+
+    mocked_bucket.upload_file.assert_called_once()
+    assert "Upload complete" in caplog.text
+
+
+def test_upload_transfer_config():
+    """Tunes transfers to the size and number of files"""
+
+    client = MockedClient()
+    client._max_connections = 16
+    mib = 1024 * 1024
+
+    # Small files are uploaded in one request, without threads
+    config = client._tuned_transfer_config(1024, files_count=100)
+    assert not config.use_threads
+
+    # A lone large file gets every connection...
+    config = client._tuned_transfer_config(100 * mib, files_count=1)
+    assert config.use_threads
+    assert config.max_concurrency == 16
+    assert config.multipart_chunksize == 8 * mib
+
+    # ...many share them among the workers transferring them
+    config = client._tuned_transfer_config(100 * mib, files_count=100)
+    assert config.max_concurrency == 4
+
+    # Huge files are split into larger parts
+    config = client._tuned_transfer_config(16000 * mib, files_count=1)
+    assert config.multipart_chunksize == 16 * mib
+
+
+def test_upload_given_transfer_config():
+    """Uses the client's transfer configuration when provided"""
+
+    item = BucketItem("tests/test_data/somefile.txt")
+
+    client = MockedClient()
+    client._transfer_config = mock.sentinel.config
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+
+    client.upload(item, "test_bucket")
+
+    assert (
+        mocked_bucket.upload_file.call_args[1]["Config"]
+        is mock.sentinel.config
+    )
+
+
+def test_upload_resources_per_thread():
+    """Creates one S3 resource per worker thread, pooling as many
+    connections as the client may use"""
+
+    items = [
+        BucketItem("tests/test_data/somefile.txt"),
+        BucketItem("tests/test_data/somefile2.txt"),
+        BucketItem("tests/test_data/somefile3.txt"),
+    ]
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+    client._session.resource.reset_mock()
+
+    client.upload(items, "test_bucket")
+
+    # No more resources than worker threads, each sized alike
+    calls = client._session.resource.call_args_list
+    assert 1 <= len(calls) <= client._workers_count
+    for call in calls:
+        assert call[0] == ("s3",)
+        assert (
+            call[1]["config"].max_pool_connections == client._max_connections
+        )
+
+    # A thread reuses its resource
+    client._session.resource.reset_mock()
+    assert client._resource("s3") is client._resource("s3")
+    assert client._session.resource.call_count == 1
+
+
+def test_upload_buffer(caplog):
+    """Can upload content held in memory"""
+
+    item = BufferItem(b"<repomd/>", key="repodata/repomd.xml")
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        client.upload(item, "test_bucket")
+
+    mocked_bucket.upload_file.assert_not_called()
+    mocked_bucket.upload_fileobj.assert_called_once_with(
+        mock.ANY,
+        "repodata/repomd.xml",
+        ExtraArgs={
+            "ContentType": "application/xml",
+            "Metadata": {"sha256": hashlib.sha256(b"<repomd/>").hexdigest()},
+        },
+        Config=mock.ANY,
+    )
+    assert mocked_bucket.upload_fileobj.call_args[0][0].read() == b"<repomd/>"
+    # Checksum was known up front, so no need to update the object
+    mocked_bucket.copy.assert_not_called()
+
+
+def test_upload_stream(caplog):
+    """Can upload streams, hashing them as they're uploaded"""
+
+    stream = io.BufferedReader(io.BytesIO(b"some generated content"))
+    item = BufferItem(stream, key="generated.txt")
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.name = "test_bucket"
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+
+    uploaded = []
+    mocked_bucket.upload_fileobj.side_effect = (
+        lambda fileobj, *args, **kwargs: uploaded.append(fileobj.read())
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        client.upload(item, "test_bucket")
+
+    assert "One or more exceptions occurred" not in caplog.text
+    assert uploaded == [b"some generated content"]
+
+    # Should've stored the checksum computed while uploading
+    checksum = hashlib.sha256(b"some generated content").hexdigest()
+    assert item.checksum == checksum
+    mocked_bucket.copy.assert_called_once_with(
+        {"Bucket": "test_bucket", "Key": "generated.txt"},
+        "generated.txt",
+        ExtraArgs={
+            "MetadataDirective": "REPLACE",
+            "Metadata": {"sha256": checksum},
+        },
+        Config=mock.ANY,
+    )
+
+    # Should've copied with a single request wherever S3 allows
+    config = mocked_bucket.copy.call_args[1]["Config"]
+    assert config.multipart_threshold == 5 * 1024**3
+
+
+def test_upload_stream_copy_fails(caplog):
+    """Fails streams whose checksum fails to be stored"""
+
+    stream = io.BufferedReader(io.BytesIO(b"some generated content"))
+    item = BufferItem(stream, key="generated.txt")
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.name = "test_bucket"
+    mocked_bucket.Object.return_value.load.side_effect = ClientError(
+        {"Error": {"Code": "404"}}, "HeadObject"
+    )
+    mocked_bucket.copy.side_effect = ClientError(
+        {"Error": {"Code": "AccessDenied"}}, "CopyObject"
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        report = client.upload(item, "test_bucket")
+
+    mocked_bucket.upload_fileobj.assert_called_once()
+    assert [result.item for result in report.failed] == [item]
+    assert "CopyObject" in str(report.failed[0].exception)
+    assert "One or more exceptions occurred" in caplog.text
+
+
+@pytest.mark.parametrize(
+    "remote_checksum,on_mismatch,status",
+    [
+        (None, "overwrite", "done"),
+        (
+            hashlib.sha256(b"some generated content").hexdigest(),
+            "overwrite",
+            "done",
+        ),
+        (
+            hashlib.sha256(b"some generated content").hexdigest(),
+            "report",
+            "skipped-mismatch",
+        ),
+    ],
+)
+def test_upload_stream_mismatch(remote_checksum, on_mismatch, status, caplog):
+    """Never finds existing objects to match a stream not yet hashed"""
+
+    stream = io.BufferedReader(io.BytesIO(b"some generated content"))
+    item = BufferItem(stream, key="generated.txt")
+
+    client = MockedClient()
+    mocked_bucket = client._session.resource().Bucket()
+    mocked_bucket.Object.return_value.metadata = (
+        {"sha256": remote_checksum} if remote_checksum else {}
+    )
+
+    with caplog.at_level(logging.DEBUG):
+        report = client.upload(item, "test_bucket", on_mismatch=on_mismatch)
+
+    assert [result.status for result in report] == [status]
+    assert mocked_bucket.upload_fileobj.called == (status == "done")
+    assert "expected 'None'" not in caplog.text
+    if on_mismatch == "report":
+        assert "its checksum is unknown until uploaded" in caplog.text
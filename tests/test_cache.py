@@ -0,0 +1,72 @@
+import os
+
+import mock
+
+from chexus import BucketItem, ChecksumCache
+
+
+def test_checksum_cache(tmpdir):
+    """Checksums are cached until the file changes"""
+
+    path = str(tmpdir.join("somefile"))
+    with open(path, "w") as f:
+        f.write("hello")
+
+    cache = ChecksumCache(str(tmpdir.join("cache.db")))
+    generate = mock.Mock(return_value="abc123")
+
+    assert cache.get(path) is None
+    assert cache.checksum(path, generate) == "abc123"
+    assert cache.checksum(path, generate) == "abc123"
+    assert cache.get(path) == "abc123"
+    generate.assert_called_once()
+
+    # Changing the file invalidates its entry
+    with open(path, "w") as f:
+        f.write("hello, world")
+
+    assert cache.get(path) is None
+
+
+def test_checksum_cache_persists(tmpdir):
+    """Cached checksums are available to later BucketItems"""
+
+    db_path = str(tmpdir.join("cache.db"))
+    item = BucketItem(
+        "tests/test_data/somefile.txt", checksum_cache=ChecksumCache(db_path)
+    )
+    expected = item.checksum
+    item.checksum_cache.close()
+
+    cache = ChecksumCache(db_path)
+    item = BucketItem("tests/test_data/somefile.txt", checksum_cache=cache)
+
+    with mock.patch.object(BucketItem, "_hash_file") as hash_file:
+        # Should've found the checksum without hashing the file
+        assert item.checksum == expected
+        hash_file.assert_not_called()
+
+
+def test_checksum_cache_eviction(tmpdir):
+    """Oldest entries are evicted once the cache is full"""
+
+    cache = ChecksumCache(str(tmpdir.join("cache.db")), max_entries=10)
+
+    paths = []
+    for i in range(11):
+        path = str(tmpdir.join("file%s" % i))
+        with open(path, "w") as f:
+            f.write(str(i))
+        cache.put(path, "checksum%s" % i)
+        paths.append(path)
+
+    # Should've trimmed the cache to 90% of its maximum size
+    assert [cache.get(path) for path in paths] == [None] * 2 + [
+        "checksum%s" % i for i in range(2, 11)
+    ]
+
+
+def test_checksum_cache_missing_file(tmpdir):
+    cache = ChecksumCache(str(tmpdir.join("cache.db")))
+
+    assert cache.get(os.path.join(str(tmpdir), "missing")) is None
@@ -0,0 +1,15 @@
+import subprocess
+import sys
+
+
+def test_import_defers_dependencies():
+    """Importing chexus and creating a Client import no AWS libraries"""
+
+    code = (
+        "import sys; import chexus; chexus.Client(default_region='x'); "
+        "print(' '.join(m for m in ('boto3', 'botocore', 'more_executors', "
+        "'dateutil') if m in sys.modules))"
+    )
+    output = subprocess.check_output([sys.executable, "-c", code])
+
+    assert output.decode().split() == []
@@ -1,8 +1,20 @@
+import decimal
+import hashlib
+import io
+import json
+
+import mock
 import pytest
 
-from datetime import date
+from datetime import date, datetime
 
-from chexus import BucketItem, TableItem
+from chexus import (
+    BucketItem,
+    BufferItem,
+    TableItem,
+    TableItemBatch,
+    TableItemSchema,
+)
 
 
 def test_bucket_item():
@@ -29,6 +41,38 @@ def test_bucket_item_bad_path():
     assert item.checksum is None
 
 
+def test_bucket_item_lazy_checksum():
+    with mock.patch.object(
+        BucketItem, "_generate_checksum", return_value="abc123"
+    ) as generate:
+        item = BucketItem(file_path="tests/test_data/somefile.txt")
+
+        # Should not have read the file until needed...
+        generate.assert_not_called()
+
+        # ...and only once
+        assert item.checksum == "abc123"
+        assert item.checksum == "abc123"
+        generate.assert_called_once()
+
+
+def test_bucket_item_generate_checksums():
+    items = [
+        BucketItem(file_path="tests/test_data/somefile.txt"),
+        BucketItem(file_path="tests/test_data/somefile2.txt"),
+        BucketItem(file_path="bad/path/to/nowhere"),
+        BucketItem(file_path="tests/test_data/somefile3.txt", checksum="x"),
+    ]
+    expected = [BucketItem(item.path).checksum for item in items[:3]]
+
+    assert BucketItem.generate_checksums(items, workers_count=2) == items
+
+    # Should've computed checksums of existing files, leaving any
+    # provided checksum alone
+    assert [item._generated_checksum for item in items] == expected + [None]
+    assert [item.checksum for item in items] == expected + ["x"]
+
+
 @pytest.mark.parametrize(
     "path,content_type",
     [
@@ -43,9 +87,55 @@ def test_bucket_item_get_content_type(path, content_type):
     assert item.content_type == content_type
 
 
+@pytest.mark.parametrize(
+    "data", [b"<repomd/>", bytearray(b"<repomd/>"), memoryview(b"<repomd/>")]
+)
+def test_buffer_item(data):
+    item = BufferItem(data, key="repodata/repomd.xml")
+
+    assert item.path is None
+    assert item.name == "repomd.xml"
+    assert item.key == "repodata/repomd.xml"
+    assert item.size == 9
+    assert item.content_type == {"ContentType": "application/xml"}
+    assert item.checksum == hashlib.sha256(b"<repomd/>").hexdigest()
+
+    # Can be read any number of times
+    assert item.open().read() == b"<repomd/>"
+    assert item.open().read() == b"<repomd/>"
+
+
+def test_buffer_item_stream():
+    stream = io.BytesIO(b"skipped content")
+    stream.seek(8)
+    item = BufferItem(stream, key="somefile")
+
+    # Checksum of streams isn't known until they're read
+    assert item.size is None
+    assert item.checksum is None
+
+    # Streams are rewound to where they started
+    assert item.open().read() == b"content"
+    assert item.open().read() == b"content"
+
+
+def test_buffer_item_unseekable_stream():
+    class Stream(object):
+        def read(self, size=-1):
+            return b""
+
+    item = BufferItem(Stream(), key="somefile")
+    item.open()
+
+    with pytest.raises(IOError) as err:
+        item.open()
+
+    assert "can't be rewound" in str(err.value)
+
+
 def test_table_item():
-    # Create TableItem
-    item = TableItem(
+    # Create TableItem, parsing dates and times fuzzily
+    item = TableItemSchema(fuzzy=True).item(
         file_name="somefile",
         file_path="path/to/somefile",
         file_url="www.example.com/content/path/to/somefile",
@@ -74,3 +164,207 @@ def test_table_item():
     # Should have created class attributes for each kwarg
     for key, value in item.attrs.items():
         assert getattr(item, key) == value
+
+
+def test_table_item_untyped():
+    """Keeps strings as they are where no schema is given"""
+
+    item = TableItem(
+        version="1",
+        year="2020",
+        release_date="Feb. 1, 2020",
+        created=datetime(2020, 2, 1, 0, 30),
+        day=date(2020, 2, 1),
+        metadata={"some": "thing"},
+    )
+
+    assert item.attrs == {
+        "version": "1",
+        "year": "2020",
+        "release_date": "Feb. 1, 2020",
+        "created": "2020-02-01T00:30:00",
+        "day": "2020-02-01T00:00:00",
+        "metadata": '{"some": "thing"}',
+    }
+
+
+def test_table_item_schema():
+    """Converts attributes according to their declared types"""
+
+    schema = TableItemSchema(
+        {"released": "datetime", "updated": "datetime", "tags": "json"}
+    )
+
+    item = schema.item(
+        released="2020-02-01",
+        updated="2020-02-01T00:30:05.5Z",
+        tags=["a", "b"],
+        year="2020",
+        status=None,
+    )
+
+    assert item.attrs == {
+        "released": "2020-02-01T00:00:00",
+        "updated": "2020-02-01T00:30:05.500000+00:00",
+        "tags": '["a", "b"]',
+        "year": "2020",
+        "status": None,
+    }
+    assert item.released == "2020-02-01T00:00:00"
+
+
+def test_table_item_schema_strict():
+    """Rejects declared dates and times not in ISO 8601 format unless
+    parsing fuzzily"""
+
+    schema = TableItemSchema({"released": "datetime"})
+
+    with pytest.raises(ValueError) as err:
+        schema.item(released="Feb. 1, 2020")
+
+    assert "ISO 8601" in str(err.value)
+
+    with pytest.raises(ValueError):
+        schema.item(released="2020-13-01")
+
+    schema = TableItemSchema({"released": "datetime"}, fuzzy=True)
+    item = schema.item(released="Feb. 1, 2020", note="Feb. 1, 2020")
+
+    assert item.released == "2020-02-01T00:00:00"
+    assert item.note == "Feb. 1, 2020"
+
+
+def test_table_item_schema_decoded_text():
+    """Converts text decoded from JSON, unicode on Python 2, by its
+    declared type"""
+
+    schema = TableItemSchema({"released": "datetime", "tags": "json"})
+
+    item = schema.item(
+        **json.loads('{"released": "2020-02-01", "tags": "[\\"a\\"]"}')
+    )
+
+    assert item.attrs == {
+        "released": "2020-02-01T00:00:00",
+        "tags": '["a"]',
+    }
+
+
+def test_table_item_schema_bad_type():
+    """Rejects unknown types"""
+
+    with pytest.raises(ValueError) as err:
+        TableItemSchema({"released": "timestamp"})
+
+    assert str(err.value) == (
+        "Expected type of 'released' to be one of datetime, json, "
+        "got 'timestamp' instead"
+    )
+
+
+def test_table_item_batch_csv():
+    """Reads rows from CSV, taking empty values to be absent"""
+
+    stream = io.StringIO(
+        "key1,released,count\n" "a,2020-02-01,1\n" "\n" "b,,2\n"
+    )
+    batch = TableItemBatch.from_csv(
+        stream, schema=TableItemSchema({"released": "datetime"})
+    )
+
+    assert batch.columns == ("key1", "released", "count")
+    assert list(batch.payloads()) == [
+        {"key1": "a", "released": "2020-02-01T00:00:00", "count": "1"},
+        {"key1": "b", "count": "2"},
+    ]
+
+
+def test_table_item_batch_json_lines():
+    """Reads rows from JSON lines, sharing the first one's attributes"""
+
+    stream = io.StringIO(
+        '{"key1": "a", "size": 1.5, "tags": {"x": 1}}\n'
+        "\n"
+        '{"key1": "b"}\n'
+        '{"key1": "c", "extra": true}\n'
+    )
+    batch = TableItemBatch.from_json_lines(stream)
+
+    items = iter(batch)
+    item = next(items)
+    assert isinstance(item, TableItem)
+    assert item.attrs == {
+        "key1": "a",
+        "size": decimal.Decimal("1.5"),
+        "tags": '{"x": 1}',
+    }
+    assert item.key1 == "a"
+    assert next(items).attrs == {"key1": "b"}
+
+    with pytest.raises(ValueError) as err:
+        next(items)
+
+    assert str(err.value) == (
+        "Expected attributes to be among key1, size, tags, "
+        "got 'extra' instead"
+    )
+
+
+def test_table_item_batch_rows():
+    """Holds rows sharing one sequence of attribute names"""
+
+    batch = TableItemBatch(["key1", "key2"], [("a", 1), ("b",)])
+
+    assert batch.count == 2
+    assert [item.attrs for item in batch] == [
+        {"key1": "a", "key2": 1},
+        {"key1": "b"},
+    ]
+    # Held rows may be iterated over again
+    assert len(list(batch)) == 2
+
+    with pytest.raises(ValueError) as err:
+        batch.item(("c", 3, "extra"))
+
+    assert str(err.value) == "Expected at most 2 values, got 3 instead"
+
+
+def test_table_item_batch_streamed_count():
+    """Has no count of rows when they're streamed"""
+
+    batch = TableItemBatch.from_dicts(iter([{"a": 1}]))
+
+    assert batch.count is None
+    assert batch
+    assert [item.attrs for item in list(batch)] == [{"a": 1}]
+
+
+def test_table_item_batch_unreadable_rows():
+    """Rejects rows which can't be read once reached, reading on"""
+
+    batch = TableItemBatch.from_json_lines(
+        io.StringIO('not json\n{"key1": "a"}\n[1]\n{"key1": "b"}\n')
+    )
+    assert batch.columns == ("key1",)
+
+    rows = list(batch.rows)
+    assert len(rows) == 4
+    assert batch.attrs(rows[1]) == {"key1": "a"}
+    assert batch.attrs(rows[3]) == {"key1": "b"}
+
+    with pytest.raises(ValueError) as err:
+        batch.attrs(rows[0])
+    assert "Invalid JSON on line 1" in str(err.value)
+
+    with pytest.raises(ValueError) as err:
+        batch.attrs(rows[2])
+    assert "Expected a record of attributes, got '[1]'" in str(err.value)
+
+    batch = TableItemBatch.from_csv(
+        io.StringIO('key1\n"a"b\nc\n'), strict=True
+    )
+    rows = list(batch.rows)
+    with pytest.raises(ValueError) as err:
+        batch.attrs(rows[0])
+    assert "Invalid CSV on line 2" in str(err.value)
+    assert batch.attrs(rows[1]) == {"key1": "c"}